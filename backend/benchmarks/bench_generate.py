@@ -0,0 +1,139 @@
+"""
+Нагрузочный прогон backend: N запросов к /generate (или /generate/stream)
+с заданной конкуренцией, отчёт по пропускной способности и хвостам задержки.
+
+    python -m backend.benchmarks.bench_generate --url http://127.0.0.1:8000 \
+        --types manual_ui,auto_api --requests 200 --concurrency 16 --no-cache
+
+Для офлайн-замеров backend запускается с CLOUD_RU_BASE_URL, указывающим
+на локальный стенд backend/benchmarks/fake_cloud_ru.py.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+PREVIOUS_CODE = "def test_example():\n    assert 1 + 1 == 2\n"
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def build_payload(prompt_type: str, use_cache: bool) -> dict:
+    payload = {"type": prompt_type, "use_cache": use_cache}
+    if prompt_type in ("optimize", "test_plan", "unit_ci"):
+        payload["previous_code"] = PREVIOUS_CODE
+    return payload
+
+
+async def run_one(client: httpx.AsyncClient, payload: dict, stream: bool) -> dict:
+    started = time.perf_counter()
+    first_token_s = None
+    try:
+        if not stream:
+            response = await client.post("/generate", json=payload)
+            status = response.status_code
+        else:
+            status = None
+            async with client.stream("POST", "/generate/stream", json=payload) as response:
+                status = response.status_code
+                async for line in response.aiter_lines():
+                    if first_token_s is None and line.startswith("event: token"):
+                        first_token_s = time.perf_counter() - started
+                    if line.startswith("event: error"):
+                        status = "stream_error"
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return {"status": status, "latency_s": time.perf_counter() - started, "ttft_s": first_token_s}
+
+
+async def run_benchmark(
+    url: str,
+    types: List[str],
+    total: int,
+    concurrency: int,
+    stream: bool = False,
+    use_cache: bool = False,
+    timeout_s: float = 300.0,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[dict] = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout_s, transport=transport) as client:
+        async def worker(i: int) -> None:
+            async with semaphore:
+                results.append(await run_one(client, build_payload(types[i % len(types)], use_cache), stream))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+        try:
+            llm_stats = (await client.get("/debug/llm")).json()
+        except (httpx.HTTPError, ValueError):
+            llm_stats = {}
+
+    return summarize(results, elapsed, llm_stats)
+
+
+def summarize(results: List[dict], elapsed_s: float, llm_stats: Dict | None = None) -> dict:
+    ok = [r["latency_s"] for r in results if r["status"] == 200]
+    ttft = [r["ttft_s"] for r in results if r["ttft_s"] is not None]
+    report = {
+        "requests": len(results),
+        "elapsed_s": round(elapsed_s, 3),
+        "throughput_rps": round(len(ok) / elapsed_s, 2) if elapsed_s else 0.0,
+        "statuses": dict(Counter(str(r["status"]) for r in results)),
+        "latency_ms": {
+            "p50": round(1000 * percentile(ok, 0.50), 1),
+            "p95": round(1000 * percentile(ok, 0.95), 1),
+            "p99": round(1000 * percentile(ok, 0.99), 1),
+            "max": round(1000 * max(ok), 1) if ok else 0.0,
+        },
+    }
+    if ttft:
+        report["ttft_ms"] = {
+            "p50": round(1000 * percentile(ttft, 0.50), 1),
+            "p95": round(1000 * percentile(ttft, 0.95), 1),
+            "p99": round(1000 * percentile(ttft, 0.99), 1),
+        }
+    if llm_stats:
+        report["llm"] = llm_stats
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон /generate")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--types", default="manual_ui", help="типы генерации через запятую")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="использовать /generate/stream")
+    parser.add_argument("--no-cache", action="store_true", help="use_cache=false, чтобы кэш не скрывал задержку модели")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(
+        args.url,
+        [t.strip() for t in args.types.split(",") if t.strip()],
+        args.requests,
+        args.concurrency,
+        stream=args.stream,
+        use_cache=not args.no_cache,
+        timeout_s=args.timeout,
+    ))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
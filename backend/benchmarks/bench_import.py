@@ -0,0 +1,92 @@
+"""
+Замер холодного импорта приложения по `python -X importtime`: общий
+импорт backend.main в миллисекундах и самые тяжёлые модули.
+
+    python -m backend.benchmarks.bench_import --runs 5 --top 15
+
+Каждый прогон — отдельный свежий интерпретатор (без кэша sys.modules),
+запущенный из корня репозитория без ключа Cloud.ru: импорт не должен
+ни требовать ключ, ни создавать клиентов.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# "import time:       356 |     503415 |   fastapi"
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# Зависимости, которые должны загружаться только при первом использовании
+DEFERRED_MODULES = ("openai", "gitlab", "psutil", "prance")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Строки -X importtime -> [{module, self_us, cumulative_us, depth}]."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            rows.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    return rows
+
+
+def measure_once(module: str, env: Dict[str, str] | None = None) -> List[Dict]:
+    """Импортирует module в новом интерпретаторе и возвращает разобранный отчёт importtime."""
+    run_env = {k: v for k, v in os.environ.items() if k not in ("CLOUD_RU_API_KEY", "API_KEY", "OPENAI_API_KEY")}
+    run_env.update(env or {})
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=run_env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"импорт {module} завершился с ошибкой:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def summarize(runs: List[List[Dict]], module: str, top: int) -> dict:
+    totals = [next(r["cumulative_us"] for r in rows if r["module"] == module) / 1000 for rows in runs]
+    last = runs[-1]
+    heaviest = sorted((r for r in last if r["depth"] == 1), key=lambda r: -r["cumulative_us"])[:top]
+    # LazyLoader-модули попадают в sys.modules сразу, но в importtime — только после реальной загрузки
+    imported = {r["module"].split(".")[0] for r in last}
+    return {
+        "module": module,
+        "runs": len(runs),
+        "import_ms": {
+            "min": round(min(totals), 1),
+            "median": round(statistics.median(totals), 1),
+            "max": round(max(totals), 1),
+        },
+        "top_imports_ms": {r["module"]: round(r["cumulative_us"] / 1000, 1) for r in heaviest},
+        "deferred_loaded_eagerly": [name for name in DEFERRED_MODULES if name in imported],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Замер времени импорта приложения (-X importtime)")
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="сколько самых тяжёлых импортов верхнего уровня показать")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(max(1, args.runs))]
+    print(json.dumps(summarize(runs, args.module, args.top), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
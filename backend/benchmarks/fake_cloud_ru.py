@@ -0,0 +1,320 @@
+"""
+Локальный OpenAI-совместимый стенд вместо Cloud.ru Foundation Models.
+
+Отдаёт заготовленные ответы по типу промпта из backend/prompts и умеет
+имитировать задержки (логнормальное распределение), 429, 5xx и обрезанные
+ответы (finish_reason="length"). Используется для офлайн-замеров backend:
+
+    uvicorn backend.benchmarks.fake_cloud_ru:app --port 9000
+    CLOUD_RU_BASE_URL=http://127.0.0.1:9000/v1 uvicorn backend.main:app
+
+Параметры по умолчанию берутся из FAKE_LLM_* переменных окружения,
+на лету меняются через PUT /fake/config.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+try:
+    from backend.token_budget import estimate_tokens
+except ImportError:
+    from token_budget import estimate_tokens
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+
+class FakeConfig(BaseModel):
+    latency_median_ms: float = 300.0
+    latency_sigma: float = 0.5
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_truncate: float = 0.0
+    retry_after_s: int = 1
+    chunk_chars: int = 40
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency_median_ms=float(os.getenv("FAKE_LLM_LATENCY_MEDIAN_MS", "300")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            rate_429=float(os.getenv("FAKE_LLM_RATE_429", "0")),
+            rate_5xx=float(os.getenv("FAKE_LLM_RATE_5XX", "0")),
+            rate_truncate=float(os.getenv("FAKE_LLM_RATE_TRUNCATE", "0")),
+            retry_after_s=int(os.getenv("FAKE_LLM_RETRY_AFTER_S", "1")),
+            chunk_chars=int(os.getenv("FAKE_LLM_CHUNK_CHARS", "40")),
+            seed=int(seed) if seed else None,
+        )
+
+
+def _manual_suite(classes: List[str], per_class: int, feature: str) -> str:
+    lines = ["import allure", "from allure import step as allure_step", ""]
+    for cls in classes:
+        lines += [
+            "@allure.manual",
+            '@allure.label("owner", "qa_team")',
+            f'@allure.feature("{feature}")',
+            f"class {cls}:",
+        ]
+        for i in range(1, per_class + 1):
+            lines += [
+                f'    @allure.title("{cls}: проверка {i}")',
+                "    @allure.tag(\"NORMAL\")",
+                f"    def test_case_{i}(self):",
+                '        with allure_step("Arrange: подготовить окружение"):',
+                "            pass",
+                '        with allure_step("Act: выполнить действие"):',
+                "            pass",
+                '        with allure_step("Assert: проверить результат"):',
+                "            pass",
+                "",
+            ]
+    return "\n".join(lines)
+
+
+def _auto_suite(feature: str, calls: List[str]) -> str:
+    lines = [
+        "import allure",
+        "import pytest",
+        "import requests",
+        "",
+        'BASE_URL = "https://compute.api.cloud.ru"',
+        "",
+    ]
+    for i, call in enumerate(calls, 1):
+        method, path = call.split(" ", 1)
+        lines += [
+            '@allure.label("owner", "qa_team")',
+            f'@allure.feature("{feature}")',
+            f'@allure.title("{method} {path}")',
+            f"def test_endpoint_{i}():",
+            "    # Arrange",
+            '    headers = {"Authorization": "Bearer token"}',
+            "    # Act",
+            f'    response = requests.{method.lower()}(f"{{BASE_URL}}{path}", headers=headers)',
+            "    # Assert",
+            "    assert response.status_code in (200, 201, 204)",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+CANNED_RESPONSES: Dict[str, str] = {
+    "manual_ui": _manual_suite(
+        ["MainPageTests", "CatalogTests", "ComputeConfigTests", "ConfigurationManagementTests", "MobileResponsivenessTests"],
+        6,
+        "Калькулятор цен",
+    ),
+    "manual_api": _manual_suite(["VMTests", "DiskTests", "FlavorTests"], 10, "Compute API"),
+    "auto_api": _auto_suite("Compute API", ["GET /api/v1/vms", "GET /api/v1/disks", "GET /api/v1/flavors"]),
+    "auto_ui": _auto_suite("UI", ["GET /", "GET /calculator"]),
+    "optimize": _manual_suite(["OptimizedTests"], 5, "Оптимизация"),
+    "unit_ci": (
+        "import pytest\nfrom fastapi.testclient import TestClient\nfrom main import app\n\n"
+        "client = TestClient(app)\n\n\ndef test_endpoint():\n    # Arrange\n    url = \"/\"\n"
+        "    # Act\n    res = client.get(url)\n    # Assert\n    assert res.status_code == 200\n"
+        "```yaml\nstages:\n  - build\n  - test\n\ntest:\n  stage: test\n  script:\n    - pytest -q\n```\n"
+    ),
+    "test_plan": (
+        "# Тест-план\n\n## Приоритет P0\n- Создание ВМ\n- Удаление ВМ\n\n"
+        "## Приоритет P1\n- Изменение конфигурации\n\n## Риски\n- Нестабильность окружения\n"
+    ),
+    "custom": _manual_suite(["CustomTests"], 3, "Custom"),
+}
+
+
+def _load_signatures() -> Dict[str, List[str]]:
+    """Строки, встречающиеся только в одном шаблоне, — по ним определяется тип промпта."""
+    templates = {path.stem: path.read_text(encoding="utf-8") for path in PROMPTS_DIR.glob("*.txt")}
+    line_owners: Dict[str, set] = {}
+    for name, text in templates.items():
+        for line in text.splitlines():
+            line = line.strip()
+            if len(line) >= 30 and "{" not in line:
+                line_owners.setdefault(line, set()).add(name)
+    signatures: Dict[str, List[str]] = {}
+    for line, owners in line_owners.items():
+        if len(owners) == 1:
+            signatures.setdefault(next(iter(owners)), []).append(line)
+    return {name: lines[:5] for name, lines in signatures.items()}
+
+
+def detect_prompt_type(prompt: str, signatures: Dict[str, List[str]]) -> str:
+    for name, lines in signatures.items():
+        if any(line in prompt for line in lines):
+            return name
+    return "custom"
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    app = FastAPI(title="Fake Cloud.ru Foundation Models")
+    app.state.config = config or FakeConfig.from_env()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.signatures = _load_signatures()
+    app.state.responses = dict(CANNED_RESPONSES)
+    app.state.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0, "truncated": 0}
+    # Имитация кэша префикса: повторный системный промпт учитывается как cached_tokens
+    app.state.seen_prefixes = set()
+
+    responses_dir = os.getenv("FAKE_LLM_RESPONSES_DIR")
+    if responses_dir:
+        # Записанные реальные ответы модели: <тип>.txt перекрывают встроенные заготовки
+        for path in Path(responses_dir).glob("*.txt"):
+            app.state.responses[path.stem] = path.read_text(encoding="utf-8")
+
+    def sample_latency_s() -> float:
+        cfg: FakeConfig = app.state.config
+        if cfg.latency_median_ms <= 0:
+            return 0.0
+        return app.state.rng.lognormvariate(math.log(cfg.latency_median_ms), cfg.latency_sigma) / 1000
+
+    def injected_error() -> JSONResponse | None:
+        cfg: FakeConfig = app.state.config
+        roll = app.state.rng.random()
+        if roll < cfg.rate_429:
+            app.state.stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_error", "code": 429}},
+                headers={"Retry-After": str(cfg.retry_after_s)},
+            )
+        if roll < cfg.rate_429 + cfg.rate_5xx:
+            status_code = app.state.rng.choice([500, 502, 503])
+            app.state.stats["server_errors"] += 1
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": {"message": "Upstream model error", "type": "server_error", "code": status_code}},
+            )
+        return None
+
+    def build_answer(body: dict) -> tuple[str, str, int]:
+        """(content, finish_reason, prompt_tokens) по запросу chat/completions."""
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        content = app.state.responses[detect_prompt_type(prompt, app.state.signatures)]
+        finish_reason = "stop"
+
+        # Запрос-продолжение: уже выданная часть ответа пришла в роли assistant
+        partial = "".join(str(m.get("content", "")) for m in messages if m.get("role") == "assistant")
+        if partial and content.startswith(partial):
+            content = content[len(partial):]
+
+        max_tokens = body.get("max_tokens")
+        if app.state.rng.random() < app.state.config.rate_truncate:
+            content = content[: int(len(content) * app.state.rng.uniform(0.3, 0.9))]
+            finish_reason = "length"
+        elif max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[: int(len(content) * max_tokens / estimate_tokens(content))]
+            finish_reason = "length"
+        if finish_reason == "length":
+            app.state.stats["truncated"] += 1
+        return content, finish_reason, estimate_tokens(prompt)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "Qwen/Qwen3-Next-80B-A3B-Instruct", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.stats["requests"] += 1
+        latency_s = sample_latency_s()
+
+        error = injected_error()
+        if error is not None:
+            await asyncio.sleep(latency_s / 10)
+            return error
+
+        content, finish_reason, prompt_tokens = build_answer(body)
+        cached_tokens = 0
+        messages = body.get("messages") or [{}]
+        if messages[0].get("role") == "system":
+            prefix = str(messages[0].get("content", ""))
+            if prefix in app.state.seen_prefixes:
+                cached_tokens = estimate_tokens(prefix)
+            app.state.seen_prefixes.add(prefix)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": prompt_tokens + estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "")
+        app.state.stats["ok"] += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency_s)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            }
+
+        step = max(1, app.state.config.chunk_chars)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)] or [""]
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, reason: str | None = None, chunk_usage: dict | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": reason}],
+            }
+            if chunk_usage:
+                payload["usage"] = chunk_usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            # Задержка распределяется между первым токеном и последующими чанками
+            await asyncio.sleep(latency_s / 2)
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in pieces:
+                await asyncio.sleep(latency_s / 2 / len(pieces))
+                yield chunk({"content": piece})
+            yield chunk({}, finish_reason)
+            if include_usage:
+                yield chunk({}, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/fake/config")
+    async def get_config():
+        return app.state.config
+
+    @app.put("/fake/config")
+    async def update_config(config: FakeConfig):
+        app.state.config = config
+        app.state.rng = random.Random(config.seed)
+        return config
+
+    @app.get("/fake/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,95 @@
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker одной модели.
+    closed: запросы идут в модель; failure_threshold ошибок за window_s секунд → open.
+    open: запросы сразу уходят на fallback; через cooldown_s → half_open.
+    half_open: один пробный запрос; успех → closed, ошибка → снова open.
+    Зависший пробный запрос (без исхода дольше cooldown_s) не блокирует следующую пробу.
+    """
+
+    def __init__(self, failure_threshold: int = 3, window_s: float = 60.0, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.window_s = window_s
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self._failures: "deque[float]" = deque()
+        self._opened_at = 0.0
+        self._probe_started_at: float | None = None
+        self.opened_count = 0
+        self.short_circuited = 0
+
+    def allow_request(self) -> bool:
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.cooldown_s:
+                self.short_circuited += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started_at = None
+
+        if self.state == HALF_OPEN:
+            if self._probe_started_at is not None and now - self._probe_started_at < self.cooldown_s:
+                self.short_circuited += 1
+                return False
+            self._probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self._failures.clear()
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window_s:
+            self._failures.popleft()
+        if len(self._failures) >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+        self._probe_started_at = None
+        self.opened_count += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "recent_failures": len(self._failures),
+            "opened_count": self.opened_count,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class BreakerRegistry:
+    """Отдельный circuit breaker на каждую модель, создаётся при первом обращении."""
+
+    def __init__(self, failure_threshold: int = 3, window_s: float = 60.0, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.window_s = window_s
+        self.cooldown_s = cooldown_s
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.window_s, self.cooldown_s)
+            self._breakers[model] = breaker
+        return breaker
+
+    def stats(self) -> dict:
+        return {model: breaker.stats() for model, breaker in self._breakers.items()}
@@ -1,64 +1,574 @@
 import os
-from openai import AsyncOpenAI
-from typing import List, Dict
+import re
+import httpx
+from typing import AsyncIterator, List, Dict
+from contextvars import ContextVar
 from dotenv import load_dotenv
+from pathlib import Path
 import traceback
 
+try:
+    from backend.llm_cache import LLMCache, make_cache_key
+    from backend.singleflight import SingleFlight
+    from backend.limiter import AdaptiveLimiter, LimiterOverloaded
+    from backend.http_pool import build_http_client, pool_stats
+    from backend.circuit_breaker import BreakerRegistry
+    from backend.hedging import HedgePolicy
+    from backend.token_budget import CONTEXT_WINDOW, SAFETY_MARGIN_RATIO, estimate_messages_tokens
+except ImportError:
+    from llm_cache import LLMCache, make_cache_key
+    from singleflight import SingleFlight
+    from limiter import AdaptiveLimiter, LimiterOverloaded
+    from http_pool import build_http_client, pool_stats
+    from circuit_breaker import BreakerRegistry
+    from hedging import HedgePolicy
+    from token_budget import CONTEXT_WINDOW, SAFETY_MARGIN_RATIO, estimate_messages_tokens
+
 load_dotenv()
 
 DEFAULT_MODEL = "Qwen/Qwen3-Next-80B-A3B-Instruct"
 
-api_key = (
-    os.getenv("CLOUD_RU_API_KEY") or
-    os.getenv("API_KEY") or
-    os.getenv("OPENAI_API_KEY")
-)
 
-if not api_key:
-    raise OSError("Static API Key не найден! Сгенерируй в Cloud.ru Console → API Keys (Bearer token)")
+def _api_key() -> str | None:
+    return (
+        os.getenv("CLOUD_RU_API_KEY") or
+        os.getenv("API_KEY") or
+        os.getenv("OPENAI_API_KEY")
+    )
+
+
+def _parse_timeouts(value: str) -> Dict[str, float]:
+    """'manual_ui=180,manual_api=180' -> {'manual_ui': 180.0, 'manual_api': 180.0}"""
+    timeouts: Dict[str, float] = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+LLM_READ_TIMEOUT_S = float(os.getenv("LLM_READ_TIMEOUT_S", "90"))
+LLM_POOL_TIMEOUT_S = float(os.getenv("LLM_POOL_TIMEOUT_S", "10"))
+# Таймауты чтения по типу запроса: длинные ручные наборы (max_tokens=8700) генерируются дольше
+LLM_READ_TIMEOUTS = _parse_timeouts(os.getenv("LLM_READ_TIMEOUTS", "manual_ui=180,manual_api=180"))
+
+# Адрес OpenAI-совместимого API; для офлайн-нагрузочных прогонов — локальный стенд backend/benchmarks/fake_cloud_ru.py
+BASE_URL = os.getenv("CLOUD_RU_BASE_URL", "https://foundation-models.api.cloud.ru/v1")
+
+# Клиенты создаются при первом вызове модели (get_client): импорт модуля не тянет openai,
+# не создаёт SSL-контекст и не падает без ключа — это нужно тестам, CLI и холодному старту воркеров
+http_client: httpx.AsyncClient | None = None
+client = None
+
+
+def get_client():
+    """AsyncOpenAI поверх общего пула соединений; создаётся один раз при первом обращении."""
+    global client, http_client
+    if client is not None:
+        return client
+
+    api_key = _api_key()
+    if not api_key:
+        raise OSError("Static API Key не найден! Сгенерируй в Cloud.ru Console → API Keys (Bearer token)")
+
+    from openai import AsyncOpenAI
+
+    http_client = build_http_client(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "16")),
+        keepalive_expiry_s=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_S", "60")),
+        http2=os.getenv("LLM_HTTP2", "0").lower() in ("1", "true", "yes"),
+        connect_timeout_s=LLM_CONNECT_TIMEOUT_S,
+        read_timeout_s=LLM_READ_TIMEOUT_S,
+        pool_timeout_s=LLM_POOL_TIMEOUT_S,
+    )
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=BASE_URL,
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+        default_headers={"Authorization": f"Bearer {api_key}"},
+        http_client=http_client,
+    )
+    return client
+
+
+def _timeout_for(request_type: str | None) -> httpx.Timeout:
+    """Таймаут запроса к модели с учётом типа генерации."""
+    read_timeout = LLM_READ_TIMEOUTS.get(request_type or "", LLM_READ_TIMEOUT_S)
+    return httpx.Timeout(read_timeout, connect=LLM_CONNECT_TIMEOUT_S, pool=LLM_POOL_TIMEOUT_S)
+
+
+async def aclose() -> None:
+    """
+    Закрывает пул соединений (вызывается при остановке приложения). Клиенты сбрасываются:
+    следующий старт (повторный lifespan, reload) создаст новый пул через get_client.
+    """
+    global client, http_client
+    closing = http_client
+    client = None
+    http_client = None
+    if closing is not None:
+        await closing.aclose()
+
+# Кэш ответов для temperature=0: одинаковые (model, messages, параметры) дают одинаковый ответ
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(Path(__file__).parent / ".cache" / "llm_cache.sqlite3"))
+# Одинаковые одновременные детерминированные вызовы разделяют один запрос к модели
+LLM_SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "1").lower() not in ("0", "false", "no")
+# Хеджирование: зависший вызов дублируется после percentile недавних задержек своего типа
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0").lower() in ("1", "true", "yes")
+
+llm_cache: LLMCache
+inflight: SingleFlight
+limiter: AdaptiveLimiter
+breakers: BreakerRegistry
+hedge: HedgePolicy
+usage_stats: Dict[str, int]
+continuation_stats: Dict[str, int]
+
+
+def reset_state(persist_cache: bool = True) -> None:
+    """
+    Создаёт заново состояние слоя вызовов модели: кэш ответов, склейку вызовов,
+    окно конкурентности, circuit breaker'ы, хеджирование и счётчики.
+    persist_cache=False — кэш только в памяти (тесты).
+    """
+    global llm_cache, inflight, limiter, breakers, hedge, usage_stats, continuation_stats
+    llm_cache = LLMCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256")),
+        ttl_s=float(os.getenv("LLM_CACHE_TTL_S", "86400")),
+        db_path=(LLM_CACHE_PATH or None) if persist_cache else None,
+    )
+    inflight = SingleFlight()
+    # Адаптивное окно одновременных запросов к модели с ограниченной очередью ожидания
+    limiter = AdaptiveLimiter(
+        initial_limit=int(os.getenv("LLM_CONCURRENCY_INITIAL", "4")),
+        min_limit=int(os.getenv("LLM_CONCURRENCY_MIN", "1")),
+        max_limit=int(os.getenv("LLM_CONCURRENCY_MAX", "16")),
+        max_queue=int(os.getenv("LLM_QUEUE_SIZE", "32")),
+        queue_timeout_s=float(os.getenv("LLM_QUEUE_TIMEOUT_S", "30")),
+    )
+    # Circuit breaker на модель: при серии отказов основной модели сразу идём на DEFAULT_MODEL
+    breakers = BreakerRegistry(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+        window_s=float(os.getenv("LLM_BREAKER_WINDOW_S", "60")),
+        cooldown_s=float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30")),
+    )
+    hedge = HedgePolicy(
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        budget_ratio=float(os.getenv("LLM_HEDGE_BUDGET", "0.05")),
+        min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        min_delay_s=float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1")),
+    )
+    # Токены по данным upstream (usage), включая prompt_tokens_details.cached_tokens — попадания в кэш префикса
+    usage_stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    continuation_stats = {"truncated": 0, "continuations": 0, "exhausted": 0}
+
+
+reset_state()
 
-client = AsyncOpenAI(
-    api_key=api_key,
-    base_url="https://foundation-models.api.cloud.ru/v1",
-    timeout=90.0,
-    max_retries=3,  
-    default_headers={"Authorization": f"Bearer {api_key}"},  
+# Продолжение ответов, оборванных на max_tokens (finish_reason="length")
+LLM_MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "3"))
+CONTINUATION_PROMPT = (
+    "Ответ оборвался на лимите длины. Продолжи ровно с места обрыва: "
+    "не повторяй уже выведенный текст, без пояснений и markdown."
 )
+# Сколько символов хвоста сверять с началом продолжения и минимальный повтор, который обрезается
+CONTINUATION_OVERLAP_WINDOW = 400
+CONTINUATION_MIN_OVERLAP = 12
+CONTINUATION_MIN_TOKENS = 256
+
+_request_usage: ContextVar[Dict[str, int] | None] = ContextVar("llm_request_usage", default=None)
+
+
+def track_usage() -> Dict[str, int]:
+    """
+    Начинает учёт токенов для текущей задачи (одного запроса генерации):
+    usage всех вызовов модели внутри неё суммируется в возвращённый dict.
+    """
+    usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    _request_usage.set(usage)
+    return usage
+
+
+def _record_usage(usage) -> None:
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    values = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+    for target in (usage_stats, _request_usage.get()):
+        if target is None:
+            continue
+        target["calls"] += 1
+        for name, value in values.items():
+            target[name] += value
+
+
+def _is_model_failure(error: Exception) -> bool:
+    """Ошибки, которые считаются отказом модели для circuit breaker: модельные, 5xx, таймауты."""
+    if "model" in str(error).lower():
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None and status_code >= 500:
+        return True
+    return "timeout" in type(error).__name__.lower()
+
+
+def _request_key(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    model: str,
+) -> str | None:
+    """
+    Ключ детерминированного запроса (для кэша и склейки одинаковых вызовов)
+    или None, если temperature > 0 и ответы не воспроизводимы.
+    """
+    if temperature != 0:
+        return None
+    return make_cache_key(
+        model,
+        messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=0.95,
+        presence_penalty=0.0,
+        frequency_penalty=0.0,
+    )
+
+
+def get_llm_stats() -> dict:
+    """Счётчики слоя вызовов модели (для /debug/llm)."""
+    return {
+        "cache": llm_cache.stats(),
+        "singleflight": inflight.stats(),
+        "limiter": limiter.stats(),
+        "http_pool": pool_stats(http_client) if http_client is not None else {},
+        "breakers": breakers.stats(),
+        "hedging": hedge.stats(),
+        "continuations": dict(continuation_stats),
+        "usage": {
+            **usage_stats,
+            "cached_ratio": round(usage_stats["cached_tokens"] / usage_stats["prompt_tokens"], 4)
+            if usage_stats["prompt_tokens"] else 0.0,
+        },
+    }
+
+
+def _continuation_messages(messages: List[Dict[str, str]], partial: str) -> List[Dict[str, str]]:
+    return list(messages) + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUATION_PROMPT},
+    ]
+
+
+def _continuation_budget(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """max_tokens для продолжения: не больше исходного лимита и остатка контекстного окна."""
+    margin = int(CONTEXT_WINDOW * SAFETY_MARGIN_RATIO)
+    return min(max_tokens, CONTEXT_WINDOW - margin - estimate_messages_tokens(messages))
+
+
+def _trim_overlap(partial: str, continuation: str) -> str:
+    """
+    Убирает из начала продолжения то, что модель повторила из хвоста уже полученного
+    текста (например, заново начатую оборванную строку), и открывающий markdown-блок.
+    """
+    continuation = re.sub(r"^```[\w]*[ \t]*\n", "", continuation)
+    tail = partial[-CONTINUATION_OVERLAP_WINDOW:]
+    for size in range(min(len(tail), len(continuation)), CONTINUATION_MIN_OVERLAP - 1, -1):
+        if tail.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
 
 async def call_evolution(
     messages: List[Dict[str, str]],
     temperature: float = 0.0,
     max_tokens: int = 2000,
     model: str | None = None,
+    use_cache: bool = True,
+    request_type: str | None = None,
 ) -> str:
     """
     Вызов Cloud.ru Evolution Foundation Model (Qwen 3 Next 80B).
     OpenAI-compatible API по документации.
+    Детерминированные вызовы (temperature=0) обслуживаются из кэша, а одинаковые
+    одновременные вызовы склеиваются в один запрос к модели.
+    use_cache=False — не читать кэш (свежий ответ всё равно сохраняется).
+    request_type — тип генерации, по нему выбирается таймаут чтения и задержка хеджирования.
     """
     target_model = model or os.getenv("CLOUD_RU_MODEL") or DEFAULT_MODEL
 
+    request_key = _request_key(messages, temperature, max_tokens, target_model)
+    if request_key is None:
+        content, _ = await _complete_full(messages, temperature, max_tokens, target_model, request_type)
+        return content
+
+    if use_cache and LLM_CACHE_ENABLED:
+        cached = await llm_cache.get(request_key)
+        if cached is not None:
+            print(f"Ответ модели {target_model} взят из кэша")
+            return cached
+
+    async def complete_and_store() -> str:
+        content, answered_by = await _complete_full(messages, temperature, max_tokens, target_model, request_type)
+        # Ответ запасной модели не кэшируется под ключом основной: после восстановления она ответит сама
+        if LLM_CACHE_ENABLED and answered_by == target_model:
+            await llm_cache.set(request_key, content)
+        return content
+
+    if not LLM_SINGLEFLIGHT_ENABLED:
+        return await complete_and_store()
+    return await inflight.do(request_key, complete_and_store)
+
+
+async def _complete_full(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    target_model: str,
+    request_type: str | None = None,
+) -> tuple[str, str]:
+    """
+    Вызов модели, который дописывает ответ, оборванный на max_tokens: до LLM_MAX_CONTINUATIONS
+    запросов-продолжений с уже полученным текстом в роли assistant.
+    Возвращает (content, модель): target_model, только если она дала весь ответ.
+    """
+    content, finish_reason, answered_by = await _complete_hedged(
+        messages, temperature, max_tokens, target_model, request_type
+    )
+    if finish_reason == "length":
+        continuation_stats["truncated"] += 1
+
+    rounds = 0
+    while finish_reason == "length":
+        cont_messages = _continuation_messages(messages, content)
+        budget = _continuation_budget(cont_messages, max_tokens)
+        if rounds >= LLM_MAX_CONTINUATIONS or budget < CONTINUATION_MIN_TOKENS:
+            continuation_stats["exhausted"] += 1
+            print(f"Ответ модели {target_model} обрезан по max_tokens, продолжений больше нет ({rounds})")
+            break
+        rounds += 1
+        continuation_stats["continuations"] += 1
+        print(f"Ответ модели {target_model} обрезан по max_tokens, продолжение {rounds}/{LLM_MAX_CONTINUATIONS}")
+        more, finish_reason, model = await _complete_hedged(cont_messages, temperature, budget, target_model, request_type)
+        content += _trim_overlap(content, more)
+        if model != target_model:
+            answered_by = model
+
+    return content.strip(), answered_by
+
+
+async def _complete_hedged(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    target_model: str,
+    request_type: str | None = None,
+) -> tuple[str, str | None, str]:
+    """_complete с хеджированием (если включено): дублирующий вызов только при свободном слоте лимитера."""
+    if not LLM_HEDGE_ENABLED:
+        return await _complete(messages, temperature, max_tokens, target_model, request_type)
+    return await hedge.run(
+        request_type or "default",
+        lambda: _complete(messages, temperature, max_tokens, target_model, request_type),
+        has_capacity=limiter.has_free_slot,
+    )
+
+
+async def _complete(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    target_model: str,
+    request_type: str | None = None,
+) -> tuple[str, str | None, str]:
+    """
+    Один вызов chat.completions с fallback на DEFAULT_MODEL при ошибке модели.
+    Пока circuit breaker основной модели открыт, вызов сразу идёт в DEFAULT_MODEL.
+    Возвращает (content, finish_reason, модель, которая ответила).
+    """
+    breaker = breakers.get(target_model) if target_model != DEFAULT_MODEL else None
+    if breaker is not None and not breaker.allow_request():
+        print(f"Circuit breaker {target_model} открыт, сразу используем {DEFAULT_MODEL}")
+        return await _complete(messages, temperature, max_tokens, DEFAULT_MODEL, request_type)
+
+    llm = get_client()
     try:
-        print(f"Вызов модели: {target_model} (Static API Key: {'найден' if api_key else 'НЕ НАЙДЕН'})")
-
-        response = await client.chat.completions.create(
-            model=target_model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            top_p=0.95,
-            presence_penalty=0.0,
-            frequency_penalty=0.0,
-        )
-        content = response.choices[0].message.content
+        print(f"Вызов модели: {target_model} (Static API Key: найден)")
+
+        async with limiter.slot():
+            response = await llm.chat.completions.create(
+                model=target_model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=0.95,
+                presence_penalty=0.0,
+                frequency_penalty=0.0,
+                timeout=_timeout_for(request_type),
+            )
+        if breaker is not None:
+            breaker.record_success()
+        _record_usage(getattr(response, "usage", None))
+        choice = response.choices[0]
+        content = choice.message.content
         if content is None:
             raise ValueError("Пустой ответ от модели")
-        return content.strip()
-    except ValueError:
+        return content, getattr(choice, "finish_reason", None), target_model
+    except (ValueError, LimiterOverloaded):
         raise
     except Exception as e:
         error_msg = f"Cloud.ru API error: {str(e)}\n{traceback.format_exc()}"
         print(error_msg)
+        if breaker is not None and _is_model_failure(e):
+            breaker.record_failure()
         if "model" in str(e).lower() and target_model != DEFAULT_MODEL:
             print(f"Fallback на {DEFAULT_MODEL}...")
-            return await call_evolution(messages, temperature, max_tokens, model=DEFAULT_MODEL)
-        raise Exception(error_msg)
\ No newline at end of file
+            return await _complete(messages, temperature, max_tokens, DEFAULT_MODEL, request_type)
+        raise Exception(error_msg)
+
+
+async def stream_evolution(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.0,
+    max_tokens: int = 2000,
+    model: str | None = None,
+    use_cache: bool = True,
+    request_type: str | None = None,
+) -> AsyncIterator[str]:
+    """
+    Потоковый вызов Cloud.ru Evolution (stream=True).
+    Отдаёт фрагменты текста по мере их генерации моделью; попадание в кэш отдаётся одним фрагментом.
+    """
+    target_model = model or os.getenv("CLOUD_RU_MODEL") or DEFAULT_MODEL
+
+    request_key = _request_key(messages, temperature, max_tokens, target_model)
+    if request_key is not None and use_cache and LLM_CACHE_ENABLED:
+        cached = await llm_cache.get(request_key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks: list[str] = []
+    outcome: Dict[str, str | None] = {}
+    async for delta in _stream_complete(messages, temperature, max_tokens, target_model, request_type, outcome):
+        chunks.append(delta)
+        yield delta
+    answered_by = outcome.get("model")
+
+    if outcome.get("finish_reason") == "length":
+        continuation_stats["truncated"] += 1
+    rounds = 0
+    while outcome.get("finish_reason") == "length":
+        partial = "".join(chunks)
+        cont_messages = _continuation_messages(messages, partial)
+        budget = _continuation_budget(cont_messages, max_tokens)
+        if rounds >= LLM_MAX_CONTINUATIONS or budget < CONTINUATION_MIN_TOKENS:
+            continuation_stats["exhausted"] += 1
+            break
+        rounds += 1
+        continuation_stats["continuations"] += 1
+        outcome = {}
+        # Начало продолжения копится, пока не станет ясно, повторяет ли оно хвост ответа
+        head = ""
+        trimmed = False
+        async for delta in _stream_complete(cont_messages, temperature, budget, target_model, request_type, outcome):
+            if not trimmed:
+                head += delta
+                if len(head) < CONTINUATION_OVERLAP_WINDOW:
+                    continue
+                delta = _trim_overlap(partial, head)
+                trimmed = True
+            if delta:
+                chunks.append(delta)
+                yield delta
+        if not trimmed and head:
+            delta = _trim_overlap(partial, head)
+            if delta:
+                chunks.append(delta)
+                yield delta
+        if outcome.get("model") != target_model:
+            answered_by = outcome.get("model")
+
+    # Ответ запасной модели не кэшируется под ключом основной
+    if request_key is not None and LLM_CACHE_ENABLED and answered_by == target_model:
+        await llm_cache.set(request_key, "".join(chunks).strip())
+
+
+async def _stream_complete(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    target_model: str,
+    request_type: str | None = None,
+    outcome: Dict[str, str | None] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Потоковый вызов chat.completions с fallback на DEFAULT_MODEL, пока ничего не отдано.
+    finish_reason последнего чанка записывается в outcome["finish_reason"],
+    модель, которая ответила, — в outcome["model"].
+    """
+    breaker = breakers.get(target_model) if target_model != DEFAULT_MODEL else None
+    if breaker is not None and not breaker.allow_request():
+        print(f"Circuit breaker {target_model} открыт, сразу используем {DEFAULT_MODEL}")
+        async for delta in _stream_complete(messages, temperature, max_tokens, DEFAULT_MODEL, request_type, outcome):
+            yield delta
+        return
+
+    received = False
+    llm = get_client()
+
+    try:
+        print(f"Потоковый вызов модели: {target_model}")
+
+        async with limiter.slot():
+            stream = await llm.chat.completions.create(
+                model=target_model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=0.95,
+                presence_penalty=0.0,
+                frequency_penalty=0.0,
+                stream=True,
+                timeout=_timeout_for(request_type),
+            )
+            if breaker is not None:
+                breaker.record_success()
+            if outcome is not None:
+                outcome["model"] = target_model
+            async for chunk in stream:
+                # usage в потоке приходит отдельным финальным чанком, если upstream его отдаёт
+                _record_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                finish_reason = getattr(chunk.choices[0], "finish_reason", None)
+                if finish_reason and outcome is not None:
+                    outcome["finish_reason"] = finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    received = True
+                    yield delta
+    except LimiterOverloaded:
+        raise
+    except Exception as e:
+        error_msg = f"Cloud.ru API error: {str(e)}\n{traceback.format_exc()}"
+        print(error_msg)
+        if breaker is not None and _is_model_failure(e):
+            breaker.record_failure()
+        # Fallback возможен только пока клиенту ещё ничего не отправлено
+        if not received and "model" in str(e).lower() and target_model != DEFAULT_MODEL:
+            print(f"Fallback на {DEFAULT_MODEL}...")
+            async for delta in _stream_complete(messages, temperature, max_tokens, DEFAULT_MODEL, request_type, outcome):
+                yield delta
+            return
+        raise Exception(error_msg)
+
+    if not received:
+        raise ValueError("Пустой ответ от модели")
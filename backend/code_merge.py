@@ -0,0 +1,74 @@
+import ast
+import re
+from typing import List, Set, Tuple
+
+_IMPORT_LINE_RE = re.compile(r"^(import|from)\s+\S")
+_TEST_DEF_RE = re.compile(r"(\bdef\s+)(test_\w+)(\s*\()")
+_CLASS_RE = re.compile(r"^(class\s+)(\w+)(\s*[:(])", re.MULTILINE)
+
+
+def split_imports(code: str) -> Tuple[List[str], str]:
+    """
+    Отделяет импорты верхнего уровня от остального кода модуля.
+    Для кода, который не разбирается ast (обрезанный ответ модели),
+    импортами считаются строки с нулевым отступом, начинающиеся с import/from.
+    """
+    lines = code.splitlines()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        imports = [line.rstrip() for line in lines if _IMPORT_LINE_RE.match(line)]
+        body = [line for line in lines if not _IMPORT_LINE_RE.match(line)]
+        return imports, "\n".join(body).strip("\n")
+
+    import_rows: Set[int] = set()
+    imports: List[str] = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            rows = range(node.lineno - 1, node.end_lineno)
+            import_rows.update(rows)
+            imports.append("\n".join(lines[i].rstrip() for i in rows))
+    body = [line for i, line in enumerate(lines) if i not in import_rows]
+    return imports, "\n".join(body).strip("\n")
+
+
+def _unique(name: str, seen: Set[str]) -> str:
+    candidate, n = name, 2
+    while candidate in seen:
+        candidate = f"{name}_{n}"
+        n += 1
+    seen.add(candidate)
+    return candidate
+
+
+def merge_modules(modules: List[str]) -> str:
+    """
+    Склеивает несколько сгенерированных модулей в один: импорты без повторов
+    (в порядке первого появления) сверху, затем тела модулей по порядку.
+    Совпадающие имена тестов и классов из разных модулей получают суффикс _2, _3, ...
+    """
+    imports: List[str] = []
+    bodies: List[str] = []
+    test_names: Set[str] = set()
+    class_names: Set[str] = set()
+
+    for code in modules:
+        module_imports, body = split_imports(code)
+        for statement in module_imports:
+            if statement not in imports:
+                imports.append(statement)
+
+        # Внутри одного модуля дубликаты не трогаем — это забота валидатора
+        local_tests = {m.group(2) for m in _TEST_DEF_RE.finditer(body)}
+        test_renames = {name: _unique(name, test_names) for name in sorted(local_tests)}
+        local_classes = {m.group(2) for m in _CLASS_RE.finditer(body)}
+        class_renames = {name: _unique(name, class_names) for name in sorted(local_classes)}
+
+        body = _TEST_DEF_RE.sub(lambda m: m.group(1) + test_renames[m.group(2)] + m.group(3), body)
+        body = _CLASS_RE.sub(lambda m: m.group(1) + class_renames[m.group(2)] + m.group(3), body)
+        if body.strip():
+            bodies.append(body)
+
+    parts = ["\n".join(imports)] if imports else []
+    parts.extend(bodies)
+    return "\n\n\n".join(parts) + "\n"
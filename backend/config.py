@@ -3,7 +3,8 @@ from typing import Optional
 from pydantic import ConfigDict
 
 class Settings(BaseSettings):
-    CLOUD_RU_API_KEY: str
+    # Ключ проверяется при первом вызове модели (cloud_ru.get_client), а не при импорте
+    CLOUD_RU_API_KEY: Optional[str] = None
     CLOUD_RU_MODEL: str = "Qwen/Qwen3-Next-80B-A3B-Instruct"
     GITLAB_URL: Optional[str] = ""
     GITLAB_TOKEN: Optional[str] = ""
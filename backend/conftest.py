@@ -1,7 +1,32 @@
 """Pytest configuration for backend tests."""
+import atexit
+import os
+import shutil
 import sys
+import tempfile
 from pathlib import Path
 
+import pytest
+
 _project_root = Path(__file__).parent.parent
 if str(_project_root) not in sys.path:
-    sys.path.insert(0, str(_project_root))
\ No newline at end of file
+    sys.path.insert(0, str(_project_root))
+
+# Дисковые кэши читаются при импорте backend.main: до него уводим их во временный
+# каталог сессии, чтобы тесты не писали в backend/.cache
+_cache_root = Path(tempfile.mkdtemp(prefix="testops-cache-"))
+atexit.register(shutil.rmtree, _cache_root, ignore_errors=True)
+os.environ["OPENAPI_CACHE_DIR"] = str(_cache_root / "openapi")
+os.environ["PROMPT_BYTECODE_CACHE_DIR"] = str(_cache_root / "jinja")
+os.environ["SPEC_UPLOAD_DIR"] = str(_cache_root / "specs")
+os.environ["GENERATION_STORE_PATH"] = str(_cache_root / "generations.sqlite3")
+os.environ["LLM_CACHE_PATH"] = str(_cache_root / "llm_cache.sqlite3")
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_state():
+    """Кэш ответов (только в памяти), лимитер, breaker'ы, хеджирование и счётчики модели — свои у каждого теста."""
+    from backend import cloud_ru
+
+    cloud_ru.reset_state(persist_cache=False)
+    return cloud_ru
@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Tuple
+
+from pydantic import BaseModel
+
+try:
+    from backend.path_trie import PathTrie, endpoint_key, normalize_path
+except ImportError:
+    from path_trie import PathTrie, endpoint_key, normalize_path
+
+
+class EndpointSelection(BaseModel):
+    """Результат отбора: эндпоинты в порядке спецификации и критерии, ничего не нашедшие."""
+    endpoints: List[dict]
+    total: int
+    mode: str  # all | explicit | auto
+    unmatched: List[str] = []
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return tuple(endpoint_key(ep) for ep in self.endpoints)
+
+
+class EndpointIndex:
+    """
+    Индекс эндпоинтов спецификации для отбора в промпт auto_api:
+    по тегу, префиксу пути, operationId / "METHOD /path" и по URL из кода тестов
+    (шаблоны путей с {param} сопоставляются с конкретными URL).
+    Строится один раз на версию спецификации.
+    """
+
+    def __init__(self, endpoints: List[dict]):
+        self.endpoints = endpoints
+        self._by_tag: Dict[str, List[int]] = {}
+        self._by_operation: Dict[str, List[int]] = {}
+        for i, ep in enumerate(endpoints):
+            for tag in ep.get("tags") or []:
+                self._by_tag.setdefault(tag.casefold(), []).append(i)
+            if ep.get("operationId"):
+                self._by_operation.setdefault(ep["operationId"], []).append(i)
+            self._by_operation.setdefault(endpoint_key(ep).upper(), []).append(i)
+        self._position = {id(ep): i for i, ep in enumerate(endpoints)}
+        self.trie = PathTrie(endpoints)
+
+    @property
+    def tags(self) -> List[str]:
+        return sorted({tag for ep in self.endpoints for tag in ep.get("tags") or []})
+
+    def by_tags(self, tags: Iterable[str]) -> Tuple[set, List[str]]:
+        found, unmatched = set(), []
+        for tag in tags:
+            hits = self._by_tag.get(tag.strip().casefold())
+            if hits:
+                found.update(hits)
+            else:
+                unmatched.append(tag)
+        return found, unmatched
+
+    def by_path_prefixes(self, prefixes: Iterable[str]) -> Tuple[set, List[str]]:
+        found, unmatched = set(), []
+        for prefix in prefixes:
+            norm = normalize_path(prefix)
+            hits = {
+                i for i, ep in enumerate(self.endpoints)
+                if ep["path"] == norm or ep["path"].startswith(norm.rstrip("/") + "/") or norm == "/"
+            }
+            if hits:
+                found.update(hits)
+            else:
+                unmatched.append(prefix)
+        return found, unmatched
+
+    def by_operations(self, operations: Iterable[str]) -> Tuple[set, List[str]]:
+        found, unmatched = set(), []
+        for op in operations:
+            key = op.strip()
+            if " " in key:
+                method, path = key.split(None, 1)
+                key = f"{method.upper()} {normalize_path(path)}"
+            hits = self._by_operation.get(key) or self._by_operation.get(key.upper())
+            if hits:
+                found.update(hits)
+            else:
+                unmatched.append(op)
+        return found, unmatched
+
+    def by_calls(self, urls: Iterable[str]) -> Tuple[set, List[str]]:
+        """
+        URL из кода тестов: совпадение с шаблоном пути по дереву сегментов, а для
+        обрезанных f-строк (f"/api/v1/disks/{disk_id}" -> "/api/v1/disks/") — и всё глубже.
+        """
+        found, unmatched = set(), []
+        for url in urls:
+            hits = {self._position[id(ep)] for ep in self.trie.match(url, prefix=url.rstrip().endswith("/"))}
+            if hits:
+                found.update(hits)
+            else:
+                unmatched.append(url)
+        return found, unmatched
+
+    def select(
+        self,
+        tags: List[str] | None = None,
+        paths: List[str] | None = None,
+        operations: List[str] | None = None,
+        calls: List[str] | None = None,
+    ) -> EndpointSelection:
+        """
+        Явные критерии (tags/paths/operations) объединяются; без них эндпоинты
+        отбираются по вызовам из кода (calls). Если ничего не задано или вызовы
+        ни с чем не совпали — в промпт идёт вся спецификация.
+        """
+        total = len(self.endpoints)
+        if tags or paths or operations:
+            found, unmatched = set(), []
+            for criteria, lookup in ((tags, self.by_tags), (paths, self.by_path_prefixes), (operations, self.by_operations)):
+                if criteria:
+                    hits, missed = lookup(criteria)
+                    found |= hits
+                    unmatched.extend(missed)
+            return EndpointSelection(
+                endpoints=[self.endpoints[i] for i in sorted(found)], total=total, mode="explicit", unmatched=unmatched
+            )
+        if calls:
+            found, unmatched = self.by_calls(calls)
+            if found:
+                return EndpointSelection(
+                    endpoints=[self.endpoints[i] for i in sorted(found)], total=total, mode="auto", unmatched=unmatched
+                )
+        return EndpointSelection(endpoints=list(self.endpoints), total=total, mode="all")
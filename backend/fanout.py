@@ -0,0 +1,146 @@
+import ast
+import re
+from typing import Dict, List, Tuple
+
+from pydantic import BaseModel
+
+try:
+    from backend.code_merge import merge_modules
+    from backend.endpoint_selection import endpoint_key
+except ImportError:
+    from code_merge import merge_modules
+    from endpoint_selection import endpoint_key
+
+FANOUT_MODES = ("tag", "prefix")
+
+# Общий conftest пакета: фикстуры, которые модули групп используют, но не объявляют
+SHARED_CONFTEST = '''import os
+
+import pytest
+import requests
+
+BASE_URL = "https://compute.api.cloud.ru"
+
+
+@pytest.fixture(scope="session")
+def base_url():
+    return os.getenv("CLOUD_RU_BASE_URL", BASE_URL)
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    token = os.getenv("CLOUD_RU_TOKEN")
+    return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+
+@pytest.fixture(scope="session")
+def api_session(auth_headers):
+    with requests.Session() as session:
+        session.headers.update(auth_headers)
+        yield session
+'''
+SHARED_FIXTURES = ("base_url", "auth_headers", "api_session")
+
+
+class EndpointGroup(BaseModel):
+    index: int
+    total: int
+    name: str
+    endpoints: List[dict]
+
+    @property
+    def keys(self) -> List[str]:
+        return [endpoint_key(ep) for ep in self.endpoints]
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"\W+", "_", self.name.lower()).strip("_") or f"group_{self.index + 1}"
+
+    @property
+    def class_name(self) -> str:
+        words = re.findall(r"[A-Za-z0-9]+", self.name)
+        return "Test" + "".join(w[:1].upper() + w[1:] for w in words) + "API" if words else f"TestGroup{self.index + 1}API"
+
+
+def path_prefix(path: str, depth: int = 3) -> str:
+    """Префикс пути до первого параметра, не длиннее depth сегментов: /api/v1/disks/{id}/attach -> /api/v1/disks."""
+    segments = []
+    for segment in path.strip("/").split("/"):
+        if not segment or segment.startswith("{") or len(segments) >= depth:
+            break
+        segments.append(segment)
+    return "/" + "/".join(segments)
+
+
+def plan_endpoint_groups(endpoints: List[dict], by: str = "tag", max_endpoints: int = 0) -> List[EndpointGroup]:
+    """
+    Группирует эндпоинты по первому тегу OpenAPI (by="tag"; без тега — по префиксу
+    пути) или по префиксу пути (by="prefix"). Группа больше max_endpoints делится
+    на части поровну, чтобы время генерации определялось размером самой большой части.
+    """
+    buckets: Dict[str, List[dict]] = {}
+    for ep in endpoints:
+        tags = ep.get("tags") or []
+        key = tags[0] if by == "tag" and tags else path_prefix(ep["path"])
+        buckets.setdefault(key, []).append(ep)
+
+    planned: List[Tuple[str, List[dict]]] = []
+    for name, eps in buckets.items():
+        parts = -(-len(eps) // max_endpoints) if max_endpoints > 0 else 1
+        if parts <= 1:
+            planned.append((name, eps))
+            continue
+        size = -(-len(eps) // parts)
+        for i in range(parts):
+            planned.append((f"{name} {i + 1}", eps[i * size:(i + 1) * size]))
+    return [
+        EndpointGroup(index=i, total=len(planned), name=name, endpoints=eps)
+        for i, (name, eps) in enumerate(planned)
+    ]
+
+
+def group_instruction(group: EndpointGroup, missing: List[str] | None = None) -> str:
+    """Дополнение к промпту: генерировать тесты только для эндпоинтов своей группы."""
+    endpoints = "\n".join(f"- {key}" for key in group.keys)
+    text = (
+        f"\n\nЧАСТЬ {group.index + 1} ИЗ {group.total}: группа «{group.name}». Набор генерируется "
+        "по группам эндпоинтов параллельно и собирается в один пакет: требования к общему числу "
+        "тестов относятся ко всему пакету. В этом ответе сгенерируй тесты ТОЛЬКО для эндпоинтов "
+        f"группы, каждый — хотя бы одним тестом, в классе {group.class_name}:\n{endpoints}\n"
+        f"Фикстуры {', '.join(SHARED_FIXTURES)} уже объявлены в общем conftest.py — используй их, "
+        "не объявляй заново. Начни с импортов, как требуется выше."
+    )
+    if missing:
+        text += "\nВ предыдущем ответе не покрыты эндпоинты: " + ", ".join(missing) + " — обязательно покрой их."
+    return text
+
+
+def drop_shared_fixtures(code: str) -> str:
+    """Убирает из модуля группы собственные объявления общих фикстур (их даёт conftest)."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+    lines = code.splitlines()
+    drop = set()
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name in SHARED_FIXTURES:
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            drop.update(range(start - 1, node.end_lineno))
+    if not drop:
+        return code
+    return "\n".join(line for i, line in enumerate(lines) if i not in drop).strip("\n") + "\n"
+
+
+def stitch_package(groups: List[EndpointGroup], modules: List[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Собирает модули групп в пакет: conftest.py с общими фикстурами и test_<группа>.py.
+    Возвращает (один склеенный модуль для валидации и ответа, файлы пакета).
+    """
+    files = {"conftest.py": SHARED_CONFTEST}
+    bodies = []
+    for group, code in zip(groups, modules):
+        code = drop_shared_fixtures(code)
+        files[f"test_{group.slug}.py"] = code
+        bodies.append(code)
+    return merge_modules([SHARED_CONFTEST] + bodies), files
@@ -1,11 +1,15 @@
 import logging
-import gitlab
 from typing import Dict, Any, List
 
 try:
     from backend.config import settings
+    from backend.lazy_imports import lazy_import
 except ImportError:
     from config import settings
+    from lazy_imports import lazy_import
+
+# python-gitlab (вместе с requests) загружается при первом обращении к GitLab
+gitlab = lazy_import("gitlab")
 
 logger = logging.getLogger("app")
 
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    Хеджирование медленных вызовов: если ответ не пришёл за percentile недавних
+    задержек данного типа запроса, отправляется второй такой же вызов, берётся
+    первый успешный, проигравший отменяется.
+    Доля дополнительных вызовов ограничена budget_ratio от общего числа вызовов.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget_ratio: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200,
+        min_delay_s: float = 1.0,
+    ):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay_s = min_delay_s
+        self._latencies: Dict[str, "deque[float]"] = {}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.no_capacity = 0
+
+    def record(self, request_type: str, latency_s: float) -> None:
+        samples = self._latencies.get(request_type)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._latencies[request_type] = samples
+        samples.append(latency_s)
+
+    def delay_for(self, request_type: str) -> float | None:
+        """Через сколько секунд хеджировать; None — недостаточно наблюдений."""
+        samples = self._latencies.get(request_type)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return max(self.min_delay_s, ordered[int(self.percentile * (len(ordered) - 1))])
+
+    def _spend_budget(self) -> bool:
+        if self.hedged + 1 > self.budget_ratio * self.requests:
+            self.budget_denied += 1
+            return False
+        return True
+
+    async def run(
+        self,
+        request_type: str,
+        factory: Callable[[], Awaitable[T]],
+        has_capacity: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Выполняет factory() с хеджированием. has_capacity — можно ли сейчас
+        отправить дополнительный вызов, не вставая в очередь.
+        """
+        self.requests += 1
+        started = time.monotonic()
+        delay = self.delay_for(request_type)
+        primary = asyncio.ensure_future(factory())
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if not has_capacity():
+                        self.no_capacity += 1
+                    elif self._spend_budget():
+                        self.hedged += 1
+                        tasks.append(asyncio.ensure_future(factory()))
+
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self.record(request_type, time.monotonic() - started)
+                        return task.result()
+                    if error is None or task is primary:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_ratio": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "no_capacity": self.no_capacity,
+            "delay_s": {
+                request_type: round(delay, 3)
+                for request_type in self._latencies
+                if (delay := self.delay_for(request_type)) is not None
+            },
+        }
@@ -0,0 +1,125 @@
+import importlib.util
+import logging
+import os
+import time
+from collections import deque
+
+import httpx
+
+logger = logging.getLogger("app")
+
+# События httpcore-трассировки, после которых соединение уже получено из пула
+_CONNECTION_ACQUIRED_EVENTS = (
+    "connection.connect_tcp.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+
+
+class PoolMetricsTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport с метриками пула: время ожидания соединения,
+    новые соединения / TLS-рукопожатия / переиспользование keep-alive.
+    Время ожидания меряется от входа в транспорт до первого события
+    трассировки httpcore, означающего, что соединение получено.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.reused_connections = 0
+        self._acquire_waits: "deque[float]" = deque(maxlen=512)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        state = {"acquired": False}
+        parent_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.start_tls.started":
+                self.tls_handshakes += 1
+            if not state["acquired"] and event_name in _CONNECTION_ACQUIRED_EVENTS:
+                state["acquired"] = True
+                self._acquire_waits.append(time.perf_counter() - started)
+                if event_name == "connection.connect_tcp.started":
+                    self.new_connections += 1
+                else:
+                    self.reused_connections += 1
+            if parent_trace is not None:
+                await parent_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        connections = list(getattr(self._pool, "connections", []))
+        idle = sum(1 for c in connections if c.is_idle())
+        closed = sum(1 for c in connections if c.is_closed())
+        waits = sorted(self._acquire_waits)
+        return {
+            "pid": os.getpid(),
+            "connections_total": len(connections),
+            "connections_active": len(connections) - idle - closed,
+            "connections_idle": idle,
+            "requests_in_flight": self.in_flight,
+            "requests_total": self.requests,
+            "new_connections": self.new_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": self.reused_connections,
+            "acquire_wait_avg_ms": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+            "acquire_wait_p95_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+            "acquire_wait_max_ms": round(1000 * waits[-1], 2) if waits else 0.0,
+        }
+
+
+def http2_available() -> bool:
+    """HTTP/2 в httpx требует необязательный пакет h2."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_http_client(
+    max_connections: int = 32,
+    max_keepalive_connections: int = 16,
+    keepalive_expiry_s: float = 60.0,
+    http2: bool = False,
+    connect_timeout_s: float = 5.0,
+    read_timeout_s: float = 90.0,
+    pool_timeout_s: float = 10.0,
+) -> httpx.AsyncClient:
+    """Общий httpx-клиент для Cloud.ru с настроенным keep-alive пулом и метриками."""
+    if http2 and not http2_available():
+        logger.warning("http2_unavailable", extra={"reason": "пакет h2 не установлен, используется HTTP/1.1"})
+        http2 = False
+
+    transport = PoolMetricsTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        ),
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            read_timeout_s,
+            connect=connect_timeout_s,
+            pool=pool_timeout_s,
+        ),
+    )
+
+
+def pool_stats(client: httpx.AsyncClient) -> dict:
+    """Метрики пула клиента, собранного build_http_client (пустой dict для прочих клиентов)."""
+    transport = getattr(client, "_transport", None)
+    if isinstance(transport, PoolMetricsTransport):
+        return transport.stats()
+    return {}
@@ -0,0 +1,22 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Модуль, который реально загружается при первом обращении к его атрибуту.
+    Тяжёлые зависимости (gitlab, psutil) так не замедляют импорт приложения,
+    а имя модуля остаётся атрибутом вызывающего модуля (его можно патчить в тестах).
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
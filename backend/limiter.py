@@ -0,0 +1,169 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+# Коды ответа upstream, по которым окно конкурентности сжимается
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LimiterOverloaded(Exception):
+    """Очередь к модели переполнена или ожидание слота истекло — запрос отклонён сразу."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """429/5xx и таймауты upstream — сигнал перегрузки для AIMD."""
+    status_code = getattr(error, "status_code", None)
+    if status_code in OVERLOAD_STATUS_CODES:
+        return True
+    return "timeout" in type(error).__name__.lower()
+
+
+class AdaptiveLimiter:
+    """
+    Адаптивное ограничение одновременных вызовов модели (AIMD):
+    окно растёт на 1/окно за каждый успешный вызов и сжимается в decrease_factor раз
+    при 429/5xx/таймауте (не чаще раза в decrease_cooldown_s).
+    Сверх окна запросы ждут в ограниченной очереди; при переполнении или
+    истечении queue_timeout_s бросается LimiterOverloaded с оценкой Retry-After.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        max_queue: int = 32,
+        queue_timeout_s: float = 30.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown_s: float = 1.0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_s = decrease_cooldown_s
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._last_decrease = 0.0
+        self._avg_hold_s = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def retry_after(self) -> int:
+        """Грубая оценка, через сколько секунд освободится слот для нового запроса."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_hold_s * backlog / self.limit))
+
+    def try_acquire(self) -> bool:
+        """Неблокирующая попытка занять слот (без очереди)."""
+        if self.has_free_slot():
+            self._in_flight += 1
+            self.admitted += 1
+            return True
+        return False
+
+    def has_free_slot(self) -> bool:
+        """Есть ли свободный слот прямо сейчас (без очереди)."""
+        return self._in_flight < self.limit and not self._waiters
+
+    async def acquire(self) -> None:
+        if self.try_acquire():
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise LimiterOverloaded("Очередь запросов к модели переполнена", self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            async with asyncio.timeout(self.queue_timeout_s):
+                await fut
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # Слот уже выдан, но ожидающий ушёл — возвращаем его без влияния на окно
+                self.release(None)
+            else:
+                fut.cancel()
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+            if isinstance(e, TimeoutError):
+                self.queue_timeouts += 1
+                raise LimiterOverloaded("Превышено время ожидания очереди к модели", self.retry_after()) from None
+            raise
+        self.admitted += 1
+
+    def release(self, success: bool | None, held_s: float | None = None) -> None:
+        """
+        Освобождает слот. success=True — успешный вызов (окно растёт),
+        False — перегрузка upstream (окно сжимается), None — окно не меняется.
+        """
+        self._in_flight -= 1
+        if held_s is not None:
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * held_s
+
+        if success is True:
+            if self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self.increases += 1
+        elif success is False:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown_s:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._last_decrease = now
+                self.decreases += 1
+
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self._in_flight += 1
+            fut.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Занимает слот на время вызова и подстраивает окно по его исходу."""
+        await self.acquire()
+        started = time.monotonic()
+        success: bool | None = None
+        try:
+            yield
+            success = True
+        except Exception as e:
+            success = False if is_overload_error(e) else None
+            raise
+        finally:
+            self.release(success, time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window": round(self._limit, 2),
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_timeouts": self.queue_timeouts,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "avg_hold_s": round(self._avg_hold_s, 3),
+        }
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List
+
+logger = logging.getLogger("app")
+
+
+def make_cache_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+    """Стабильный ключ кэша: sha256 от модели, сообщений и параметров сэмплирования."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Двухуровневый кэш ответов модели для детерминированных (temperature=0) вызовов:
+    in-memory LRU с TTL поверх файлового SQLite-хранилища.
+    SQLite открывается лениво при первом обращении; db_path=None — только память.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_s: float = 86400.0,
+        db_path: str | Path | None = None,
+        max_disk_entries: int = 5000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.db_path = Path(db_path) if db_path else None
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    # --- memory tier ---------------------------------------------------
+
+    def _memory_get(self, key: str) -> str | None:
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        created_at, value = item
+        if time.time() - created_at > self.ttl_s:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- disk tier -----------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _disk_get(self, key: str) -> tuple[float, str] | None:
+        with self._db_lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT created_at, value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[0] > self.ttl_s:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            return row[0], row[1]
+
+    def _disk_set(self, key: str, value: str, created_at: float) -> None:
+        with self._db_lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            conn.commit()
+
+    # --- public API ----------------------------------------------------
+
+    async def get(self, key: str) -> str | None:
+        value = self._memory_get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.db_path is not None:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.warning("llm_cache_disk_error", extra={"error": str(e)})
+                row = None
+            if row is not None:
+                created_at, value = row
+                self._memory_set(key, value, created_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        self._memory_set(key, value, created_at)
+        self.stores += 1
+        if self.db_path is not None:
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, created_at)
+            except sqlite3.Error as e:
+                logger.warning("llm_cache_disk_error", extra={"error": str(e)})
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.db_path is not None and self.db_path.exists():
+            with self._db_lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "db_path": str(self.db_path) if self.db_path else None,
+        }
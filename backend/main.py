@@ -1,39 +1,80 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from functools import lru_cache
+from jinja2 import Template, TemplateNotFound
 from contextlib import asynccontextmanager
 import os
 import re
+import asyncio
+import json
 import ast
 import time
 import math
 import logging
 import textwrap
-import psutil
+import sys
 import httpx
 from pathlib import Path
-try:
-    from openai import APITimeoutError
-except ImportError:
-    APITimeoutError = None
 
 try:
     from backend.logging_config import init_logging
-    from backend.cloud_ru import call_evolution
-    from backend.validator import validate_allure_code, extract_api_calls
+    from backend.cloud_ru import call_evolution, stream_evolution, get_llm_stats, track_usage, aclose as close_llm_client
+    from backend.limiter import LimiterOverloaded
+    from backend.sharding import SHARD_CLASSES, plan_shards, shard_instruction, shard_max_tokens
+    from backend.fanout import FANOUT_MODES, plan_endpoint_groups, group_instruction, stitch_package
+    from backend.spec_diff import (
+        GenerationStore, StoredOperation, assemble_module, diff_operations,
+        operation_hash, split_operation_tests,
+    )
+    from backend.code_merge import merge_modules
+    from backend.token_budget import (
+        CONTEXT_WINDOW, SAFETY_MARGIN_RATIO, MIN_COMPLETION_TOKENS,
+        estimate_messages_tokens, fit_fragments, completion_budget,
+    )
+    from backend.validator import validate_allure_code, extract_api_calls, extract_call_sites
+    from backend.path_trie import PathTrie, endpoint_key
     from backend.openapi_parser import load_openapi_spec, extract_endpoints
+    from backend.spec_cache import SPEC_CACHE_DIR, load_resolved_spec
+    from backend.spec_loader import SpecLoader, SpecNotReady
+    from backend.spec_registry import SpecEntry, SpecParseError, SpecRegistry
     from backend.gitlab_client import commit_code, fetch_defects
+    from backend.prompt_fragments import FragmentCache
+    from backend.endpoint_selection import EndpointIndex
+    from backend.prompt_engine import PromptEngine, count_placeholders, fill_placeholders
+    from backend.lazy_imports import lazy_import
 except ImportError:
     try:
         from logging_config import init_logging
     except ImportError:
         def init_logging():
             logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-    from cloud_ru import call_evolution
-    from validator import validate_allure_code, extract_api_calls
+    from cloud_ru import call_evolution, stream_evolution, get_llm_stats, track_usage, aclose as close_llm_client
+    from limiter import LimiterOverloaded
+    from sharding import SHARD_CLASSES, plan_shards, shard_instruction, shard_max_tokens
+    from fanout import FANOUT_MODES, plan_endpoint_groups, group_instruction, stitch_package
+    from spec_diff import (
+        GenerationStore, StoredOperation, assemble_module, diff_operations,
+        operation_hash, split_operation_tests,
+    )
+    from code_merge import merge_modules
+    from token_budget import (
+        CONTEXT_WINDOW, SAFETY_MARGIN_RATIO, MIN_COMPLETION_TOKENS,
+        estimate_messages_tokens, fit_fragments, completion_budget,
+    )
+    from validator import validate_allure_code, extract_api_calls, extract_call_sites
+    from path_trie import PathTrie, endpoint_key
     from openapi_parser import load_openapi_spec, extract_endpoints
+    from spec_cache import SPEC_CACHE_DIR, load_resolved_spec
+    from spec_loader import SpecLoader, SpecNotReady
+    from spec_registry import SpecEntry, SpecParseError, SpecRegistry
     from gitlab_client import commit_code, fetch_defects
+    from prompt_fragments import FragmentCache
+    from endpoint_selection import EndpointIndex
+    from prompt_engine import PromptEngine, count_placeholders, fill_placeholders
+    from lazy_imports import lazy_import
+
+psutil = lazy_import("psutil")
 
 init_logging()
 logger = logging.getLogger("app")
@@ -51,26 +92,135 @@ logger.info(f"OPENAPI_DIR: {OPENAPI_DIR} (exists: {OPENAPI_DIR.exists()})")
 if PROMPTS_DIR.exists():
     logger.info(f"Files in PROMPTS_DIR: {list(PROMPTS_DIR.glob('*.txt'))}")
 
+# Снимок развёрнутой OpenAPI-спецификации ("" — разбирать prance при каждом старте)
+OPENAPI_CACHE_DIR = os.getenv("OPENAPI_CACHE_DIR", str(SPEC_CACHE_DIR))
+# Сколько auto_api-запрос ждёт фоновую загрузку спецификации, прежде чем ответить 503
+OPENAPI_READY_TIMEOUT_S = float(os.getenv("OPENAPI_READY_TIMEOUT_S", "30"))
+# Реестр спецификаций других сервисов: каталог загруженных файлов и лимит памяти разобранных версий
+SPEC_UPLOAD_DIR = os.getenv("SPEC_UPLOAD_DIR", str(BASE_DIR / ".cache" / "specs"))
+SPEC_REGISTRY_MAX_MB = float(os.getenv("SPEC_REGISTRY_MAX_MB", "256"))
+# Каталог, внутри которого разрешена регистрация спецификаций по пути ("" — только загрузка текстом)
+SPEC_SOURCE_ROOT = os.getenv("SPEC_SOURCE_ROOT", "")
+# Тесты прошлых генераций auto_api по операциям для инкрементальной перегенерации ("" — только в памяти)
+GENERATION_STORE_PATH = os.getenv("GENERATION_STORE_PATH", str(BASE_DIR / ".cache" / "generations.sqlite3"))
+# Из чего компилируются промпты: jinja — закоммиченные .jinja, txt — .txt (правки промптов без пересборки .jinja)
+PROMPT_TEMPLATE_SOURCE = os.getenv("PROMPT_TEMPLATE_SOURCE", "jinja")
+# Шаблоны .jinja компилируются один раз на версию файла; байткод переживает перезапуск воркера ("" — без кэша).
+# Каталог проверяется по mtime не чаще раза в PROMPT_RELOAD_INTERVAL_S (0 — без горячей перезагрузки)
+PROMPT_BYTECODE_CACHE_DIR = os.getenv("PROMPT_BYTECODE_CACHE_DIR", str(BASE_DIR / ".cache" / "jinja"))
+prompt_engine = PromptEngine(
+    PROMPTS_DIR,
+    cache_dir=Path(PROMPT_BYTECODE_CACHE_DIR) if PROMPT_BYTECODE_CACHE_DIR else None,
+    poll_interval_s=float(os.getenv("PROMPT_RELOAD_INTERVAL_S", "2")),
+    source=PROMPT_TEMPLATE_SOURCE,
+)
+
+
+def load_openapi_snapshot() -> tuple[dict, bool]:
+    """Спецификация из снимка на диске, если openapi-v3.yaml не менялся, иначе — разбор prance."""
+    return load_resolved_spec(
+        OPENAPI_DIR / "openapi-v3.yaml",
+        cache_dir=OPENAPI_CACHE_DIR or None,
+        parse=lambda path: load_openapi_spec(path),
+    )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """FastAPI lifespan hook: прогреваем OpenAPI однажды при старте."""
+    """FastAPI lifespan hook: компилируем шаблоны и запускаем фоновую загрузку OpenAPI и разделов промпта auto_api."""
     try:
-        openapi_path = OPENAPI_DIR / "openapi-v3.yaml"
-        spec = load_openapi_spec(str(openapi_path))
-        endpoints = extract_endpoints(spec)
-        app.state.openapi_spec = spec
-        app.state.openapi_endpoints = endpoints
-        logger.info("openapi_cached", extra={"endpoints": len(endpoints)})
+        logger.info("prompts_compiled", extra={"templates": prompt_engine.load_all()})
     except Exception as e:
-        logger.warning("openapi_cache_failed", extra={"error": str(e)})
+        logger.warning("prompts_compile_failed", extra={"error": str(e)})
+
+    # Спецификация грузится в фоне: приложение принимает запросы сразу,
+    # auto_api дожидается загрузки, готовность — GET /health/ready
+    spec_loader.start()
 
     yield
 
+    await close_llm_client()
+
 
 app = FastAPI(title="TestOps Copilot MVP v1.1", lifespan=lifespan)
 app.state.openapi_spec = None
 app.state.openapi_endpoints = None
+app.state.openapi_fragments = None
+app.state.openapi_index = None
+
+# Разделы промпта auto_api по хэшу содержимого спецификации (и отбору эндпоинтов): строятся один раз
+spec_fragments = FragmentCache(max_entries=32)
+
+
+def prepare_openapi_state(spec: dict) -> dict:
+    """Эндпоинты, их индекс и готовые разделы промпта для спецификации (без обращения к app.state)."""
+    endpoints = extract_endpoints(spec)
+    return {
+        "spec": spec,
+        "endpoints": endpoints,
+        "index": EndpointIndex(endpoints),
+        "fragments": spec_fragments.get_or_build(spec, endpoints),
+    }
+
+
+def publish_openapi_state(prepared: dict) -> dict:
+    """Делает спецификацию текущей (только присваивания — выполняется в event loop)."""
+    app.state.openapi_spec = prepared["spec"]
+    app.state.openapi_endpoints = prepared["endpoints"]
+    app.state.openapi_index = prepared["index"]
+    app.state.openapi_fragments = prepared["fragments"]
+    return {
+        "endpoints": len(prepared["endpoints"]),
+        "spec_hash": prepared["fragments"].spec_hash[:12],
+        "from_snapshot": prepared.get("from_snapshot", False),
+    }
+
+
+def set_openapi_spec(spec: dict) -> None:
+    """Делает спецификацию текущей: эндпоинты, их индекс и готовые разделы промпта кладутся в app.state."""
+    publish_openapi_state(prepare_openapi_state(spec))
+
+
+def load_openapi_state() -> dict:
+    """Чтение снимка или разбор спецификации и подготовка разделов; выполняется в рабочем потоке."""
+    spec, from_snapshot = load_openapi_snapshot()
+    return {**prepare_openapi_state(spec), "from_snapshot": from_snapshot}
+
+
+spec_loader = SpecLoader(load_openapi_state, publish_openapi_state)
+spec_registry = SpecRegistry(
+    SPEC_UPLOAD_DIR,
+    cache_dir=OPENAPI_CACHE_DIR or None,
+    fragment_cache=spec_fragments,
+    max_bytes=int(SPEC_REGISTRY_MAX_MB * 1024 * 1024),
+    source_root=SPEC_SOURCE_ROOT or None,
+)
+generation_store = GenerationStore(GENERATION_STORE_PATH or None)
+
+
+def openapi_ready() -> bool:
+    return all(
+        getattr(app.state, name, None) is not None
+        for name in ("openapi_spec", "openapi_endpoints", "openapi_index", "openapi_fragments")
+    )
+
+
+async def ensure_openapi_ready() -> None:
+    """
+    Ждёт фоновую загрузку спецификации (или запускает её, если спецификации нет).
+    Разбор никогда не выполняется в event loop; не дождались — 503 с Retry-After.
+    """
+    if openapi_ready():
+        return
+    try:
+        await spec_loader.ensure(timeout=OPENAPI_READY_TIMEOUT_S)
+    except SpecNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Спецификация OpenAPI ещё загружается. Повторите запрос позже.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -112,6 +262,24 @@ class GenerateRequest(BaseModel):
     previous_code: str | None = None
     repo_id: int | str | None = None
     custom_prompt: str | None = None
+    use_cache: bool = True  # False — принудительно идти в модель мимо кэша ответов
+    shards: int | None = None  # manual_api/manual_ui: на сколько параллельных частей делить набор
+    # auto_api: какие эндпоинты спецификации включить в промпт (без фильтров — по вызовам в previous_code или все)
+    endpoint_tags: list[str] | None = None  # теги OpenAPI, например ["Disks"]
+    endpoint_paths: list[str] | None = None  # префиксы путей, например ["/api/v1/disks"]
+    endpoint_operations: list[str] | None = None  # operationId или "GET /api/v1/disks"
+    fanout: str | None = None  # auto_api: "tag" | "prefix" — генерировать по группам эндпоинтов параллельно
+    spec_id: str | None = None  # auto_api: id спецификации из реестра (POST /specs); без него — openapi-v3.yaml
+    incremental: bool = False  # auto_api: генерировать только новые и изменившиеся операции, остальные — из прошлых генераций
+
+class SpecRegisterRequest(BaseModel):
+    spec_id: str
+    content: str | None = None  # текст спецификации (YAML или JSON)
+    path: str | None = None  # локальный путь или file:// URL
+
+class BatchGenerateRequest(BaseModel):
+    requests: list[GenerateRequest]
+    stream: bool = False  # True — отдавать результаты SSE-событиями по мере готовности
 
 class CommitRequest(BaseModel):
     repo_id: int | str
@@ -129,42 +297,59 @@ class DefectsRequest(BaseModel):
     summarize: bool = True
 
 
-@lru_cache(maxsize=10)
-def get_cached_prompt(req_type: str) -> str:
-    prompt_path = PROMPTS_DIR / f"{req_type}.txt"
-    logger.debug(f"Looking for prompt: {prompt_path} (exists: {prompt_path.exists()})")
-    if not prompt_path.exists():
-        # Попробуем найти все доступные файлы для лучшей диагностики
-        available = list(PROMPTS_DIR.glob("*.txt")) if PROMPTS_DIR.exists() else []
-        available_names = [f.stem for f in available]
+def get_cached_prompt(req_type: str) -> Template:
+    """Скомпилированный шаблон промпта; FileNotFoundError, если шаблона нет."""
+    try:
+        return prompt_engine.get(req_type)
+    except TemplateNotFound:
+        available_names = prompt_engine.available()
         raise FileNotFoundError(
-            f"Шаблон {req_type} не найден: {prompt_path}. "
+            f"Шаблон {req_type} не найден: {PROMPTS_DIR / f'{req_type}.jinja'}. "
             f"Доступные шаблоны: {available_names}"
         )
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match: "*" или список тегов через запятую. Сравнение слабое (RFC 9110:
+    префикс W/ не учитывается), но по тегу целиком, а не по вхождению подстроки.
+    """
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    tags = [tag.strip() for tag in if_none_match.split(",") if tag.strip()]
+    return "*" in tags or opaque(etag) in {opaque(tag) for tag in tags}
 
 
 @app.get("/prompt/{prompt_type}")
-async def get_original_prompt(prompt_type: str):
-    """Возвращает оригинальный промпт из файла для 'По умолчанию'."""
+async def get_original_prompt(prompt_type: str, request: Request):
+    """Возвращает оригинальный промпт для 'По умолчанию' (из памяти, с ETag/304)."""
     if prompt_type not in ["manual_ui", "manual_api", "auto_ui", "auto_api", "test_plan", "optimize", "unit_ci"]:
         raise HTTPException(status_code=400, detail="Неверный тип промпта")
 
-    prompt_path = PROMPTS_DIR / f"{prompt_type}.txt"
-    logger.debug(f"Looking for prompt: {prompt_path} (exists: {prompt_path.exists()})")
-    if not prompt_path.exists():
-        # Попробуем найти все доступные файлы для лучшей диагностики
-        available = list(PROMPTS_DIR.glob("*.txt")) if PROMPTS_DIR.exists() else []
-        available_names = [f.stem for f in available]
+    try:
+        entry = prompt_engine.entry(prompt_type)
+    except TemplateNotFound:
+        entry = None
+    if entry is None or entry.text is None:
         raise HTTPException(
             status_code=404,
-            detail=f"Промпт {prompt_type} не найден: {prompt_path}. "
-                   f"Доступные шаблоны: {available_names}"
+            detail=f"Промпт {prompt_type} не найден: нет {prompt_type}.jinja / {prompt_type}.txt в {PROMPTS_DIR}. "
+                   f"Доступные шаблоны: {prompt_engine.available()}"
         )
 
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return {"type": prompt_type, "prompt": f.read().strip()}
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"type": prompt_type, "prompt": entry.text.strip()}, headers=headers)
+
+def is_llm_timeout(e: Exception) -> bool:
+    """APITimeoutError из openai. Пока openai не загружен, клиент модели не создавался и такого таймаута быть не могло."""
+    openai = sys.modules.get("openai")
+    timeout_error = getattr(openai, "APITimeoutError", None)
+    return timeout_error is not None and isinstance(e, timeout_error)
+
 
 def round_down(value: float, decimals: int = 4) -> float:
     """
@@ -604,7 +789,7 @@ async def analyze_defects(req: DefectsRequest):
                 ]
             )
         except Exception as e:
-            if APITimeoutError and isinstance(e, APITimeoutError):
+            if is_llm_timeout(e):
                 logger.warning(
                     "llm_summary_timeout",
                     exc_info=True,
@@ -627,16 +812,196 @@ async def analyze_defects(req: DefectsRequest):
     }
 
 
-@app.post("/generate")
-async def generate_tests(req: GenerateRequest):
-    start_time = time.perf_counter()  # Начало замера
-    process = psutil.Process()  # Текущий процесс для memory
-    initial_memory_mb = process.memory_info().rss / 1024 / 1024  # МБ в покое
-    raw_response: str | None = None
-    clean_code: str | None = None
-    syntax_fixed = False
-    prompt_template: str | None = None
-    prompt = ""
+# Чем меньше приоритет, тем раньше раздел сокращается при нехватке контекста
+FRAGMENT_PRIORITIES = {
+    "negative_responses": 0,
+    "endpoints_detailed": 1,
+    "historical_bugs": 2,
+    "schemas": 3,
+    "openapi_endpoints": 4,
+    "code_snippet": 5,
+    "previous_code": 5,
+}
+
+
+# Разделы с данными конкретного запроса: в стабильный системный префикс не попадают
+DYNAMIC_FRAGMENTS = {
+    "code_snippet": "КОД ЭНДПОИНТОВ",
+    "previous_code": "КОД ДЛЯ АНАЛИЗА",
+    "historical_bugs": "ИСТОРИЧЕСКИЕ ДЕФЕКТЫ",
+}
+USER_TASK = "Выполни задание из системного сообщения."
+
+
+def split_prompt_layout(system_template: Template, fragments: dict[str, str]) -> tuple[Template, dict[str, str]]:
+    """
+    Раскладывает промпт на системный префикс, одинаковый для всех запросов типа
+    (роль, шаблон, разделы спецификации), и сообщение пользователя с данными запроса.
+    Переменные данных запроса в системном шаблоне получают ссылку на раздел сообщения
+    пользователя, чтобы upstream мог переиспользовать KV-кэш префикса.
+    Возвращает (user_template, markers): шаблон сообщения пользователя с разделами
+    и {{ user_text }}, и значения переменных-ссылок для системного шаблона.
+    """
+    counts = prompt_engine.variable_counts(system_template)
+    referenced = [name for name in DYNAMIC_FRAGMENTS if name in fragments and counts.get(name)]
+    markers = {name: f"[{DYNAMIC_FRAGMENTS[name]} — см. сообщение пользователя]" for name in referenced}
+    sections = [f"### {DYNAMIC_FRAGMENTS[name]}\n{{{{ {name} }}}}" for name in referenced]
+    return prompt_engine.from_text("\n\n".join(sections + ["{{ user_text }}"])), markers
+
+
+def render_messages(
+    system_template: Template,
+    user_template: Template,
+    fragments: dict[str, str],
+    system_vars: dict[str, str],
+    user_vars: dict[str, str],
+    system_suffix: str = "",
+) -> list[dict]:
+    """
+    Один проход рендеринга системного и пользовательского сообщений. В user_vars
+    (текст задания, в том числе отредактированный промпт из custom_prompt)
+    плейсхолдеры .txt-формата заменяются разделами; как Jinja они не компилируются.
+    """
+    user_vars = {name: fill_placeholders(value, fragments) for name, value in user_vars.items()}
+    return [
+        {"role": "system", "content": system_template.render({**fragments, **system_vars}) + system_suffix},
+        {"role": "user", "content": user_template.render({**fragments, **user_vars})},
+    ]
+
+
+def fit_prompt_to_budget(
+    prompt_type: str,
+    system_template: Template,
+    user_template: Template,
+    fragments: dict[str, str],
+    desired_max_tokens: int,
+    context_window: int | None = None,
+    system_vars: dict[str, str] | None = None,
+    user_vars: dict[str, str] | None = None,
+    system_suffix: str = "",
+) -> tuple[list[dict], int]:
+    """
+    Рендерит системное и пользовательское сообщения, предварительно ужав
+    низкоприоритетные разделы так, чтобы промпт и desired_max_tokens поместились
+    в контекстное окно модели. system_vars/user_vars — значения переменных,
+    которые не ужимаются (ссылки на разделы, текст задания).
+    Возвращает (messages, max_tokens); max_tokens — не больше остатка окна.
+    """
+    window = context_window or CONTEXT_WINDOW
+    margin = int(window * SAFETY_MARGIN_RATIO)
+    system_vars = system_vars or {}
+    user_vars = user_vars or {}
+
+    occurrences: dict[str, int] = {}
+    for template, fixed in ((system_template, system_vars), (user_template, user_vars)):
+        for name, count in prompt_engine.variable_counts(template).items():
+            if name not in fixed:
+                occurrences[name] = occurrences.get(name, 0) + count
+    for value in user_vars.values():
+        for name, count in count_placeholders(value).items():
+            occurrences[name] = occurrences.get(name, 0) + count
+    empty = {name: "" for name in fragments}
+    fixed_tokens = estimate_messages_tokens(
+        render_messages(system_template, user_template, empty, system_vars, user_vars, system_suffix)
+    )
+
+    fitted, truncated = fit_fragments(
+        fixed_tokens,
+        fragments,
+        occurrences,
+        FRAGMENT_PRIORITIES,
+        limit_tokens=window - margin - desired_max_tokens,
+    )
+    messages = render_messages(system_template, user_template, fitted, system_vars, user_vars, system_suffix)
+    prompt_tokens = estimate_messages_tokens(messages)
+    max_tokens = completion_budget(prompt_tokens, desired_max_tokens, window, margin)
+
+    logger.info(
+        "prompt_budget",
+        extra={
+            "mode": prompt_type,
+            "prompt_tokens": prompt_tokens,
+            "max_tokens": max_tokens,
+            "context_window": window,
+            "truncated_sections": truncated,
+        }
+    )
+    if max_tokens < MIN_COMPLETION_TOKENS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Промпт не помещается в контекстное окно модели (~{prompt_tokens} из {window} токенов)"
+        )
+    return messages, max_tokens
+
+
+async def resolve_spec(req: GenerateRequest) -> SpecEntry:
+    """
+    Спецификация запроса: версия из реестра по spec_id (запрос работает с ней
+    до конца, даже если тем временем зарегистрирована новая) или основная.
+    """
+    if req.spec_id:
+        try:
+            return await spec_registry.get(req.spec_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Спецификация {req.spec_id} не зарегистрирована")
+    await ensure_openapi_ready()
+    return SpecEntry(
+        spec_id="default",
+        source=str(OPENAPI_DIR / "openapi-v3.yaml"),
+        spec=app.state.openapi_spec,
+        endpoints=app.state.openapi_endpoints,
+        index=app.state.openapi_index,
+        fragments=app.state.openapi_fragments,
+    )
+
+
+async def select_spec_endpoints(req: GenerateRequest, api_endpoints: list[str], spec_entry: SpecEntry | None = None):
+    """
+    Дожидается загрузки спецификации и отбирает эндпоинты для auto_api
+    по фильтрам запроса или по вызовам из previous_code. Пустой отбор → 400.
+    spec_entry — версия, уже выбранная для запроса (иначе resolve_spec).
+    Возвращает (отбор, спецификация).
+    """
+    entry = spec_entry or await resolve_spec(req)
+
+    index = entry.index
+    selection = index.select(
+        tags=req.endpoint_tags,
+        paths=req.endpoint_paths,
+        operations=req.endpoint_operations,
+        calls=api_endpoints,
+    )
+    if not selection.endpoints:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не найдено эндпоинтов по фильтру: {selection.unmatched}. Доступные теги: {index.tags}"
+        )
+    logger.info(
+        "endpoint_selection",
+        extra={
+            "mode": selection.mode,
+            "selected": len(selection.endpoints),
+            "total": selection.total,
+            "unmatched": selection.unmatched,
+            "spec_id": entry.spec_id,
+        }
+    )
+    return selection, entry
+
+
+async def build_generation_prompt(
+    req: GenerateRequest, spec_entry: SpecEntry | None = None
+) -> tuple[list[dict], int, list | None]:
+    """
+    Собирает сообщения для запроса генерации: системный префикс (роль, шаблон,
+    разделы спецификации) и сообщение пользователя с данными запроса.
+    spec_entry — версия спецификации запроса: группы fanout и перегенерация
+    работают с одной версией, даже если её тем временем подменили или вытеснили.
+    Возвращает (messages, max_tokens, endpoints); endpoints заполнены только для auto_api.
+    """
+    system_template: Template | None = None
+    system_suffix = ""
+    user_text = ""
     endpoints = None
     defects_summary = "No historical bugs provided"
     api_endpoints: list[str] = []
@@ -649,9 +1014,10 @@ async def generate_tests(req: GenerateRequest):
             raise HTTPException(status_code=400, detail="Custom промпт обязателен и не пустой")
 
         prompt_template = qa_prefix + "\n\n" + custom_prompt_value
-        prompt = prompt_template
+        system_template = prompt_engine.from_text(qa_prefix)
+        user_text = custom_prompt_value
 
-        if len(prompt) > 8000:
+        if len(prompt_template) > 8000:
             raise HTTPException(status_code=400, detail="Промпт слишком длинный (макс. 8000 символов)")
     else:
         if req.type in ["optimize", "test_plan"]:
@@ -662,68 +1028,39 @@ async def generate_tests(req: GenerateRequest):
             prompt_template = qa_prefix + "\n\n" + custom_prompt_value + extra_guard
             if len(prompt_template) > 8000:
                 raise HTTPException(status_code=400, detail="Промпт слишком длинный (макс. 8000 символов)")
-            prompt = prompt_template
+            system_template = prompt_engine.from_text(qa_prefix)
+            user_text = custom_prompt_value + extra_guard
         else:
             try:
-                prompt_template = get_cached_prompt(req.type)
+                system_template = get_cached_prompt(req.type)
             except FileNotFoundError:
                 raise HTTPException(status_code=400, detail=f"Шаблон {req.type} не найден")
-            prompt = prompt_template
 
-    if req.type == "auto_api" and prompt_template:
+    if req.previous_code and req.type in ["auto_api", "optimize"]:
         try:
-            spec = app.state.openapi_spec
-            endpoints = app.state.openapi_endpoints
-
-            if spec is None or endpoints is None:
-                openapi_path = OPENAPI_DIR / "openapi-v3.yaml"
-                spec = load_openapi_spec(str(openapi_path))
-                endpoints = extract_endpoints(spec)
-                app.state.openapi_spec = spec
-                app.state.openapi_endpoints = endpoints
-            else:
-                endpoints = app.state.openapi_endpoints
-
-            schemas = spec.get("components", {}).get("schemas", {})
-            schemas_text = "\n".join(schemas.keys())
-
-            openapi_summary = "\n".join([
-                f"{ep['method']} {ep['path']} — {ep['summary']}"
-                for ep in endpoints
-            ])
-
-            tests_prompt = ""
-            for ep in endpoints:
-                tests_prompt += f"""
-    Метод: {ep['method']}
-    Путь: {ep['path']}
-    Параметры: {ep['parameters']}
-    RequestBody: {ep['requestBody']}
-    Ответы: {list(ep['responses'].keys())}
-    """
-
-            # 2.3 Негативные ответы 4xx/5xx
-            negative_responses_all = {
-                f"{ep['method']} {ep['path']}": {
-                    code: info
-                    for code, info in ep["responses"].items()
-                    if str(code).startswith(("4", "5"))
-                }
-                for ep in endpoints
-                if any(str(code).startswith(("4", "5")) for code in ep["responses"].keys())
-            }
-
-            negative_responses_text = "\n".join([
-                f"{k}: {v}" for k, v in negative_responses_all.items()
-            ])
+            api_endpoints = extract_api_calls(req.previous_code)
+        except Exception as e:
+            logger.warning(f"Failed to extract API calls: {e}")
 
-            prompt = prompt_template.replace("{openapi_endpoints}", openapi_summary)
-            prompt = prompt.replace("{schemas}", schemas_text)
-            prompt = prompt.replace("{endpoints_detailed}", tests_prompt)
-            prompt = prompt.replace("{negative_responses}", negative_responses_text)
+    fragments: dict[str, str] = {}
+    if req.type == "auto_api":
+        try:
+            selection, spec_entry = await select_spec_endpoints(req, api_endpoints, spec_entry)
+            endpoints = selection.endpoints
+            if selection.mode == "all":
+                fragments.update(spec_entry.fragments.as_fragments())
+            else:
+                fragments.update(spec_fragments.get_or_build(
+                    spec_entry.spec,
+                    endpoints,
+                    spec_hash=spec_entry.fragments.spec_hash,
+                    selection=selection.keys,
+                ).as_fragments())
 
-            prompt += "\nВсе идентификаторы должны строго соответствовать UUIDv4.\n"
+            system_suffix = "\nВсе идентификаторы должны строго соответствовать UUIDv4.\n"
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(
                 "generation_error",
@@ -732,26 +1069,11 @@ async def generate_tests(req: GenerateRequest):
             )
             raise HTTPException(status_code=500, detail="Ошибка генерации. Проверь логи.")
 
-    elif req.type == "unit_ci" and prompt_template:
-        code_snippet = req.previous_code or "def endpoint(): pass"
-        prompt = prompt_template.replace("{code_snippet}", code_snippet)
-    elif req.type != "custom":
-        prompt = prompt_template
-
-    if req.previous_code and "{вставь сюда весь код" in prompt:
-        prompt = prompt.replace(
-            "{вставь сюда весь код, который только что сгенерировал}",
-            req.previous_code
-        ).replace(
-            "{вставь сюда весь код}",
-            req.previous_code
-        )
+    elif req.type == "unit_ci":
+        fragments["code_snippet"] = req.previous_code or "def endpoint(): pass"
 
-    if req.previous_code and req.type in ["auto_api", "optimize"]:
-        try:
-            api_endpoints = extract_api_calls(req.previous_code)
-        except Exception as e:
-            logger.warning(f"Failed to extract API calls: {e}")
+    if req.previous_code:
+        fragments["previous_code"] = req.previous_code
 
     if req.type == "optimize" and req.repo_id is not None:
         try:
@@ -763,294 +1085,740 @@ async def generate_tests(req: GenerateRequest):
         except Exception as e:
             logger.warning(f"Unexpected error during defects fetch: {e}")
 
-    prompt = prompt.replace("{historical_bugs}", defects_summary)
-    prompt = prompt.replace("{defects_summary}", defects_summary)
+    fragments["historical_bugs"] = defects_summary
 
     if api_endpoints:
-        prompt += f"\nВыявленные эндпоинты в коде: {api_endpoints} — обеспечь 100% покрытие."
+        user_text = (user_text or USER_TASK) + f"\nВыявленные эндпоинты в коде: {api_endpoints} — обеспечь 100% покрытие."
 
     if req.type in ["manual_api", "manual_ui"]:
-        max_tokens = 8700
+        desired_max_tokens = 8700
     elif req.type == "unit_ci":
-        max_tokens = 2500
+        desired_max_tokens = 2500
     elif req.type == "custom":
-        max_tokens = 4000
+        desired_max_tokens = 4000
     else:
-        max_tokens = 4000
+        desired_max_tokens = 4000
+
+    user_template, markers = split_prompt_layout(system_template, fragments)
+    messages, max_tokens = fit_prompt_to_budget(
+        req.type,
+        system_template,
+        user_template,
+        fragments,
+        desired_max_tokens,
+        system_vars=markers,
+        user_vars={"user_text": user_text or USER_TASK},
+        system_suffix=system_suffix,
+    )
+    return messages, max_tokens, endpoints
 
-    try:
-        raw_response = await call_evolution(
-            [{"role": "user", "content": prompt}],
-            temperature=0.0,
-            max_tokens=max_tokens
-        )
-        if not raw_response or not str(raw_response).strip():
-            logger.error(
-                "generation_empty_response",
-                extra={"type": req.type}
-            )
-            raise HTTPException(
-                status_code=502,
-                detail="Cloud.ru API вернул пустой ответ. Повторите попытку или уточните промпт."
-            )
-        clean_code = clean_code_from_llm(raw_response)
-
-        if req.type == "unit_ci":
-            if ".gitlab-ci.yml:" in clean_code:
-                parts = clean_code.split(".gitlab-ci.yml:", 2)
-                python_part = parts[0].rstrip()
-                yaml_part = parts[1] if len(parts) > 1 else ""
-                yaml_part = yaml_part.strip("\n")
-                if yaml_part:
-                    commented_yaml = "\n".join(f"# {line}".rstrip() for line in yaml_part.splitlines())
-                    clean_code = python_part + "\n\n# .gitlab-ci.yml\n" + commented_yaml
-                else:
-                    clean_code = python_part
 
-        if req.type in ["manual_ui", "manual_api"]:
-            clean_code = ensure_owner_label(clean_code)
-            if req.type == "manual_api":
-                clean_code = enforce_aaa_order(clean_code)
-        
-        for _ in range(8):
-            try:
-                ast.parse(clean_code)
-                break
-            except SyntaxError as e:
-                error_msg = str(e)
-                lines = clean_code.split('\n')
-                handled = False
+def repair_syntax(clean_code: str) -> tuple[str, bool]:
+    """
+    Итеративно чинит типичные синтаксические ошибки LLM-кода (до 8 проходов).
+    Возвращает (code, syntax_fixed).
+    """
+    syntax_fixed = False
+    for _ in range(8):
+        try:
+            ast.parse(clean_code)
+            break
+        except SyntaxError as e:
+            error_msg = str(e)
+            lines = clean_code.split('\n')
+            handled = False
+
+            if "expected an indented block" in error_msg and e.lineno and e.lineno <= len(lines):
+                indent_match = re.match(r"(\s*)", lines[e.lineno - 1])
+                indent = indent_match.group(1) if indent_match else ""
+                lines.insert(e.lineno, f"{indent}    pass")
+                handled = True
+                syntax_fixed = True
+
+            elif "unexpected unindent" in error_msg and e.lineno and e.lineno <= len(lines):
+                line_idx = e.lineno - 1
+
+                context_indent = ""
+                class_indent = ""
+                ctx_idx = line_idx - 1
+                while ctx_idx >= 0:
+                    ctx_line = lines[ctx_idx].strip()
+                    if ctx_line.startswith(("class ", "def ")):
+                        indent_match = re.match(r"(\s*)", lines[ctx_idx])
+                        context_indent = indent_match.group(1) if indent_match else ""
+                        if lines[ctx_idx].rstrip().endswith(":"):
+                            context_indent += "    "
+                        if ctx_line.startswith("class "):
+                            class_indent = indent_match.group(1) if indent_match else ""
+                        break
+                    if ctx_line:
+                        indent_match = re.match(r"(\s*)", lines[ctx_idx])
+                        context_indent = indent_match.group(1) if indent_match else ""
+                        if lines[ctx_idx].rstrip().endswith(":"):
+                            context_indent += "    "
+                        break
+                    ctx_idx -= 1
 
-                if "expected an indented block" in error_msg and e.lineno and e.lineno <= len(lines):
-                    indent_match = re.match(r"(\s*)", lines[e.lineno - 1])
-                    indent = indent_match.group(1) if indent_match else ""
-                    lines.insert(e.lineno, f"{indent}    pass")
-                    handled = True
-                    syntax_fixed = True
+                if lines[line_idx].lstrip().startswith("@") and class_indent:
+                    context_indent = class_indent + "    "
 
-                elif "unexpected unindent" in error_msg and e.lineno and e.lineno <= len(lines):
-                    line_idx = e.lineno - 1
-
-                    context_indent = ""
-                    class_indent = ""
-                    ctx_idx = line_idx - 1
-                    while ctx_idx >= 0:
-                        ctx_line = lines[ctx_idx].strip()
-                        if ctx_line.startswith(("class ", "def ")):
-                            indent_match = re.match(r"(\s*)", lines[ctx_idx])
-                            context_indent = indent_match.group(1) if indent_match else ""
-                            if lines[ctx_idx].rstrip().endswith(":"):
-                                context_indent += "    "
-                            if ctx_line.startswith("class "):
-                                class_indent = indent_match.group(1) if indent_match else ""
-                            break
-                        if ctx_line:
-                            indent_match = re.match(r"(\s*)", lines[ctx_idx])
-                            context_indent = indent_match.group(1) if indent_match else ""
-                            if lines[ctx_idx].rstrip().endswith(":"):
-                                context_indent += "    "
-                            break
-                        ctx_idx -= 1
-
-                    if lines[line_idx].lstrip().startswith("@") and class_indent:
-                        context_indent = class_indent + "    "
-
-                    lines[line_idx] = context_indent + lines[line_idx].lstrip()
-                    handled = True
-                    syntax_fixed = True
+                lines[line_idx] = context_indent + lines[line_idx].lstrip()
+                handled = True
+                syntax_fixed = True
 
-                elif "unexpected indent" in error_msg:
-                    clean_code = textwrap.dedent(clean_code)
-                    lines = clean_code.split('\n')
-                    handled = True
-                    syntax_fixed = True
+            elif "unexpected indent" in error_msg:
+                clean_code = textwrap.dedent(clean_code)
+                lines = clean_code.split('\n')
+                handled = True
+                syntax_fixed = True
 
-                elif "expected ':'" in error_msg and e.lineno and e.lineno <= len(lines):
-                    line_idx = e.lineno - 1
-                    if not lines[line_idx].rstrip().endswith(":"):
-                        lines[line_idx] = lines[line_idx].rstrip() + ":"
-                        handled = True
-                        syntax_fixed = True
-
-                elif (
-                    "unterminated string literal" in error_msg
-                    or "EOL while scanning string literal" in error_msg
-                    or "was never closed" in error_msg
-                ) and e.lineno and e.lineno <= len(lines):
-                    line_idx = e.lineno - 1
-                    line = lines[line_idx].rstrip()
-
-                    if line.count('"') % 2 == 1:
-                        line += '"'
-                    elif line.count("'") % 2 == 1:
-                        line += "'"
-
-                    if line.count("(") > line.count(")"):
-                        line += ")"
-
-                    lines[line_idx] = line
+            elif "expected ':'" in error_msg and e.lineno and e.lineno <= len(lines):
+                line_idx = e.lineno - 1
+                if not lines[line_idx].rstrip().endswith(":"):
+                    lines[line_idx] = lines[line_idx].rstrip() + ":"
                     handled = True
                     syntax_fixed = True
 
-                elif (
-                    "invalid syntax" in error_msg
-                    or "expected '('" in error_msg
-                    or "illegal target for annotation" in error_msg  # частый мусор от LLM в payload
-                    or "cannot assign to literal" in error_msg
-                ) and e.lineno and e.lineno <= len(lines):
-                    error_line_idx = e.lineno - 1
-                    lines.pop(error_line_idx)
-                    handled = True
-                    syntax_fixed = True
+            elif (
+                "unterminated string literal" in error_msg
+                or "EOL while scanning string literal" in error_msg
+                or "was never closed" in error_msg
+            ) and e.lineno and e.lineno <= len(lines):
+                line_idx = e.lineno - 1
+                line = lines[line_idx].rstrip()
+
+                if line.count('"') % 2 == 1:
+                    line += '"'
+                elif line.count("'") % 2 == 1:
+                    line += "'"
+
+                if line.count("(") > line.count(")"):
+                    line += ")"
+
+                lines[line_idx] = line
+                handled = True
+                syntax_fixed = True
+
+            elif (
+                "invalid syntax" in error_msg
+                or "expected '('" in error_msg
+                or "illegal target for annotation" in error_msg  # частый мусор от LLM в payload
+                or "cannot assign to literal" in error_msg
+            ) and e.lineno and e.lineno <= len(lines):
+                error_line_idx = e.lineno - 1
+                lines.pop(error_line_idx)
+                handled = True
+                syntax_fixed = True
+
+            if handled:
+                clean_code = '\n'.join(lines)
+                continue
+            else:
+                break
 
-                if handled:
-                    clean_code = '\n'.join(lines)
-                    continue
-                else:
-                    break
-
-        if req.type == "auto_api":
-            missing = check_coverage(endpoints, clean_code)
-            if missing:
-                logger.info("coverage_missing", extra={"missing": missing})
-
-        if req.type in ["test_plan", "optimize"]:
-            validation = {
-                "valid": True,
-                "issues": [],
-                "message": "Тест-план / оптимизация — валидация не требуется",
-                "score": 100
-            }
-        elif req.type == "custom":
-            validation = {
-                "valid": True,
-                "issues": [],
-                "message": "Custom сценарий — валидация по синтаксису Python",
-                "score": 100
-            }
-        else:
-            validation = validate_allure_code(clean_code, req.type)
-
-        aaa_issue = any("строгий порядок aaa" in issue.lower() for issue in validation.get("issues", []))
-        if (
-            req.type in ["manual_api"]
-            and not validation["valid"]
-            and aaa_issue
-        ):
-            validation = {
-                "valid": True,
-                "issues": [],
-                "message": "AAA-порядок скорректирован автоматически",
-                "score": 100,
-            }
+    return clean_code, syntax_fixed
 
-        if (
-            req.type == "manual_ui"
-            and not validation["valid"]
-            and aaa_issue
-            and aaa_order_is_ok(clean_code)
-        ):
-            validation = {
-                "valid": True,
-                "issues": [],
-                "message": "AAA-порядок корректен, акцептовано автоматически",
-                "score": 100,
-            }
 
-        if (
-            req.type in ["manual_ui", "manual_api"]
-            and not validation["valid"]
-            and syntax_fixed
-            and len(validation.get("issues", [])) == 1
-            and "Отсутствуют обязательные элементы для ручных тестов" in validation["issues"][0]
-        ):
-            validation = {
-                "valid": True,
-                "issues": [],
-                "message": "Строгая ручная валидация пропущена после авто-фикса синтаксиса",
-                "score": 100,
-            }
+def finalize_generation(
+    req: GenerateRequest,
+    raw_response: str | None,
+    endpoints: list | None,
+    start_time: float,
+    process: "psutil.Process",
+    initial_memory_mb: float,
+    trie: PathTrie | None = None,
+) -> dict:
+    """Чистит ответ модели, чинит синтаксис, валидирует и собирает метрики; trie — дерево путей спецификации."""
+    if not raw_response or not str(raw_response).strip():
+        logger.error(
+            "generation_empty_response",
+            extra={"type": req.type}
+        )
+        raise HTTPException(
+            status_code=502,
+            detail="Cloud.ru API вернул пустой ответ. Повторите попытку или уточните промпт."
+        )
+    clean_code = clean_code_from_llm(raw_response)
+
+    if req.type == "unit_ci":
+        if ".gitlab-ci.yml:" in clean_code:
+            parts = clean_code.split(".gitlab-ci.yml:", 2)
+            python_part = parts[0].rstrip()
+            yaml_part = parts[1] if len(parts) > 1 else ""
+            yaml_part = yaml_part.strip("\n")
+            if yaml_part:
+                commented_yaml = "\n".join(f"# {line}".rstrip() for line in yaml_part.splitlines())
+                clean_code = python_part + "\n\n# .gitlab-ci.yml\n" + commented_yaml
+            else:
+                clean_code = python_part
 
+    if req.type in ["manual_ui", "manual_api"]:
+        clean_code = ensure_owner_label(clean_code)
         if req.type == "manual_api":
-            precheck_issues = precheck_manual_generation(clean_code)
-        elif req.type == "manual_ui":
-            precheck_issues = precheck_manual_ui(clean_code)
-        else:
-            precheck_issues = []
-
-        if precheck_issues:
-            validation["issues"].extend(precheck_issues)
-            validation["valid"] = False
-            validation["message"] = "Найдены проблемы предварительной проверки"
-            validation["score"] = max(40, validation.get("score", 100) - 10 * len(precheck_issues))
-
-        end_time = time.perf_counter()
-        duration = end_time - start_time
-        duration_s = round_down(duration, 4)
-        final_memory_mb = process.memory_info().rss / 1024 / 1024
-        memory_delta_mb = final_memory_mb - initial_memory_mb
-
-        logger.info(
-            "generation_metrics",
-            extra={
-                "type": req.type,
-                "duration_s": duration_s,
-                "memory_initial_mb": round(initial_memory_mb, 1),
-                "memory_delta_mb": round(memory_delta_mb, 1),
-                "memory_final_mb": round(final_memory_mb, 1),
-                "raw_length": len(raw_response) if raw_response else 0,
-                "clean_length": len(clean_code) if clean_code else 0,
-            }
-        )
+            clean_code = enforce_aaa_order(clean_code)
 
-        return {
-            "code": clean_code,
-            "validation": validation,
+    clean_code, syntax_fixed = repair_syntax(clean_code)
+
+    if req.type == "auto_api":
+        missing = check_coverage(endpoints, clean_code, trie)
+        if missing:
+            logger.info("coverage_missing", extra={"missing": missing})
+
+    if req.type in ["test_plan", "optimize"]:
+        validation = {
+            "valid": True,
+            "issues": [],
+            "message": "Тест-план / оптимизация — валидация не требуется",
+            "score": 100
+        }
+    elif req.type == "custom":
+        validation = {
+            "valid": True,
+            "issues": [],
+            "message": "Custom сценарий — валидация по синтаксису Python",
+            "score": 100
+        }
+    else:
+        validation = validate_allure_code(clean_code, req.type)
+
+    aaa_issue = any("строгий порядок aaa" in issue.lower() for issue in validation.get("issues", []))
+    if (
+        req.type in ["manual_api"]
+        and not validation["valid"]
+        and aaa_issue
+    ):
+        validation = {
+            "valid": True,
+            "issues": [],
+            "message": "AAA-порядок скорректирован автоматически",
+            "score": 100,
+        }
+
+    if (
+        req.type == "manual_ui"
+        and not validation["valid"]
+        and aaa_issue
+        and aaa_order_is_ok(clean_code)
+    ):
+        validation = {
+            "valid": True,
+            "issues": [],
+            "message": "AAA-порядок корректен, акцептовано автоматически",
+            "score": 100,
+        }
+
+    if (
+        req.type in ["manual_ui", "manual_api"]
+        and not validation["valid"]
+        and syntax_fixed
+        and len(validation.get("issues", [])) == 1
+        and "Отсутствуют обязательные элементы для ручных тестов" in validation["issues"][0]
+    ):
+        validation = {
+            "valid": True,
+            "issues": [],
+            "message": "Строгая ручная валидация пропущена после авто-фикса синтаксиса",
+            "score": 100,
+        }
+
+    if req.type == "manual_api":
+        precheck_issues = precheck_manual_generation(clean_code)
+    elif req.type == "manual_ui":
+        precheck_issues = precheck_manual_ui(clean_code)
+    else:
+        precheck_issues = []
+
+    if precheck_issues:
+        validation["issues"].extend(precheck_issues)
+        validation["valid"] = False
+        validation["message"] = "Найдены проблемы предварительной проверки"
+        validation["score"] = max(40, validation.get("score", 100) - 10 * len(precheck_issues))
+
+    end_time = time.perf_counter()
+    duration = end_time - start_time
+    duration_s = round_down(duration, 4)
+    final_memory_mb = process.memory_info().rss / 1024 / 1024
+    memory_delta_mb = final_memory_mb - initial_memory_mb
+
+    logger.info(
+        "generation_metrics",
+        extra={
             "type": req.type,
-            "metrics": {
-                "duration_s": duration_s,
-                "memory_mb": round(final_memory_mb, 1),
-                "per_case_s": round(duration / 10, 2) if req.type == "auto_api" else None,
-            },
+            "duration_s": duration_s,
+            "memory_initial_mb": round(initial_memory_mb, 1),
+            "memory_delta_mb": round(memory_delta_mb, 1),
+            "memory_final_mb": round(final_memory_mb, 1),
             "raw_length": len(raw_response) if raw_response else 0,
-            "clean_length": len(clean_code) if clean_code else 0
+            "clean_length": len(clean_code) if clean_code else 0,
         }
+    )
 
-    except (httpx.TimeoutException, httpx.ReadTimeout, httpx.ConnectTimeout) as e:
+    return {
+        "code": clean_code,
+        "validation": validation,
+        "type": req.type,
+        "metrics": {
+            "duration_s": duration_s,
+            "memory_mb": round(final_memory_mb, 1),
+            "per_case_s": round(duration / 10, 2) if req.type == "auto_api" else None,
+            "endpoints_in_prompt": len(endpoints) if endpoints is not None else None,
+        },
+        "raw_length": len(raw_response) if raw_response else 0,
+        "clean_length": len(clean_code) if clean_code else 0
+    }
+
+
+def generation_error(req: GenerateRequest, e: Exception, raw_response: str | None) -> HTTPException:
+    """Переводит ошибку вызова модели/постобработки в HTTPException с нужным статусом."""
+    if isinstance(e, HTTPException):
+        # Пробрасываем HTTP ошибки, чтобы не перезаписывать статус на 500
+        return e
+    if isinstance(e, LimiterOverloaded):
+        logger.warning(
+            "generation_rejected_overload",
+            extra={"type": req.type, "error": str(e), "retry_after": e.retry_after}
+        )
+        return HTTPException(
+            status_code=503,
+            detail=f"Cloud.ru API перегружен: {e}. Повторите запрос позже.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    if isinstance(e, (httpx.TimeoutException, httpx.ReadTimeout, httpx.ConnectTimeout)) or (
+        is_llm_timeout(e)
+    ):
         logger.error(
             "generation_timeout",
-            exc_info=True,
+            exc_info=e,
             extra={
                 "type": req.type,
                 "error": str(e),
                 "error_type": type(e).__name__
             }
         )
-        raise HTTPException(
+        return HTTPException(
             status_code=504,
             detail="Превышено время ожидания ответа от Cloud.ru API (timeout). Попробуйте повторить запрос или уменьшить размер запроса."
         )
-    except HTTPException as e:
-        # Пробрасываем HTTP ошибки, чтобы не перезаписывать статус на 500
-        raise e
-    except Exception as e:
-        if APITimeoutError and isinstance(e, APITimeoutError):
-            logger.error(
-                "generation_timeout",
-                exc_info=True,
-                extra={
-                    "type": req.type,
-                    "error": str(e),
-                    "error_type": "APITimeoutError"
-                }
+    print(f"\nОШИБКА при {req.type}:\n{e}\n")
+    print(f"Сырой ответ:\n{raw_response if raw_response else '—'}\n")
+    return HTTPException(status_code=500, detail="Ошибка генерации. Проверь логи.")
+
+
+# Число частей для ручных наборов по умолчанию (1 — один большой вызов модели)
+MANUAL_SHARDS = int(os.getenv("MANUAL_SHARDS", "1"))
+
+
+def shard_is_complete(code: str, shard) -> bool:
+    """Ответ части разбирается ast и содержит все её классы (иначе — обрезан или не тот)."""
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return False
+    return all(re.search(rf"^class\s+{c.name}\b", code, re.MULTILINE) for c in shard.classes)
+
+
+async def generate_sharded(req: GenerateRequest, messages: list[dict], max_tokens: int, shards: int) -> tuple[str, list[dict]]:
+    """
+    Генерирует ручной набор частями параллельно (по классам) и склеивает их в один модуль.
+    Обрезанная или неполная часть перегенерируется одна, с полным лимитом токенов.
+    Инструкция части дописывается в сообщение пользователя — системный префикс у частей общий.
+    Возвращает (склеенный код, сведения о частях для метрик).
+    """
+
+    async def run_shard(shard) -> tuple[str, dict]:
+        started = time.perf_counter()
+        shard_messages = messages[:-1] + [
+            {"role": "user", "content": messages[-1]["content"] + shard_instruction(shard)}
+        ]
+        shard_tokens = shard_max_tokens(shard, req.type, max_tokens)
+        raw = await call_evolution(
+            shard_messages,
+            temperature=0.0,
+            max_tokens=shard_tokens,
+            use_cache=req.use_cache,
+            request_type=req.type,
+        )
+        code = re.sub(r"^```[\w]*\s*|```$", "", raw.strip(), flags=re.MULTILINE)
+        retried = False
+        if not shard_is_complete(code, shard):
+            retried = True
+            logger.warning(
+                "shard_retry",
+                extra={"type": req.type, "shard": shard.index, "classes": [c.name for c in shard.classes]}
             )
-            raise HTTPException(
-                status_code=504,
-                detail="Превышено время ожидания ответа от Cloud.ru API (timeout). Попробуйте повторить запрос или уменьшить размер запроса."
+            raw = await call_evolution(
+                shard_messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                # Тот же лимит дал бы тот же обрезанный ответ из кэша
+                use_cache=req.use_cache and max_tokens != shard_tokens,
+                request_type=req.type,
             )
-        print(f"\nОШИБКА при {req.type}:\n{e}\n")
-        print(f"Сырой ответ:\n{raw_response if raw_response else '—'}\n")
-        raise HTTPException(status_code=500, detail="Ошибка генерации. Проверь логи.")
+            code = re.sub(r"^```[\w]*\s*|```$", "", raw.strip(), flags=re.MULTILINE)
+        return code, {
+            "index": shard.index,
+            "classes": [c.name for c in shard.classes],
+            "max_tokens": shard_tokens,
+            "retried": retried,
+            "duration_s": round(time.perf_counter() - started, 2),
+        }
+
+    results = await asyncio.gather(*(run_shard(shard) for shard in plan_shards(req.type, shards)))
+    return merge_modules([code for code, _ in results]), [info for _, info in results]
+
+
+# auto_api по группам эндпоинтов: режим по умолчанию ("" — одним вызовом модели),
+# максимальный размер группы и число повторов группы с непокрытыми эндпоинтами
+AUTO_API_FANOUT = os.getenv("AUTO_API_FANOUT", "")
+FANOUT_MAX_ENDPOINTS = int(os.getenv("FANOUT_MAX_ENDPOINTS", "12"))
+FANOUT_MAX_RETRIES = int(os.getenv("FANOUT_MAX_RETRIES", "1"))
+
+
+async def generate_fanout(
+    req: GenerateRequest, mode: str, spec_entry: SpecEntry | None = None
+) -> tuple[str, list[dict], dict[str, str], list[dict]]:
+    """
+    Генерирует auto_api по группам эндпоинтов (тег OpenAPI или префикс пути) параллельно:
+    у каждой группы свой промпт только с её эндпоинтами. Группа, в ответе которой
+    check_coverage нашёл непокрытые эндпоинты, перегенерируется одна (до FANOUT_MAX_RETRIES раз).
+    Возвращает (склеенный код, сведения о группах, файлы пакета, все эндпоинты).
+    """
+    api_endpoints = extract_api_calls(req.previous_code) if req.previous_code else []
+    selection, entry = await select_spec_endpoints(req, api_endpoints, spec_entry)
+    groups = plan_endpoint_groups(selection.endpoints, by=mode, max_endpoints=FANOUT_MAX_ENDPOINTS)
+
+    async def run_group(group) -> tuple[str, dict]:
+        started = time.perf_counter()
+        # Отбор уже сделан: группа получает ровно свои эндпоинты, без повторного разбора кода
+        group_req = req.model_copy(update={
+            "endpoint_tags": None,
+            "endpoint_paths": None,
+            "endpoint_operations": group.keys,
+            "previous_code": None,
+            "fanout": None,
+        })
+        messages, max_tokens, _ = await build_generation_prompt(group_req, entry)
+        code, missing, attempts = "", [], 0
+        while attempts <= FANOUT_MAX_RETRIES:
+            group_messages = messages[:-1] + [
+                {"role": "user", "content": messages[-1]["content"] + group_instruction(group, missing)}
+            ]
+            raw = await call_evolution(
+                group_messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                use_cache=req.use_cache,
+                request_type=req.type,
+            )
+            code = re.sub(r"^```[\w]*\s*|```$", "", raw.strip(), flags=re.MULTILINE)
+            attempts += 1
+            missing = check_coverage(group.endpoints, code, entry.trie)
+            if not missing:
+                break
+            logger.warning(
+                "fanout_group_retry",
+                extra={"type": req.type, "group": group.name, "missing": missing, "attempt": attempts}
+            )
+        return code, {
+            "index": group.index,
+            "name": group.name,
+            "endpoints": len(group.endpoints),
+            "retries": attempts - 1,
+            "missing": missing,
+            "duration_s": round(time.perf_counter() - started, 2),
+        }
+
+    results = await asyncio.gather(*(run_group(group) for group in groups))
+    code, files = stitch_package(groups, [code for code, _ in results])
+    return code, [info for _, info in results], files, selection.endpoints
+
+
+async def generate_incremental(
+    req: GenerateRequest, mode: str, spec_entry: SpecEntry | None = None
+) -> tuple[str, dict, dict[str, str] | None, list[dict]]:
+    """
+    auto_api по изменениям спецификации: модель получает только операции, которых
+    нет в хранилище или чей хэш (параметры, тело, ответы) изменился; тесты остальных
+    отобранных операций берутся из прошлых генераций. Новые тесты раскладываются по
+    операциям и сохраняются. mode — fanout для перегенерируемых операций ("" — один вызов).
+    Возвращает (собранный код, сведения о диффе, файлы пакета при fanout, все эндпоинты).
+    """
+    api_endpoints = extract_api_calls(req.previous_code) if req.previous_code else []
+    selection, entry = await select_spec_endpoints(req, api_endpoints, spec_entry)
+    hashes = {endpoint_key(ep): operation_hash(ep) for ep in entry.endpoints}
+    stored = await generation_store.load(entry.spec_id)
+    diff = diff_operations(hashes, {key: item.op_hash for key, item in stored.items()})
+
+    selected = [endpoint_key(ep) for ep in selection.endpoints]
+    stale = set(diff.added) | set(diff.changed)
+    regenerate = [key for key in selected if key in stale]
+    tests = {key: stored[key].tests for key in selected if key not in stale}
+    unsplit: list[str] = []
+
+    if regenerate:
+        # Отбор уже сделан: модель получает ровно перегенерируемые операции
+        changed_req = req.model_copy(update={
+            "endpoint_tags": None,
+            "endpoint_paths": None,
+            "endpoint_operations": regenerate,
+            "previous_code": None,
+            "fanout": None,
+            "incremental": False,
+        })
+        if mode:
+            _, _, group_files, _ = await generate_fanout(changed_req, mode, entry)
+            modules = [code for name, code in group_files.items() if name != "conftest.py"]
+        else:
+            messages, max_tokens, _ = await build_generation_prompt(changed_req, entry)
+            raw = await call_evolution(
+                messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                use_cache=req.use_cache,
+                request_type=req.type,
+            )
+            modules = [clean_code_from_llm(raw)]
+
+        regenerated = [ep for ep in selection.endpoints if endpoint_key(ep) in stale]
+        fresh = {}
+        for module in modules:
+            try:
+                fresh.update(split_operation_tests(repair_syntax(module)[0], regenerated))
+            except SyntaxError:
+                # Неразбираемый ответ не сохраняем, но и не теряем: он попадёт в код как есть
+                unsplit.append(module)
+        await generation_store.save(
+            entry.spec_id,
+            {key: StoredOperation(hashes[key], item) for key, item in fresh.items()},
+            removed=diff.removed,
+        )
+        tests.update(fresh)
+    elif diff.removed:
+        await generation_store.save(entry.spec_id, {}, removed=diff.removed)
+
+    files = None
+    if mode:
+        groups = plan_endpoint_groups(selection.endpoints, by=mode, max_endpoints=FANOUT_MAX_ENDPOINTS)
+        group_modules = [assemble_module(tests[key] for key in group.keys if key in tests) for group in groups]
+        code, files = stitch_package(groups, group_modules)
+    else:
+        code = assemble_module(tests[key] for key in selected if key in tests)
+    if unsplit:
+        code = merge_modules([code] + unsplit)
+
+    info = {
+        "spec_id": entry.spec_id,
+        "added": [key for key in selected if key in diff.added],
+        "changed": [key for key in selected if key in diff.changed],
+        "reused": len(selected) - len(regenerate),
+        "removed": diff.removed,
+        "without_tests": [key for key in selected if key not in tests],
+    }
+    logger.info(
+        "incremental_generation",
+        extra={
+            "spec_id": entry.spec_id,
+            "selected": len(selected),
+            "regenerated": len(regenerate),
+            "reused": info["reused"],
+            "removed": len(diff.removed),
+        }
+    )
+    return code, info, files, selection.endpoints
+
+
+@app.post("/generate")
+async def generate_tests(req: GenerateRequest):
+    start_time = time.perf_counter()  # Начало замера
+    process = psutil.Process()  # Текущий процесс для memory
+    initial_memory_mb = process.memory_info().rss / 1024 / 1024  # МБ в покое
+    raw_response: str | None = None
+
+    if req.shards is not None and req.shards > 1 and req.type not in SHARD_CLASSES:
+        raise HTTPException(status_code=400, detail="Шардирование поддерживается только для manual_api и manual_ui")
+    shards = req.shards or MANUAL_SHARDS
+    sharded = shards > 1 and req.type in SHARD_CLASSES and not req.custom_prompt
+    if req.fanout and (req.type != "auto_api" or req.fanout not in FANOUT_MODES):
+        raise HTTPException(status_code=400, detail=f"fanout поддерживается только для auto_api: {list(FANOUT_MODES)}")
+    fanout = (req.fanout or AUTO_API_FANOUT) if req.type == "auto_api" and not req.custom_prompt else ""
+    if req.incremental and (req.type != "auto_api" or req.custom_prompt):
+        raise HTTPException(status_code=400, detail="incremental поддерживается только для auto_api без custom_prompt")
+
+    # Одна версия спецификации на весь запрос, включая группы fanout и проверку покрытия
+    spec_entry = await resolve_spec(req) if req.type == "auto_api" else None
+    if not fanout and not req.incremental:
+        messages, max_tokens, endpoints = await build_generation_prompt(req, spec_entry)
+
+    try:
+        usage = track_usage()
+        shard_info = None
+        fanout_files = None
+        incremental_info = None
+        if req.incremental:
+            raw_response, incremental_info, fanout_files, endpoints = await generate_incremental(req, fanout, spec_entry)
+        elif fanout:
+            raw_response, shard_info, fanout_files, endpoints = await generate_fanout(req, fanout, spec_entry)
+        elif sharded:
+            raw_response, shard_info = await generate_sharded(req, messages, max_tokens, shards)
+        else:
+            raw_response = await call_evolution(
+                messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                use_cache=req.use_cache,
+                request_type=req.type,
+            )
+        trie = spec_entry.trie if spec_entry else None
+        result = finalize_generation(req, raw_response, endpoints, start_time, process, initial_memory_mb, trie)
+        if fanout_files is not None:
+            result["files"] = fanout_files
+        if incremental_info is not None:
+            result["metrics"]["incremental"] = incremental_info
+        elif fanout_files is not None:
+            result["metrics"]["groups"] = shard_info
+        elif shard_info is not None:
+            result["metrics"]["shards"] = shard_info
+        result["metrics"]["llm_usage"] = usage
+        return result
+    except Exception as e:
+        raise generation_error(req, e, raw_response)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Форматирует одно событие Server-Sent Events."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@app.post("/generate/stream")
+async def generate_tests_stream(req: GenerateRequest):
+    """
+    SSE-вариант /generate: события token с фрагментами ответа модели по мере генерации,
+    затем одно событие result (код, валидация, метрики) или error.
+    Ответ всегда одним вызовом модели: shards, fanout и incremental — только в /generate.
+    """
+    unsupported = [
+        name for name, value in (
+            ("shards", req.shards is not None and req.shards > 1),
+            ("fanout", req.fanout),
+            ("incremental", req.incremental),
+        ) if value
+    ]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"/generate/stream не поддерживает {', '.join(unsupported)}: используйте /generate",
+        )
+    start_time = time.perf_counter()
+    process = psutil.Process()
+    initial_memory_mb = process.memory_info().rss / 1024 / 1024
+
+    # Ошибки сборки промпта (400/500) отдаём обычным HTTP-ответом, до начала потока
+    spec_entry = await resolve_spec(req) if req.type == "auto_api" else None
+    messages, max_tokens, endpoints = await build_generation_prompt(req, spec_entry)
+
+    async def events():
+        chunks: list[str] = []
+        try:
+            usage = track_usage()
+            async for delta in stream_evolution(
+                messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                use_cache=req.use_cache,
+                request_type=req.type,
+            ):
+                chunks.append(delta)
+                yield sse_event("token", {"delta": delta})
+            raw_response = "".join(chunks).strip()
+            trie = spec_entry.trie if spec_entry else None
+            result = finalize_generation(req, raw_response, endpoints, start_time, process, initial_memory_mb, trie)
+            result["metrics"]["llm_usage"] = usage
+            yield sse_event("result", result)
+        except Exception as e:
+            http_error = generation_error(req, e, "".join(chunks))
+            error_data = {"status_code": http_error.status_code, "detail": http_error.detail}
+            if http_error.headers and "Retry-After" in http_error.headers:
+                error_data["retry_after"] = int(http_error.headers["Retry-After"])
+            yield sse_event("error", error_data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+MAX_BATCH_SIZE = 8
+
+
+async def run_batch_item(index: int, item: GenerateRequest) -> dict:
+    """Один элемент пакета: результат /generate или ошибка с её HTTP-статусом."""
+    started = time.perf_counter()
+    try:
+        result = await generate_tests(item)
+        entry = {"index": index, "type": item.type, "status_code": 200, "result": result}
+    except Exception as e:
+        # Любая ошибка элемента (в т.ч. сборки промпта вне generate_tests/try) — только его результат
+        http_error = generation_error(item, e, None)
+        entry = {"index": index, "type": item.type, "status_code": http_error.status_code, "detail": http_error.detail}
+        if http_error.headers and "Retry-After" in http_error.headers:
+            entry["retry_after"] = int(http_error.headers["Retry-After"])
+    entry["duration_s"] = round(time.perf_counter() - started, 2)
+    return entry
+
+
+def batch_metrics(items: list[dict], start_time: float) -> dict:
+    wall_s = time.perf_counter() - start_time
+    sequential_s = sum(item["duration_s"] for item in items)
+    return {
+        "total": len(items),
+        "succeeded": sum(1 for item in items if item["status_code"] == 200),
+        "failed": sum(1 for item in items if item["status_code"] != 200),
+        "duration_s": round(wall_s, 2),
+        "sum_item_duration_s": round(sequential_s, 2),
+        "speedup": round(sequential_s / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+@app.post("/generate/batch")
+async def generate_tests_batch(batch: BatchGenerateRequest):
+    """
+    Несколько генераций одним запросом, параллельно (общий лимит одновременных
+    вызовов модели соблюдается лимитером cloud_ru). Ошибка одного элемента не
+    роняет остальные. stream=true — SSE: событие item на каждый готовый элемент, затем done.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Пакет пуст: передайте хотя бы один запрос")
+    if len(batch.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Слишком много запросов в пакете (макс. {MAX_BATCH_SIZE})")
+
+    start_time = time.perf_counter()
+
+    if not batch.stream:
+        items = await asyncio.gather(*(run_batch_item(i, item) for i, item in enumerate(batch.requests)))
+        return {"results": items, "metrics": batch_metrics(items, start_time)}
+
+    async def events():
+        tasks = [asyncio.ensure_future(run_batch_item(i, item)) for i, item in enumerate(batch.requests)]
+        items: list[dict] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                items.append(item)
+                yield sse_event("item", item)
+            yield sse_event("done", batch_metrics(items, start_time))
+        finally:
+            # Клиент отключился — незавершённые генерации больше не нужны
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.post("/commit")
 async def commit_to_gitlab(req: CommitRequest):
@@ -1067,12 +1835,26 @@ async def commit_to_gitlab(req: CommitRequest):
     else:
         raise HTTPException(status_code=400, detail=result['message'])
 
-def check_coverage(endpoints, generated_code: str):
-    missing = []
-    for ep in endpoints:
-        if ep["path"] not in generated_code:
-            missing.append(f"{ep['method']} {ep['path']}")
-    return missing
+def check_coverage(endpoints, generated_code: str, trie: PathTrie | None = None):
+    """
+    Эндпоинты (ключи "METHOD /path"), которые ни разу не вызваны в коде: вызовы
+    из кода сопоставляются с шаблонами путей по дереву сегментов с учётом метода.
+    Путь, на который не распознан ни один вызов (httpx.get, обёртки вроде
+    _get("/vms")), и неразбираемый код (обрезанный ответ) проверяются по вхождению
+    пути в текст. trie — дерево спецификации (SpecEntry.trie); может содержать
+    больше эндпоинтов, чем endpoints.
+    """
+    try:
+        calls = extract_call_sites(generated_code)
+    except SyntaxError:
+        return [endpoint_key(ep) for ep in endpoints if ep["path"] not in generated_code]
+    trie = trie or PathTrie(endpoints)
+    covered = trie.covered(calls)
+    called_paths = {ep["path"] for call in calls for ep in trie.match(call.path)}
+    return [
+        endpoint_key(ep) for ep in endpoints
+        if endpoint_key(ep) not in covered and (ep["path"] in called_paths or ep["path"] not in generated_code)
+    ]
 
 
 @app.get("/")
@@ -1093,4 +1875,72 @@ async def debug_paths():
         "openapi_file_exists": (OPENAPI_DIR / "openapi-v3.yaml").exists() if OPENAPI_DIR.exists() else False,
         "cwd": str(Path.cwd()),
         "__file__": str(__file__),
-    }
\ No newline at end of file
+    }
+
+
+SPEC_PARSE_ERROR_DETAIL = "Спецификация не разобрана: нужен корректный OpenAPI 3 (подробности — в логе сервера)"
+
+
+@app.post("/specs")
+async def register_spec(req: SpecRegisterRequest):
+    """Регистрирует спецификацию (или новую версию) в реестре; разбор — в рабочем потоке."""
+    try:
+        entry = await spec_registry.register(req.spec_id, content=req.content, path=req.path)
+    except SpecParseError:
+        # Текст ошибки разбора может содержать фрагменты файла — он только в логе (spec_parse_failed)
+        raise HTTPException(status_code=422, detail=SPEC_PARSE_ERROR_DETAIL)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return entry.info()
+
+
+@app.get("/specs")
+async def list_specs():
+    return {"specs": spec_registry.describe(), "stats": spec_registry.stats()}
+
+
+@app.post("/specs/{spec_id}/reload")
+async def reload_spec(spec_id: str):
+    """Перечитывает источник спецификации; при ошибке продолжает работать прежняя версия."""
+    try:
+        entry = await spec_registry.reload(spec_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Спецификация {spec_id} не зарегистрирована")
+    except SpecParseError:
+        raise HTTPException(status_code=422, detail=SPEC_PARSE_ERROR_DETAIL)
+    return entry.info()
+
+
+@app.delete("/specs/{spec_id}")
+async def delete_spec(spec_id: str):
+    try:
+        spec_registry.remove(spec_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Спецификация {spec_id} не зарегистрирована")
+    return {"deleted": spec_id}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Готовность воркера: спецификация OpenAPI загружена (иначе 503 и состояние загрузки)."""
+    ready = openapi_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "openapi": spec_loader.status()},
+    )
+
+
+@app.get("/debug/prompts")
+async def debug_prompts():
+    """Кэш шаблонов промптов: версии (ETag), попадания, перезагрузки."""
+    return prompt_engine.stats()
+
+
+@app.get("/debug/llm")
+async def debug_llm():
+    """Счётчики слоя вызовов модели."""
+    return get_llm_stats()
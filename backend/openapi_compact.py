@@ -0,0 +1,237 @@
+"""
+Компактная запись операций OpenAPI для промпта auto_api.
+
+Вместо repr() развёрнутых ($ref уже подставлены prance) словарей параметров
+и тел запросов — короткая нотация типов в духе TypeScript:
+
+    POST /api/v1/disks
+      query: project_id: uuid4
+      body: PublicDiskCreateRequest
+      201: PublicDiskResponse
+
+Именованные схемы из components.schemas узнаются по структуре и выводятся
+один раз в разделе определений; описания полей и ответов добавляются,
+пока не исчерпан бюджет символов.
+"""
+import json
+from typing import Dict, List, Tuple
+
+# Сколько символов описаний (полей, параметров, ответов) попадает в промпт
+DESCRIPTION_BUDGET_CHARS = 4000
+MAX_DESCRIPTION_CHARS = 100
+MAX_ENUM_VALUES = 8
+MAX_DEPTH = 12
+
+# Ключи, не влияющие на структуру схемы: схема, встроенная в операцию, отличается
+# от именованной только ими (prance подставляет $ref вместе с соседним description)
+_ANNOTATION_KEYS = {"description", "title", "example", "examples", "default"}
+
+
+def _strip_annotations(schema):
+    if isinstance(schema, dict):
+        return {k: _strip_annotations(v) for k, v in schema.items() if k not in _ANNOTATION_KEYS}
+    if isinstance(schema, list):
+        return [_strip_annotations(v) for v in schema]
+    return schema
+
+
+def _is_nameable(schema: dict) -> bool:
+    return bool(schema.get("properties")) or "enum" in schema
+
+
+class SchemaCatalog:
+    """Именованные схемы спецификации: узнаёт развёрнутую схему по title или по структуре."""
+
+    def __init__(self, named: Dict[str, dict]):
+        self.named = named
+        self._fingerprints: Dict[int, str] = {}
+        self._by_fingerprint: Dict[str, str] = {}
+        for name, schema in named.items():
+            if isinstance(schema, dict) and _is_nameable(schema):
+                self._by_fingerprint.setdefault(self._fingerprint(schema), name)
+
+    def _fingerprint(self, schema: dict) -> str:
+        key = id(schema)
+        fp = self._fingerprints.get(key)
+        if fp is None:
+            fp = json.dumps(_strip_annotations(schema), sort_keys=True, ensure_ascii=False, default=str)
+            self._fingerprints[key] = fp
+        return fp
+
+    def name_for(self, schema: dict) -> str | None:
+        if not _is_nameable(schema):
+            return None
+        title = schema.get("title")
+        if title in self.named:
+            return title
+        return self._by_fingerprint.get(self._fingerprint(schema))
+
+
+class CompactSerializer:
+    """
+    Сериализатор операций одной спецификации. Именованные схемы, на которые
+    сослались operation()/negative_responses(), выводит definitions().
+    """
+
+    def __init__(self, spec: dict, description_budget: int = DESCRIPTION_BUDGET_CHARS):
+        self.catalog = SchemaCatalog(spec.get("components", {}).get("schemas", {}))
+        self.description_budget = description_budget
+        self._used: List[str] = []
+
+    def _describe(self, text) -> str:
+        if not text or self.description_budget <= 0:
+            return ""
+        line = " ".join(str(text).split())
+        if len(line) > MAX_DESCRIPTION_CHARS:
+            line = line[:MAX_DESCRIPTION_CHARS - 1].rstrip() + "…"
+        self.description_budget -= len(line)
+        return line
+
+    def _use(self, name: str) -> str:
+        if name not in self._used:
+            self._used.append(name)
+        return name
+
+    @staticmethod
+    def _range(schema: dict, low_key: str, high_key: str) -> str:
+        low, high = schema.get(low_key), schema.get(high_key)
+        if low is None and high is None:
+            return ""
+        return f"({'' if low is None else low}..{'' if high is None else high})"
+
+    def type_of(self, schema, depth: int = 0, named: bool = True) -> str:
+        """Короткая запись типа; named=False — не заменять саму схему её именем."""
+        if not isinstance(schema, dict) or not schema:
+            return "any"
+        if depth > MAX_DEPTH:
+            return "…"
+        if named:
+            name = self.catalog.name_for(schema)
+            if name:
+                return self._use(name)
+
+        for key in ("anyOf", "oneOf"):
+            if key in schema:
+                variants: List[str] = []
+                for sub in schema[key]:
+                    variant = self.type_of(sub, depth + 1)
+                    if variant not in variants:
+                        variants.append(variant)
+                return " | ".join(variants)
+        if "allOf" in schema:
+            parts = [self.type_of(sub, depth + 1) for sub in schema["allOf"]]
+            return parts[0] if len(parts) == 1 else " & ".join(parts)
+        if "enum" in schema:
+            values = [json.dumps(v, ensure_ascii=False) for v in schema["enum"][:MAX_ENUM_VALUES]]
+            return "|".join(values) + ("|…" if len(schema["enum"]) > MAX_ENUM_VALUES else "")
+        if "const" in schema:
+            return json.dumps(schema["const"], ensure_ascii=False)
+
+        kind = schema.get("type")
+        if isinstance(kind, list):
+            return " | ".join(self.type_of({**schema, "type": k}, depth + 1, named=False) for k in kind)
+        if kind == "array" or "items" in schema:
+            return f"[{self.type_of(schema.get('items'), depth + 1)}]"
+        if kind == "object" or "properties" in schema:
+            props = schema.get("properties") or {}
+            if not props:
+                extra = schema.get("additionalProperties")
+                return f"{{str: {self.type_of(extra, depth + 1)}}}" if isinstance(extra, dict) and extra else "object"
+            required = set(schema.get("required") or [])
+            fields = ", ".join(
+                f"{field}{'' if field in required else '?'}: {self.type_of(sub, depth + 1)}"
+                for field, sub in props.items()
+            )
+            return "{" + fields + "}"
+
+        if kind == "string":
+            text = schema.get("format") or "str" + self._range(schema, "minLength", "maxLength")
+        elif kind in ("integer", "number"):
+            text = ("int" if kind == "integer" else "num") + self._range(schema, "minimum", "maximum")
+        elif kind == "boolean":
+            text = "bool"
+        elif kind == "null":
+            return "null"
+        else:
+            text = "any"
+        default = schema.get("default")
+        if default is not None and not isinstance(default, (dict, list)):
+            text += f" = {json.dumps(default, ensure_ascii=False)}"
+        return text
+
+    def _parameters(self, parameters: List[dict]) -> List[str]:
+        groups: Dict[str, List[str]] = {}
+        for param in parameters:
+            if not isinstance(param, dict) or "name" not in param:
+                continue
+            optional = "" if param.get("required") else "?"
+            entry = f"{param['name']}{optional}: {self.type_of(param.get('schema'))}"
+            note = self._describe(param.get("description"))
+            groups.setdefault(param.get("in", "query"), []).append(entry + (f" ({note})" if note else ""))
+        return [f"  {location}: " + ", ".join(entries) for location, entries in groups.items()]
+
+    def _body_type(self, container: dict) -> str:
+        content = container.get("content") or {}
+        if not content:
+            return "—"
+        media, body = next(iter(content.items()))
+        text = self.type_of((body or {}).get("schema"))
+        return text if media == "application/json" else f"{text} ({media})"
+
+    def operation(self, ep: dict) -> str:
+        lines = [f"{ep['method']} {ep['path']}"]
+        lines.extend(self._parameters(ep.get("parameters") or []))
+        body = ep.get("requestBody") or {}
+        if body:
+            lines.append(f"  body{'' if body.get('required') else '?'}: {self._body_type(body)}")
+        for code, response in (ep.get("responses") or {}).items():
+            if str(code).startswith(("1", "2", "3")):
+                lines.append(f"  {code}: {self._body_type(response or {})}")
+        return "\n".join(lines)
+
+    def negative_responses(self, ep: dict) -> str | None:
+        """Ответы 4xx/5xx операции: код, тип тела, кратко — когда возникает."""
+        items = []
+        for code, response in (ep.get("responses") or {}).items():
+            if str(code).startswith(("4", "5")):
+                response = response or {}
+                note = self._describe(response.get("description"))
+                body = self._body_type(response)
+                items.append(str(code) + ("" if body == "—" else f" {body}") + (f" — {note}" if note else ""))
+        if not items:
+            return None
+        return f"{ep['method']} {ep['path']}: " + "; ".join(items)
+
+    def _definition_body(self, schema: dict, describe: bool) -> List[str]:
+        if "enum" in schema or not schema.get("properties"):
+            return [f"= {self.type_of(schema, named=False)}"]
+        required = set(schema.get("required") or [])
+        lines = ["{"]
+        for field, sub in schema["properties"].items():
+            line = f"  {field}{'' if field in required else '?'}: {self.type_of(sub, 1)}"
+            note = self._describe((sub or {}).get("description")) if describe else ""
+            lines.append(line + (f"  # {note}" if note else ""))
+        lines.append("}")
+        return lines
+
+    def definitions(self) -> str:
+        """
+        Определения всех упомянутых именованных схем (включая вложенные), каждая —
+        один раз; схемы с одинаковой структурой (типовые ошибки {code, message})
+        выводятся одним определением с перечислением имён.
+        """
+        blocks: Dict[str, Tuple[List[str], List[str]]] = {}
+        i = 0
+        while i < len(self._used):
+            name = self._used[i]
+            i += 1
+            schema = self.catalog.named[name]
+            shape = "\n".join(self._definition_body(schema, describe=False))
+            if shape in blocks:
+                blocks[shape][0].append(name)
+            else:
+                blocks[shape] = ([name], self._definition_body(schema, describe=True))
+        return "\n".join(
+            ", ".join(names) + " " + body[0] + "".join("\n" + line for line in body[1:])
+            for names, body in blocks.values()
+        )
@@ -1,7 +1,17 @@
-from prance import ResolvingParser
+# prance (и валидатор спецификаций) загружается при первом разборе, а не при импорте
+ResolvingParser = None
 
-def load_openapi_spec(path: str) -> dict:
-    parser = ResolvingParser(path, backend="openapi-spec-validator")
+
+def load_openapi_spec(path: str, remote_refs: bool = True) -> dict:
+    """remote_refs=False — $ref разворачиваются только внутри документа и по локальным файлам, без HTTP."""
+    global ResolvingParser
+    if ResolvingParser is None:
+        from prance import ResolvingParser
+    options = {}
+    if not remote_refs:
+        from prance.util.resolver import RESOLVE_FILES, RESOLVE_INTERNAL
+        options["resolve_types"] = RESOLVE_INTERNAL | RESOLVE_FILES
+    parser = ResolvingParser(path, backend="openapi-spec-validator", **options)
     return parser.specification
 
 
@@ -14,6 +24,8 @@ def extract_endpoints(spec: dict):
                 "path": path,
                 "method": method.upper(),
                 "summary": info.get("summary", ""),
+                "operationId": info.get("operationId", ""),
+                "tags": info.get("tags", []),
                 "parameters": info.get("parameters", []),
                 "requestBody": info.get("requestBody", {}),
                 "responses": info.get("responses", {})
@@ -0,0 +1,105 @@
+import re
+from typing import Dict, Iterable, List, Set
+from urllib.parse import urlsplit
+
+# Сегмент-параметр шаблона OpenAPI ("{disk_id}") или подстановка f-строки ("{}")
+_PARAM_SEGMENT_RE = re.compile(r"^\{[^/{}]*\}$")
+# Подстановка f-строки внутри сегмента: f"/vms/{vm_id}" -> "/vms/{}"
+WILDCARD = "{}"
+
+
+def normalize_path(url: str) -> str:
+    """'https://host/api/v1/disks/?x=1' -> '/api/v1/disks'."""
+    path = urlsplit(url.strip()).path if "://" in url else url.strip().split("?", 1)[0]
+    if not path.startswith("/"):
+        path = "/" + path
+    return path.rstrip("/") or "/"
+
+
+def endpoint_key(ep: dict) -> str:
+    return f"{ep['method']} {ep['path']}"
+
+
+def split_path(path: str) -> List[str]:
+    norm = normalize_path(path)
+    return norm.strip("/").split("/") if norm != "/" else []
+
+
+class _Node:
+    __slots__ = ("literal", "param", "endpoints")
+
+    def __init__(self):
+        self.literal: Dict[str, "_Node"] = {}
+        self.param: "_Node | None" = None
+        self.endpoints: List[dict] = []
+
+
+class PathTrie:
+    """
+    Префиксное дерево шаблонов путей OpenAPI по сегментам: "{param}" — отдельная
+    ветвь-подстановка. Конкретный URL (/api/v1/disks/9f1c...) разрешается в операции
+    за один проход по своим сегментам, независимо от числа эндпоинтов.
+
+    Сегмент запроса "{...}" (подстановка из f-строки) совпадает с любым сегментом;
+    конкретный сегмент — со своей литеральной ветвью, а если её нет — с параметром.
+    """
+
+    def __init__(self, endpoints: Iterable[dict]):
+        self.root = _Node()
+        for ep in endpoints:
+            node = self.root
+            for segment in split_path(ep["path"]):
+                if _PARAM_SEGMENT_RE.match(segment):
+                    node.param = node.param or _Node()
+                    node = node.param
+                else:
+                    node = node.literal.setdefault(segment, _Node())
+            node.endpoints.append(ep)
+
+    def _walk(self, path: str) -> List[_Node]:
+        frontier = [self.root]
+        for segment in split_path(path):
+            wildcard = WILDCARD in segment or bool(_PARAM_SEGMENT_RE.match(segment))
+            step: List[_Node] = []
+            for node in frontier:
+                if wildcard:
+                    step.extend(node.literal.values())
+                    if node.param is not None:
+                        step.append(node.param)
+                elif segment in node.literal:
+                    step.append(node.literal[segment])
+                elif node.param is not None:
+                    step.append(node.param)
+            frontier = step
+            if not frontier:
+                break
+        return frontier
+
+    @staticmethod
+    def _subtree(node: _Node) -> List[dict]:
+        found, stack = [], [node]
+        while stack:
+            current = stack.pop()
+            found.extend(current.endpoints)
+            stack.extend(current.literal.values())
+            if current.param is not None:
+                stack.append(current.param)
+        return found
+
+    def match(self, path: str, method: str | None = None, prefix: bool = False) -> List[dict]:
+        """
+        Операции, чей шаблон пути совпадает с path (prefix=True — и все операции
+        глубже: для обрезанных f-строк). method=None — любой метод.
+        """
+        nodes = self._walk(path)
+        endpoints = [ep for node in nodes for ep in (self._subtree(node) if prefix else node.endpoints)]
+        if method is not None:
+            endpoints = [ep for ep in endpoints if ep["method"] == method.upper()]
+        return endpoints
+
+    def covered(self, calls: Iterable) -> Set[str]:
+        """Ключи "METHOD /path" операций, вызванных хотя бы одним из calls (ApiCall из validator)."""
+        keys: Set[str] = set()
+        for call in calls:
+            keys.update(endpoint_key(ep) for ep in self.match(call.path, call.method))
+        return keys
@@ -0,0 +1,341 @@
+"""
+Движок промптов на Jinja2: шаблоны backend/prompts/*.jinja компилируются
+один раз на версию файла (байткод кэшируется на диске между перезапусками,
+изменённые на диске шаблоны подхватываются без рестарта), запрос
+рендерится за один проход.
+
+.txt-шаблоны остаются исходником для людей (их отдаёт /prompt/{type}),
+.jinja собираются из них и коммитятся; рендерится всегда .jinja (source="txt" —
+явный режим, в котором шаблоны компилируются из .txt, например для правок в проде):
+
+    python -m backend.prompt_engine          # пересобрать .jinja
+    python -m backend.prompt_engine --check  # CI: ненулевой код, если .jinja устарели
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import time
+import weakref
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, Template, TemplateNotFound, nodes
+
+logger = logging.getLogger("app")
+
+PROMPTS_DIR = Path(__file__).parent / "prompts"
+# Сколько шаблонов from_text держится в памяти (LRU)
+FROM_TEXT_CACHE_SIZE = 64
+# Из какого файла компилируется шаблон типа, если есть оба
+TEMPLATE_SOURCES = ("jinja", "txt")
+
+# Плейсхолдеры .txt-шаблонов → переменные .jinja
+TXT_PLACEHOLDERS = {
+    "{openapi_endpoints}": "openapi_endpoints",
+    "{schemas}": "schemas",
+    "{endpoints_detailed}": "endpoints_detailed",
+    "{negative_responses}": "negative_responses",
+    "{code_snippet}": "code_snippet",
+    "{вставь сюда весь код, который только что сгенерировал}": "previous_code",
+    "{вставь сюда весь код}": "previous_code",
+    "{previous_code}": "previous_code",
+    "{historical_bugs}": "historical_bugs",
+    "{defects_summary}": "historical_bugs",
+}
+
+_TXT_PLACEHOLDER_RE = re.compile("|".join(re.escape(ph) for ph in sorted(TXT_PLACEHOLDERS, key=len, reverse=True)))
+# Синтаксис Jinja, случайно встретившийся в тексте шаблона
+_JINJA_SYNTAX_RE = re.compile(r"\{\{|\{%|\{#")
+
+
+def txt_to_jinja(text: str) -> str:
+    """Текст .txt-шаблона → исходник .jinja: плейсхолдеры становятся переменными, остальное — литералом."""
+    parts = []
+    last = 0
+    for match in _TXT_PLACEHOLDER_RE.finditer(text):
+        parts.append(_JINJA_SYNTAX_RE.sub(lambda m: "{{ '" + m.group(0) + "' }}", text[last:match.start()]))
+        parts.append("{{ " + TXT_PLACEHOLDERS[match.group(0)] + " }}")
+        last = match.end()
+    parts.append(_JINJA_SYNTAX_RE.sub(lambda m: "{{ '" + m.group(0) + "' }}", text[last:]))
+    return "".join(parts)
+
+
+def fill_placeholders(text: str, values: Dict[str, str]) -> str:
+    """
+    Подставляет значения в плейсхолдеры .txt-формата ({previous_code}, {schemas}, ...)
+    пользовательского текста за один проход, без компиляции в Jinja: подставленный
+    текст повторно не сканируется, плейсхолдеры без значения остаются как есть.
+    """
+    return _TXT_PLACEHOLDER_RE.sub(lambda m: values.get(TXT_PLACEHOLDERS[m.group(0)], m.group(0)), text)
+
+
+def count_placeholders(text: str) -> Dict[str, int]:
+    """Сколько раз каждая переменная встречается в тексте плейсхолдерами .txt-формата."""
+    return dict(Counter(TXT_PLACEHOLDERS[m.group(0)] for m in _TXT_PLACEHOLDER_RE.finditer(text)))
+
+
+class PromptEntry:
+    """Версия шаблона в памяти: исходный текст (.txt), скомпилированный шаблон и ETag."""
+
+    __slots__ = ("name", "text", "template", "etag", "signature", "loaded_at")
+
+    def __init__(self, name: str, text: str | None, template: Template, signature: Tuple):
+        self.name = name
+        self.text = text
+        self.template = template
+        self.etag = '"' + hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16] + '"'
+        self.signature = signature
+        self.loaded_at = time.time()
+
+
+class _LazyBytecodeCache(FileSystemBytecodeCache):
+    """
+    Байткод на диске; каталог создаётся при первой записи, а не при импорте.
+    Ошибка чтения или записи (каталог только для чтения) не мешает рендеру — шаблон просто не кэшируется.
+    """
+
+    def load_bytecode(self, bucket) -> None:
+        try:
+            super().load_bytecode(bucket)
+        except OSError as e:
+            logger.warning("prompt_bytecode_cache_error", extra={"error": str(e)})
+
+    def dump_bytecode(self, bucket) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            logger.warning("prompt_bytecode_cache_error", extra={"error": str(e)})
+
+
+class _PromptLoader(BaseLoader):
+    """Отдаёт Jinja2 исходник, уже выбранный движком (PromptEngine._jinja_source)."""
+
+    def __init__(self):
+        self.sources: Dict[str, Tuple[str, str]] = {}
+
+    def get_source(self, environment: Environment, template: str):
+        if template not in self.sources:
+            raise TemplateNotFound(template)
+        source, filename = self.sources[template]
+        return source, filename, lambda: True
+
+
+class PromptEngine:
+    """
+    Кэш шаблонов промптов в памяти с горячей перезагрузкой. Для каждого типа
+    хранится текст .txt (его отдаёт /prompt/{type}) и скомпилированный шаблон;
+    get() отдаёт готовый Template, variable_counts() — сколько раз каждая
+    переменная встречается в шаблоне (раздел, вставленный дважды, стоит вдвое дороже).
+
+    Каталог опрашивается по mtime не чаще раза в poll_interval_s (при обращении,
+    без фоновых потоков). Изменённые шаблоны компилируются заново и подменяются
+    целиком; шаблон с ошибкой не подменяет рабочую версию. Шаблон компилируется
+    из .jinja (source="jinja") или из .txt (source="txt"), а из другого файла —
+    только если выбранного нет; .jinja, расходящийся со своим .txt, логируется
+    как prompt_template_out_of_sync.
+    """
+
+    def __init__(
+        self,
+        prompts_dir: Path = PROMPTS_DIR,
+        cache_dir: Path | None = None,
+        poll_interval_s: float = 2.0,
+        text_cache_size: int = FROM_TEXT_CACHE_SIZE,
+        source: str = "jinja",
+    ):
+        if source not in TEMPLATE_SOURCES:
+            raise ValueError(f"source: одно из {TEMPLATE_SOURCES}")
+        self.prompts_dir = Path(prompts_dir)
+        self.source = source
+        self.poll_interval_s = poll_interval_s
+        self.text_cache_size = text_cache_size
+        bytecode_cache = _LazyBytecodeCache(str(cache_dir)) if cache_dir is not None else None
+        self.loader = _PromptLoader()
+        self.env = Environment(
+            loader=self.loader,
+            bytecode_cache=bytecode_cache,
+            autoescape=False,
+            keep_trailing_newline=True,
+            cache_size=0,  # версии шаблонов хранит сам движок
+        )
+        self._entries: Dict[str, PromptEntry] = {}
+        self._texts: "OrderedDict[str, Template]" = OrderedDict()
+        self._variables: "weakref.WeakKeyDictionary[Template, Dict[str, int]]" = weakref.WeakKeyDictionary()
+        self._failed: Dict[str, Tuple] = {}
+        self._checked_at: float | None = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def _count_variables(self, template: Template, source: str) -> None:
+        tree = self.env.parse(source)
+        self._variables[template] = dict(Counter(
+            node.name for node in tree.find_all(nodes.Name) if node.ctx == "load"
+        ))
+
+    def _scan(self) -> Dict[str, Tuple]:
+        """{тип: ((mtime_ns, size) .txt или None, (mtime_ns, size) .jinja или None)}."""
+        found: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        try:
+            with os.scandir(self.prompts_dir) as it:
+                for item in it:
+                    stem, ext = os.path.splitext(item.name)
+                    if ext in (".txt", ".jinja") and item.is_file():
+                        st = item.stat()
+                        found.setdefault(stem, {})[ext] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return {}
+        return {name: (files.get(".txt"), files.get(".jinja")) for name, files in found.items()}
+
+    def _jinja_source(self, name: str, signature: Tuple) -> Tuple[str, str]:
+        txt_stat, jinja_stat = signature
+        txt_path = self.prompts_dir / f"{name}.txt"
+        jinja_path = self.prompts_dir / f"{name}.jinja"
+        if txt_stat is None:
+            return jinja_path.read_text(encoding="utf-8"), str(jinja_path)
+        from_txt = txt_to_jinja(txt_path.read_text(encoding="utf-8"))
+        if jinja_stat is None:
+            return from_txt, str(txt_path)
+        source = jinja_path.read_text(encoding="utf-8")
+        if source != from_txt:
+            logger.warning("prompt_template_out_of_sync", extra={"template": name, "source": self.source})
+        if self.source == "txt":
+            return from_txt, str(txt_path)
+        return source, str(jinja_path)
+
+    def _load(self, name: str, signature: Tuple) -> PromptEntry:
+        text = (self.prompts_dir / f"{name}.txt").read_text(encoding="utf-8") if signature[0] is not None else None
+        source, filename = self._jinja_source(name, signature)
+        self.loader.sources[name] = (source, filename)
+        template = self.env.get_template(name)
+        self._count_variables(template, source)
+        return PromptEntry(name, text, template, signature)
+
+    def refresh(self) -> List[str]:
+        """Перечитывает изменённые шаблоны; возвращает имена перезагруженных и удалённых."""
+        self._checked_at = time.monotonic()
+        current = self._scan()
+        entries = dict(self._entries)
+        changed = []
+        for name, signature in current.items():
+            old = entries.get(name)
+            if (old is not None and old.signature == signature) or self._failed.get(name) == signature:
+                continue
+            try:
+                entries[name] = self._load(name, signature)
+            except Exception as e:
+                # Битая правка не подменяет рабочую версию и не перечитывается, пока файл не изменится
+                self._failed[name] = signature
+                self.reload_errors += 1
+                logger.warning("prompt_reload_failed", extra={"template": name, "error": str(e)})
+                continue
+            self._failed.pop(name, None)
+            changed.append(name)
+        for name in set(entries) - set(current):
+            del entries[name]
+            changed.append(name)
+        if changed:
+            if self._entries:
+                self.reloads += len(changed)
+                logger.info("prompts_reloaded", extra={"templates": sorted(changed)})
+            # Подмена словаря целиком: читатели видят либо старую, либо новую версию
+            self._entries = entries
+        return sorted(changed)
+
+    def _maybe_refresh(self) -> None:
+        if self._checked_at is None:
+            self.refresh()
+        elif self.poll_interval_s > 0 and time.monotonic() - self._checked_at >= self.poll_interval_s:
+            self.refresh()
+
+    def entry(self, name: str) -> PromptEntry:
+        """Текущая версия шаблона; TemplateNotFound, если шаблона нет."""
+        self._maybe_refresh()
+        entry = self._entries.get(name)
+        if entry is None:
+            self.misses += 1
+            raise TemplateNotFound(name)
+        self.hits += 1
+        return entry
+
+    def available(self) -> List[str]:
+        self._maybe_refresh()
+        return sorted(self._entries)
+
+    def get(self, name: str) -> Template:
+        """Скомпилированный шаблон типа name; TemplateNotFound, если шаблона нет."""
+        return self.entry(name).template
+
+    def from_text(self, text: str) -> Template:
+        """
+        Шаблон из постоянного текста кода (не из пользовательского ввода), компилируется
+        один раз; в памяти держатся text_cache_size последних шаблонов.
+        """
+        template = self._texts.get(text)
+        if template is not None:
+            self._texts.move_to_end(text)
+            return template
+        template = self.env.from_string(text)
+        self._count_variables(template, text)
+        self._texts[text] = template
+        while len(self._texts) > self.text_cache_size:
+            self._texts.popitem(last=False)
+        return template
+
+    def load_all(self) -> List[str]:
+        """Компилирует все шаблоны каталога (при старте приложения)."""
+        self.refresh()
+        return sorted(self._entries)
+
+    def variable_counts(self, template: Template) -> Dict[str, int]:
+        return self._variables.get(template, {})
+
+    def stats(self) -> dict:
+        return {
+            "templates": {
+                name: {"etag": entry.etag, "loaded_at": round(entry.loaded_at, 3)}
+                for name, entry in sorted(self._entries.items())
+            },
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "poll_interval_s": self.poll_interval_s,
+            "source": self.source,
+        }
+
+
+def sync_jinja_templates(prompts_dir: Path = PROMPTS_DIR, check: bool = False) -> List[str]:
+    """Пересобирает <type>.jinja из <type>.txt; возвращает изменённые шаблоны. check=True — только проверка, без записи."""
+    changed = []
+    for txt_path in sorted(Path(prompts_dir).glob("*.txt")):
+        jinja_path = txt_path.with_suffix(".jinja")
+        source = txt_to_jinja(txt_path.read_text(encoding="utf-8"))
+        if not jinja_path.exists() or jinja_path.read_text(encoding="utf-8") != source:
+            if not check:
+                jinja_path.write_text(source, encoding="utf-8")
+            changed.append(txt_path.stem)
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка .jinja-шаблонов промптов из .txt")
+    parser.add_argument("--prompts-dir", default=str(PROMPTS_DIR))
+    parser.add_argument("--check", action="store_true", help="не записывать, код 1 — если .jinja устарели")
+    args = parser.parse_args()
+    changed = sync_jinja_templates(Path(args.prompts_dir), check=args.check)
+    if args.check:
+        if changed:
+            raise SystemExit(f"Устарели .jinja: {changed} — python -m backend.prompt_engine")
+        print("Шаблоны .jinja совпадают с .txt")
+        return
+    print(f"Обновлено шаблонов: {len(changed)} {changed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from pydantic import BaseModel
+
+try:
+    from backend.openapi_compact import CompactSerializer
+except ImportError:
+    from openapi_compact import CompactSerializer
+
+
+class SpecFragments(BaseModel):
+    """Разделы промпта auto_api, зависящие только от OpenAPI-спецификации."""
+    spec_hash: str
+    openapi_endpoints: str
+    schemas: str
+    endpoints_detailed: str
+    negative_responses: str
+
+    def as_fragments(self) -> Dict[str, str]:
+        return {
+            "openapi_endpoints": self.openapi_endpoints,
+            "schemas": self.schemas,
+            "endpoints_detailed": self.endpoints_detailed,
+            "negative_responses": self.negative_responses,
+        }
+
+
+def spec_content_hash(spec: dict) -> str:
+    """sha256 канонического JSON спецификации: одинаковый для одинакового содержимого."""
+    payload = json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_spec_fragments(spec: dict, endpoints: List[dict], spec_hash: str) -> SpecFragments:
+    """
+    Строит все разделы спецификации для промпта auto_api за один проход:
+    операции и негативные ответы в компактной записи, в разделе схем —
+    только именованные схемы, на которые ссылаются отобранные операции.
+    """
+    serializer = CompactSerializer(spec)
+    detailed = [serializer.operation(ep) for ep in endpoints]
+    negative = [line for line in (serializer.negative_responses(ep) for ep in endpoints) if line]
+
+    return SpecFragments(
+        spec_hash=spec_hash,
+        openapi_endpoints="\n".join(f"{ep['method']} {ep['path']} — {ep['summary']}" for ep in endpoints),
+        schemas=serializer.definitions(),
+        endpoints_detailed="\n".join(detailed),
+        negative_responses="\n".join(negative),
+    )
+
+
+class FragmentCache:
+    """Готовые разделы по хэшу спецификации и отбору эндпоинтов (LRU)."""
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, SpecFragments]" = OrderedDict()
+        self.hits = 0
+        self.builds = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(
+        self,
+        spec: dict,
+        endpoints: List[dict],
+        spec_hash: str | None = None,
+        selection: Tuple[str, ...] | None = None,
+    ) -> SpecFragments:
+        """
+        Разделы для спецификации целиком или для отобранных эндпоинтов
+        (selection — ключи "METHOD /path" отбора, входят в ключ кэша).
+        """
+        spec_hash = spec_hash or spec_content_hash(spec)
+        key = spec_hash
+        if selection is not None:
+            key += ":" + hashlib.sha256("\n".join(selection).encode("utf-8")).hexdigest()[:16]
+        # Кэш наполняется и из event loop, и из потока фоновой загрузки спецификации
+        with self._lock:
+            fragments = self._entries.get(key)
+            if fragments is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return fragments
+        fragments = build_spec_fragments(spec, endpoints, spec_hash)
+        with self._lock:
+            self.builds += 1
+            self._entries[key] = fragments
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragments
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "builds": self.builds}
@@ -0,0 +1,73 @@
+import math
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+
+class ShardClass(BaseModel):
+    name: str
+    area: str
+    min_tests: int
+
+
+class Shard(BaseModel):
+    index: int
+    total: int
+    classes: List[ShardClass]
+
+    @property
+    def min_tests(self) -> int:
+        return sum(c.min_tests for c in self.classes)
+
+
+# Разбиение ручных наборов по классам (функциональным областям). Минимумы по классам
+# в сумме дают порог precheck_manual_generation (>=29) и precheck_manual_ui (>=28).
+SHARD_CLASSES: Dict[str, List[ShardClass]] = {
+    "manual_api": [
+        ShardClass(name="VMTests", area="Блок 1. VMs: список, создание, получение, обновление, смена статуса, удаление ВМ", min_tests=12),
+        ShardClass(name="DiskTests", area="Блок 2. Disks: список, создание, получение, обновление, удаление, attach/detach к ВМ", min_tests=12),
+        ShardClass(name="FlavorTests", area="Блок 3. Flavors: список флейворов и получение по id", min_tests=7),
+    ],
+    "manual_ui": [
+        ShardClass(name="MainPageTests", area="главная страница калькулятора", min_tests=6),
+        ShardClass(name="CatalogTests", area="каталог продуктов", min_tests=6),
+        ShardClass(name="ComputeConfigTests", area="конфигурация Compute", min_tests=6),
+        ShardClass(name="ConfigurationManagementTests", area="управление конфигурациями", min_tests=6),
+        ShardClass(name="MobileResponsivenessTests", area="мобильная адаптивность", min_tests=6),
+    ],
+}
+
+
+def plan_shards(prompt_type: str, shards: int) -> List[Shard]:
+    """
+    Делит классы набора на shards частей, выравнивая число тестов между частями.
+    Шардов не больше, чем классов; порядок классов внутри части сохраняется.
+    """
+    classes = SHARD_CLASSES[prompt_type]
+    count = max(1, min(shards, len(classes)))
+    buckets: List[List[ShardClass]] = [[] for _ in range(count)]
+    for cls in sorted(classes, key=lambda c: -c.min_tests):
+        min(buckets, key=lambda b: sum(c.min_tests for c in b)).append(cls)
+    order = {cls.name: i for i, cls in enumerate(classes)}
+    return [
+        Shard(index=i, total=count, classes=sorted(bucket, key=lambda c: order[c.name]))
+        for i, bucket in enumerate(buckets)
+    ]
+
+
+def shard_instruction(shard: Shard) -> str:
+    """Дополнение к промпту: генерировать только классы своей части набора."""
+    names = ", ".join(c.name for c in shard.classes)
+    areas = "\n".join(f"- {c.name}: {c.area} — не меньше {c.min_tests} тестов" for c in shard.classes)
+    return (
+        f"\n\nЧАСТЬ {shard.index + 1} ИЗ {shard.total}. Набор генерируется частями параллельно: "
+        "требования к общему числу тестов и обязательным классам относятся ко всему набору. "
+        f"В этом ответе сгенерируй ТОЛЬКО класс(ы) {names}, другие классы не выводи:\n{areas}\n"
+        "Начни с импортов, как требуется выше."
+    )
+
+
+def shard_max_tokens(shard: Shard, prompt_type: str, max_tokens: int) -> int:
+    """Лимит ответа части — пропорционально её доле тестов, с запасом 30%."""
+    total_tests = sum(c.min_tests for c in SHARD_CLASSES[prompt_type])
+    return min(max_tokens, math.ceil(max_tokens * shard.min_tests / total_tests * 1.3))
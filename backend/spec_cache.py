@@ -0,0 +1,130 @@
+"""
+Снимок развёрнутой OpenAPI-спецификации на диске. prance разбирает YAML,
+валидирует спецификацию и подставляет $ref несколько секунд; снимок
+(pickle готового словаря) читается за десятки миллисекунд.
+
+Снимок привязан к sha256 исходных файлов спецификации (основной файл и
+соседние *.yaml/*.yml/*.json, на которые он может ссылаться): правка любого
+из них — промах и новый разбор. Собрать снимок заранее (при сборке образа):
+
+    python -m backend.spec_cache --spec backend/openapi/openapi-v3.yaml
+
+Снимки читаются только из своего каталога кэша, который пишет само приложение.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+logger = logging.getLogger("app")
+
+# Меняется при изменении формата снимка или разбора (extract_endpoints его не касается)
+SNAPSHOT_VERSION = 1
+SPEC_CACHE_DIR = Path(__file__).parent / ".cache" / "openapi"
+_SOURCE_SUFFIXES = (".yaml", ".yml", ".json")
+
+
+def source_hash(spec_path: str | Path) -> str:
+    """sha256 содержимого спецификации и соседних файлов, на которые могут вести $ref."""
+    spec_path = Path(spec_path)
+    digest = hashlib.sha256(f"v{SNAPSHOT_VERSION}:{spec_path.name}".encode("utf-8"))
+    siblings = sorted(p for p in spec_path.parent.iterdir() if p.suffix in _SOURCE_SUFFIXES and p.is_file())
+    for path in [spec_path] + [p for p in siblings if p != spec_path]:
+        digest.update(b"\0" + path.name.encode("utf-8") + b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def snapshot_path(spec_path: str | Path, digest: str, cache_dir: str | Path = SPEC_CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"{Path(spec_path).stem}-{digest[:16]}.pickle"
+
+
+def _default_parse(path: str) -> dict:
+    try:
+        from backend.openapi_parser import load_openapi_spec
+    except ImportError:
+        from openapi_parser import load_openapi_spec
+    return load_openapi_spec(path)
+
+
+def write_snapshot(spec: dict, target: Path) -> None:
+    """Атомарная запись: параллельно стартующие воркеры не увидят недописанный файл."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=target.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp, 0o644)  # mkstemp создаёт 0600, а воркеры могут работать от другого пользователя
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    # Снимки прежних версий этой же спецификации больше не нужны
+    for stale in target.parent.glob(f"{Path(target).name.rsplit('-', 1)[0]}-*.pickle"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+
+
+def load_resolved_spec(
+    spec_path: str | Path,
+    cache_dir: str | Path | None = SPEC_CACHE_DIR,
+    parse: Callable[[str], dict] | None = None,
+) -> Tuple[dict, bool]:
+    """
+    Развёрнутая спецификация: из снимка, если исходники не менялись, иначе —
+    разбором parse (по умолчанию prance) с записью нового снимка.
+    cache_dir=None отключает снимки. Возвращает (spec, взята ли из снимка).
+    """
+    parse = parse or _default_parse
+    if cache_dir is None:
+        return parse(str(spec_path)), False
+
+    started = time.perf_counter()
+    target = snapshot_path(spec_path, source_hash(spec_path), cache_dir)
+    if target.exists():
+        try:
+            with target.open("rb") as f:
+                spec = pickle.load(f)
+            logger.info(
+                "openapi_snapshot_hit",
+                extra={"path": str(target), "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+            )
+            return spec, True
+        except Exception as e:
+            logger.warning("openapi_snapshot_corrupt", extra={"path": str(target), "error": str(e)})
+
+    spec = parse(str(spec_path))
+    try:
+        write_snapshot(spec, target)
+    except Exception as e:
+        # Каталог только для чтения — работаем без снимка
+        logger.warning("openapi_snapshot_write_failed", extra={"path": str(target), "error": str(e)})
+    logger.info(
+        "openapi_snapshot_miss",
+        extra={"path": str(target), "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+    )
+    return spec, False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка снимка развёрнутой OpenAPI-спецификации")
+    parser.add_argument("--spec", default=str(Path(__file__).parent / "openapi" / "openapi-v3.yaml"))
+    parser.add_argument("--cache-dir", default=os.getenv("OPENAPI_CACHE_DIR", str(SPEC_CACHE_DIR)))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    spec, hit = load_resolved_spec(args.spec, args.cache_dir)
+    digest = source_hash(args.spec)
+    print(
+        f"{'Снимок актуален' if hit else 'Снимок собран'}: {snapshot_path(args.spec, digest, args.cache_dir)} "
+        f"({len(spec.get('paths', {}))} путей, {time.perf_counter() - started:.2f} с)"
+    )
+
+
+if __name__ == "__main__":
+    main()
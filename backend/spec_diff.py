@@ -0,0 +1,294 @@
+"""
+Инкрементальная перегенерация auto_api по изменениям спецификации.
+
+Каждая операция (METHOD /path) получает хэш содержимого — параметры, тело
+запроса и ответы из extract_endpoints. Тесты прошлой генерации хранятся по
+операциям вместе с этим хэшем; при следующем запросе модель получает только
+добавленные и изменившиеся операции, а тесты остальных берутся из хранилища
+и собираются с новыми в один модуль.
+
+Тест относится к операции, которую он вызывает первой (разбор вызовов —
+validator.call_sites_by_function и PathTrie); тест без распознанных вызовов —
+к операции соседнего теста. У каждой операции хранятся также импорты и
+код верхнего уровня (константы, фикстуры) её модуля: при сборке они
+выводятся без повторов.
+"""
+import asyncio
+import ast
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+try:
+    from backend.path_trie import PathTrie, endpoint_key
+    from backend.validator import call_sites_by_function
+except ImportError:
+    from path_trie import PathTrie, endpoint_key
+    from validator import call_sites_by_function
+
+logger = logging.getLogger("app")
+
+# Меняется при изменении формата хранимых тестов или правила хэширования: всё перегенерируется
+DIFF_VERSION = 1
+HASHED_FIELDS = ("parameters", "requestBody", "responses")
+
+
+def operation_hash(ep: dict) -> str:
+    """sha256 содержимого операции, от которого зависят её тесты."""
+    payload = json.dumps(
+        {"v": DIFF_VERSION, "key": endpoint_key(ep), **{field: ep.get(field) for field in HASHED_FIELDS}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SpecDiff(BaseModel):
+    added: List[str] = []
+    changed: List[str] = []
+    unchanged: List[str] = []
+    removed: List[str] = []
+
+
+def diff_operations(current: Dict[str, str], stored: Dict[str, str]) -> SpecDiff:
+    """Сравнивает хэши операций спецификации ({ключ: хэш}) с сохранёнными при прошлой генерации."""
+    diff = SpecDiff()
+    for key, digest in current.items():
+        if key not in stored:
+            diff.added.append(key)
+        elif stored[key] != digest:
+            diff.changed.append(key)
+        else:
+            diff.unchanged.append(key)
+    diff.removed = [key for key in stored if key not in current]
+    return diff
+
+
+class OperationCase(BaseModel):
+    name: str
+    source: str  # исходник теста; метод — с отступом своего класса
+    class_name: str | None = None
+    class_header: str = ""  # декораторы и строка class, нетестовые члены класса
+
+
+class OperationTests(BaseModel):
+    imports: List[str] = []
+    preamble: List[str] = []  # код верхнего уровня модуля, кроме импортов и тестов
+    cases: List[OperationCase] = []
+
+
+def _is_test(node: ast.stmt) -> bool:
+    return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")
+
+
+def split_operation_tests(code: str, endpoints: List[dict]) -> Dict[str, OperationTests]:
+    """
+    Раскладывает сгенерированный модуль по операциям endpoints: {"METHOD /path": тесты}.
+    Операции без тестов в результат не попадают. SyntaxError пробрасывается.
+    """
+    tree = ast.parse(code)
+    lines = code.splitlines()
+
+    def start(node: ast.stmt) -> int:
+        return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+    def segment(node: ast.stmt) -> str:
+        return "\n".join(lines[start(node) - 1:node.end_lineno]).rstrip()
+
+    imports: List[str] = []
+    preamble: List[str] = []
+    cases: List[OperationCase] = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(segment(node))
+        elif _is_test(node):
+            cases.append(OperationCase(name=node.name, source=segment(node)))
+        elif isinstance(node, ast.ClassDef) and any(_is_test(item) for item in node.body):
+            header = "\n".join(lines[start(node) - 1:start(node.body[0]) - 1]).rstrip()
+            members = [segment(item) for item in node.body if not _is_test(item)]
+            if members:
+                header += "\n" + "\n\n".join(members) + "\n"
+            cases.extend(
+                OperationCase(name=item.name, source=segment(item), class_name=node.name, class_header=header)
+                for item in node.body if _is_test(item)
+            )
+        else:
+            preamble.append(segment(node))
+
+    trie = PathTrie(endpoints)
+    calls = call_sites_by_function(code)
+    owners: List[str | None] = []
+    for case in cases:
+        qualname = f"{case.class_name}.{case.name}" if case.class_name else case.name
+        matched = (trie.match(call.path, call.method) for call in calls.get(qualname, []))
+        owners.append(next((endpoint_key(eps[0]) for eps in matched if eps), None))
+
+    # Тест без распознанных вызовов остаётся с соседним: предыдущим, а в начале модуля — следующим
+    known = [owner for owner in owners if owner is not None]
+    if not known:
+        return {}
+    fallback = known[0]
+    result: Dict[str, OperationTests] = {}
+    for case, owner in zip(cases, owners):
+        fallback = owner or fallback
+        tests = result.setdefault(fallback, OperationTests(imports=imports, preamble=preamble))
+        tests.cases.append(case)
+    return result
+
+
+def _rename(source: str, name: str, new_name: str) -> str:
+    return re.sub(rf"(\bdef\s+){re.escape(name)}(\s*\()", rf"\g<1>{new_name}\g<2>", source, count=1)
+
+
+def assemble_module(parts: Iterable[OperationTests]) -> str:
+    """
+    Собирает тесты операций в один модуль: импорты и код верхнего уровня без
+    повторов, тесты одного класса — в одном классе. Одинаковый тест из разных
+    операций выводится один раз; разные тесты с одним именем получают суффикс _2, _3, ...
+    """
+    imports: List[str] = []
+    preamble: List[str] = []
+    layout: List[Tuple[str, str]] = []  # ("def", исходник) | ("class", имя) в порядке появления
+    classes: Dict[str, Tuple[str, List[str]]] = {}
+    sources: Set[Tuple[str | None, str]] = set()
+    names: Dict[str | None, Set[str]] = {}
+
+    for part in parts:
+        imports.extend(item for item in part.imports if item not in imports)
+        preamble.extend(item for item in part.preamble if item not in preamble)
+        for case in part.cases:
+            if (case.class_name, case.source) in sources:
+                continue
+            sources.add((case.class_name, case.source))
+            taken = names.setdefault(case.class_name, set())
+            name, n = case.name, 2
+            while name in taken:
+                name, n = f"{case.name}_{n}", n + 1
+            taken.add(name)
+            source = _rename(case.source, case.name, name) if name != case.name else case.source
+            if case.class_name is None:
+                layout.append(("def", source))
+                continue
+            if case.class_name not in classes:
+                classes[case.class_name] = (case.class_header, [])
+                layout.append(("class", case.class_name))
+            classes[case.class_name][1].append(source)
+
+    blocks = ["\n".join(imports)] if imports else []
+    blocks.extend(preamble)
+    for kind, value in layout:
+        if kind == "def":
+            blocks.append(value)
+        else:
+            header, methods = classes[value]
+            blocks.append(header + "\n" + "\n\n".join(methods))
+    return "\n\n\n".join(blocks) + "\n"
+
+
+class StoredOperation(NamedTuple):
+    op_hash: str
+    tests: OperationTests
+
+
+class GenerationStore:
+    """
+    Тесты последней генерации по операциям: (spec_id, "METHOD /path") -> хэш операции и тесты.
+    Файловое SQLite-хранилище открывается лениво; db_path=None — только память процесса.
+    """
+
+    def __init__(self, db_path: str | Path | None = None):
+        self.db_path = Path(db_path) if db_path else None
+        self._memory: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self.loads = 0
+        self.stored = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS operation_tests ("
+                "spec_id TEXT NOT NULL, operation TEXT NOT NULL, op_hash TEXT NOT NULL, "
+                "tests TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (spec_id, operation))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _rows(self, spec_id: str) -> Dict[str, Tuple[str, str]]:
+        if self.db_path is None:
+            return dict(self._memory.get(spec_id, {}))
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT operation, op_hash, tests FROM operation_tests WHERE spec_id = ?", (spec_id,)
+            ).fetchall()
+        return {operation: (op_hash, tests) for operation, op_hash, tests in rows}
+
+    def _write(self, spec_id: str, rows: Dict[str, Tuple[str, str]], removed: List[str]) -> None:
+        if self.db_path is None:
+            stored = self._memory.setdefault(spec_id, {})
+            stored.update(rows)
+            for key in removed:
+                stored.pop(key, None)
+            return
+        updated_at = time.time()
+        with self._db_lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO operation_tests (spec_id, operation, op_hash, tests, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(spec_id, key, op_hash, tests, updated_at) for key, (op_hash, tests) in rows.items()],
+            )
+            conn.executemany(
+                "DELETE FROM operation_tests WHERE spec_id = ? AND operation = ?",
+                [(spec_id, key) for key in removed],
+            )
+            conn.commit()
+
+    async def load(self, spec_id: str) -> Dict[str, StoredOperation]:
+        """Сохранённые операции спецификации; нечитаемая запись считается отсутствующей."""
+        try:
+            rows = await asyncio.to_thread(self._rows, spec_id)
+        except sqlite3.Error as e:
+            logger.warning("generation_store_error", extra={"error": str(e)})
+            return {}
+        self.loads += 1
+        stored: Dict[str, StoredOperation] = {}
+        for key, (op_hash, tests) in rows.items():
+            try:
+                stored[key] = StoredOperation(op_hash, OperationTests.model_validate_json(tests))
+            except ValidationError as e:
+                logger.warning("generation_store_corrupt", extra={"spec_id": spec_id, "operation": key, "error": str(e)})
+        return stored
+
+    async def save(
+        self,
+        spec_id: str,
+        operations: Dict[str, StoredOperation],
+        removed: List[str] | None = None,
+    ) -> None:
+        """Записывает тесты операций и удаляет исчезнувшие из спецификации."""
+        rows = {key: (item.op_hash, item.tests.model_dump_json()) for key, item in operations.items()}
+        try:
+            await asyncio.to_thread(self._write, spec_id, rows, list(removed or []))
+        except sqlite3.Error as e:
+            logger.warning("generation_store_error", extra={"error": str(e)})
+            return
+        self.stored += len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "stored": self.stored,
+            "db_path": str(self.db_path) if self.db_path else None,
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger("app")
+
+
+class SpecNotReady(Exception):
+    """Спецификация не загрузилась за отведённое время."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SpecLoader:
+    """
+    Фоновая загрузка OpenAPI-спецификации. load (разбор/чтение снимка и подготовка
+    производных структур) выполняется в рабочем потоке, publish (присваивание
+    готового в app.state) — в event loop, поэтому обработчики видят либо старую,
+    либо новую спецификацию целиком.
+
+    Одновременные запросы ждут одну и ту же загрузку; после ошибки следующий
+    ensure() запускает новую попытку.
+    """
+
+    def __init__(self, load: Callable[[], Any], publish: Callable[[Any], None]):
+        self._load = load
+        self._publish = publish
+        self._task: asyncio.Task | None = None
+        self.state = "idle"  # idle | loading | ready | failed
+        self.error: str | None = None
+        self.attempts = 0
+        self.started_at: float | None = None
+        self.loaded_at: float | None = None
+        self.duration_s: float | None = None
+        self.details: dict = {}
+
+    async def _run(self) -> None:
+        self.state = "loading"
+        self.attempts += 1
+        self.started_at = time.time()
+        started = time.perf_counter()
+        try:
+            prepared = await asyncio.to_thread(self._load)
+            details = self._publish(prepared)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            self.duration_s = round(time.perf_counter() - started, 3)
+            logger.warning("openapi_load_failed", extra={"error": str(e), "attempt": self.attempts})
+            raise
+        self.state = "ready"
+        self.error = None
+        self.loaded_at = time.time()
+        self.duration_s = round(time.perf_counter() - started, 3)
+        self.details = details or {}
+        logger.info("openapi_loaded", extra={"duration_s": self.duration_s, **self.details})
+
+    def start(self) -> asyncio.Task:
+        """Запускает загрузку, если она ещё не идёт; возвращает задачу загрузки."""
+        # Задача из другого (уже закрытого) event loop не завершится — начинаем заново
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.create_task(self._run())
+            # Ошибку забирает ensure(); без ожидающих она не должна попадать в лог как "never retrieved"
+            self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._task
+
+    async def ensure(self, timeout: float | None = None) -> None:
+        """
+        Дожидается идущей загрузки (или запускает новую). Ошибка загрузки
+        пробрасывается; не уложились в timeout — SpecNotReady, загрузка продолжается.
+        """
+        task = self.start()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise SpecNotReady(f"спецификация OpenAPI ещё загружается ({self.state})", retry_after=timeout or 1.0)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "attempts": self.attempts,
+            "loaded_at": self.loaded_at,
+            "duration_s": self.duration_s,
+            **self.details,
+        }
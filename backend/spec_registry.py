@@ -0,0 +1,395 @@
+"""
+Реестр OpenAPI-спецификаций нескольких сервисов. Спецификация регистрируется
+по id (текстом файла или локальным путём / file:// URL) и указывается в запросе
+генерации как spec_id.
+
+Разобранные спецификации с производными (эндпоинты, индекс, разделы промпта)
+хранятся в LRU, ограниченном по памяти; вытесненная загружается заново из
+источника (через снимок spec_cache — быстро). Разбор идёт в рабочем потоке,
+новая версия подменяет старую одним присваиванием: запросы, уже получившие
+старую версию, дорабатывают с ней.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+import types
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import unquote, urlsplit
+
+import yaml
+
+try:
+    from backend.endpoint_selection import EndpointIndex
+    from backend.openapi_parser import extract_endpoints, load_openapi_spec
+    from backend.prompt_fragments import FragmentCache, SpecFragments
+    from backend.spec_cache import load_resolved_spec
+except ImportError:
+    from endpoint_selection import EndpointIndex
+    from openapi_parser import extract_endpoints, load_openapi_spec
+    from prompt_fragments import FragmentCache, SpecFragments
+    from spec_cache import load_resolved_spec
+
+logger = logging.getLogger("app")
+
+SPEC_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class SpecEntry:
+    """Версия спецификации в памяти: сама спецификация и всё, что из неё строится."""
+
+    __slots__ = (
+        "spec_id", "version", "source", "spec", "endpoints", "index", "trie", "fragments",
+        "size_bytes", "loaded_at", "from_snapshot",
+    )
+
+    def __init__(
+        self,
+        spec_id: str,
+        source: str,
+        spec: dict,
+        endpoints: List[dict],
+        index: EndpointIndex,
+        fragments: SpecFragments,
+        size_bytes: int = 0,
+        from_snapshot: bool = False,
+        version: int = 0,
+    ):
+        self.spec_id = spec_id
+        self.version = version
+        self.source = source
+        self.spec = spec
+        self.endpoints = endpoints
+        self.index = index
+        self.trie = index.trie  # дерево путей для check_coverage строится один раз на версию
+        self.fragments = fragments
+        self.size_bytes = size_bytes
+        self.from_snapshot = from_snapshot
+        self.loaded_at = time.time()
+
+    def info(self) -> dict:
+        return {
+            "spec_id": self.spec_id,
+            "version": self.version,
+            "source": self.source,
+            "endpoints": len(self.endpoints),
+            "tags": self.index.tags,
+            "spec_hash": self.fragments.spec_hash[:12],
+            "size_bytes": self.size_bytes,
+            "from_snapshot": self.from_snapshot,
+            "loaded_at": round(self.loaded_at, 3),
+        }
+
+
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(*objects) -> int:
+    """
+    Память объектов вместе со всем, на что они ссылаются (sys.getsizeof по графу;
+    общие объекты — один раз): спецификация, эндпоинты, индекс и разделы промпта
+    во многом ссылаются на одни и те же словари.
+    """
+    seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _OPAQUE):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)):
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if slot != "__dict__" and hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return total
+
+
+class SpecParseError(Exception):
+    """Спецификация не разобрана; исходная ошибка — в __cause__ (наружу её текст не отдаётся)."""
+
+
+def source_path(path_or_url: str, root: str | Path | None) -> Path:
+    """
+    Локальный путь или file:// URL → существующий файл спецификации внутри root.
+    root=None — регистрация по пути отключена (PermissionError), как и путь за пределами root.
+    """
+    if root is None:
+        raise PermissionError("регистрация по пути отключена: задайте SPEC_SOURCE_ROOT")
+    if "://" in path_or_url:
+        parts = urlsplit(path_or_url)
+        if parts.scheme != "file":
+            raise ValueError("поддерживаются только локальные пути и file:// URL")
+        path_or_url = unquote(parts.path)
+    root = Path(root).expanduser().resolve()
+    path = (root / Path(path_or_url).expanduser()).resolve()
+    if not path.is_relative_to(root):
+        raise PermissionError("путь вне каталога SPEC_SOURCE_ROOT")
+    if not path.is_file():
+        raise FileNotFoundError(f"файл спецификации не найден: {path.relative_to(root)}")
+    return path
+
+
+def _references(node) -> List[str]:
+    refs: List[str] = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            ref = item.get("$ref")
+            if isinstance(ref, str):
+                refs.append(ref)
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return refs
+
+
+def check_references(source: Path, root: Path | None) -> None:
+    """
+    Проверяет $ref спецификации до разбора: ссылки с URL-схемой (http://, file://, ...)
+    запрещены, ссылки на файлы — только внутри root, и в этих файлах — по тем же
+    правилам. root=None — разрешены только ссылки внутри документа (#/...).
+    Нарушение — ValueError.
+    """
+    root = root.resolve() if root is not None else None
+    pending, seen = [source.resolve()], set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        for ref in _references(yaml.safe_load(current.read_text(encoding="utf-8"))):
+            target = ref.split("#", 1)[0]
+            if not target:
+                continue
+            if urlsplit(target).scheme:
+                raise ValueError(f"внешняя ссылка $ref запрещена: {ref}")
+            if root is None:
+                raise ValueError(f"ссылки $ref на файлы в загруженной спецификации запрещены: {ref}")
+            path = (current.parent / unquote(target)).resolve()
+            if not path.is_relative_to(root):
+                raise ValueError(f"ссылка $ref вне каталога SPEC_SOURCE_ROOT: {ref}")
+            pending.append(path)
+
+
+class SpecRegistry:
+    """Спецификации по id: источники, LRU разобранных версий по памяти и их атомарная подмена."""
+
+    def __init__(
+        self,
+        upload_dir: str | Path,
+        cache_dir: str | Path | None,
+        fragment_cache: FragmentCache,
+        max_bytes: int,
+        source_root: str | Path | None = None,
+    ):
+        self.upload_dir = Path(upload_dir)
+        self.source_root = source_root
+        self.cache_dir = cache_dir
+        self.fragment_cache = fragment_cache
+        self.max_bytes = max_bytes
+        self._sources: Dict[str, Path] = {}
+        self._versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[str, SpecEntry]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Порядковый номер загрузки: поздно завершившаяся старая загрузка не перетирает новую версию
+        self._seq: Dict[str, int] = {}
+        self._published_seq: Dict[str, int] = {}
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._discover()
+
+    def _discover(self) -> None:
+        """Загруженные ранее через API спецификации (upload_dir/<id>/spec.*) регистрируются без разбора."""
+        if not self.upload_dir.is_dir():
+            return
+        for item in sorted(self.upload_dir.iterdir()):
+            files = sorted(item.glob("spec.*")) if item.is_dir() and SPEC_ID_RE.match(item.name) else []
+            if files:
+                self._sources[item.name] = files[0]
+                self._versions[item.name] = 1
+
+    def _build(self, spec_id: str, source: Path) -> SpecEntry:
+        """Разбор и подготовка версии; выполняется в рабочем потоке."""
+        # Свой каталог снимков на id: у загруженных файлов одинаковое имя spec.*
+        cache_dir = Path(self.cache_dir) / spec_id if self.cache_dir else None
+        # Загруженный текст ссылается только на себя, файл по пути — на файлы внутри source_root
+        uploaded = source.resolve().is_relative_to(self.upload_dir.resolve())
+        check_references(source, None if uploaded or self.source_root is None else Path(self.source_root))
+        spec, from_snapshot = load_resolved_spec(
+            source, cache_dir, parse=lambda path: load_openapi_spec(path, remote_refs=False)
+        )
+        endpoints = extract_endpoints(spec)
+        entry = SpecEntry(
+            spec_id=spec_id,
+            source=str(source),
+            spec=spec,
+            endpoints=endpoints,
+            index=EndpointIndex(endpoints),
+            fragments=self.fragment_cache.get_or_build(spec, endpoints),
+            from_snapshot=from_snapshot,
+        )
+        # Вся версия целиком: спецификация и всё, что из неё построено
+        entry.size_bytes = deep_sizeof(entry.spec, entry.endpoints, entry.index, entry.fragments)
+        return entry
+
+    def _publish(self, entry: SpecEntry, seq: int) -> SpecEntry:
+        if seq < self._published_seq.get(entry.spec_id, 0):
+            return self._entries.get(entry.spec_id, entry)
+        self._published_seq[entry.spec_id] = seq
+        entry.version = self._versions.get(entry.spec_id, 1)
+        self._entries[entry.spec_id] = entry
+        self._entries.move_to_end(entry.spec_id)
+        self._evict(keep=entry.spec_id)
+        return entry
+
+    def _evict(self, keep: str) -> None:
+        while self.memory_bytes() > self.max_bytes and len(self._entries) > 1:
+            spec_id = next(iter(self._entries))
+            if spec_id == keep:
+                self._entries.move_to_end(spec_id)
+                continue
+            evicted = self._entries.pop(spec_id)
+            self.evictions += 1
+            logger.info("spec_evicted", extra={"spec_id": spec_id, "size_bytes": evicted.size_bytes})
+
+    async def _load(self, spec_id: str, source: Path) -> Tuple[SpecEntry, int]:
+        seq = self._seq[spec_id] = self._seq.get(spec_id, 0) + 1
+        started = time.perf_counter()
+        try:
+            entry = await asyncio.to_thread(self._build, spec_id, source)
+        except Exception as e:
+            logger.warning("spec_parse_failed", exc_info=e, extra={"spec_id": spec_id, "error": str(e)})
+            raise SpecParseError(f"спецификация {spec_id} не разобрана") from e
+        self.loads += 1
+        logger.info(
+            "spec_loaded",
+            extra={
+                "spec_id": spec_id,
+                "endpoints": len(entry.endpoints),
+                "size_bytes": entry.size_bytes,
+                "from_snapshot": entry.from_snapshot,
+                "duration_s": round(time.perf_counter() - started, 3),
+            }
+        )
+        return entry, seq
+
+    def memory_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def __contains__(self, spec_id: str) -> bool:
+        return spec_id in self._sources
+
+    async def get(self, spec_id: str) -> SpecEntry:
+        """Текущая версия; вытесненная загружается заново (одна загрузка на всех ждущих). KeyError — нет такого id."""
+        entry = self._entries.get(spec_id)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(spec_id)
+            return entry
+        if spec_id not in self._sources:
+            raise KeyError(spec_id)
+        task = self._loading.get(spec_id)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self._load(spec_id, self._sources[spec_id]))
+            self._loading[spec_id] = task
+        entry, seq = await asyncio.shield(task)
+        return self._publish(entry, seq)
+
+    async def register(self, spec_id: str, content: str | None = None, path: str | None = None) -> SpecEntry:
+        """
+        Регистрирует новую версию (текст спецификации или путь к файлу). Версия
+        разбирается целиком до подмены: при ошибке продолжает работать прежняя.
+        """
+        if not SPEC_ID_RE.match(spec_id or ""):
+            raise ValueError("spec_id: латиница, цифры, '.', '_', '-', до 64 символов")
+        if (content is None) == (path is None):
+            raise ValueError("укажите ровно одно из: content (текст спецификации) или path (путь / file:// URL)")
+
+        async with self._locks.setdefault(spec_id, asyncio.Lock()):
+            if path is not None:
+                source = source_path(path, self.source_root)
+                entry, seq = await self._load(spec_id, source)
+            else:
+                source, entry, seq = await self._load_uploaded(spec_id, content)
+            self._sources[spec_id] = source
+            self._versions[spec_id] = self._versions.get(spec_id, 0) + 1
+            entry.source = str(source)
+            entry = self._publish(entry, seq)
+        logger.info("spec_registered", extra={"spec_id": spec_id, "version": entry.version, "source": str(source)})
+        return entry
+
+    async def _load_uploaded(self, spec_id: str, content: str) -> Tuple[Path, SpecEntry, int]:
+        """Текст разбирается во временном каталоге и переносится на место только после успешного разбора."""
+        suffix = ".json" if content.lstrip().startswith("{") else ".yaml"
+        target_dir = self.upload_dir / spec_id
+        staging = self.upload_dir / f".staging-{spec_id}-{uuid.uuid4().hex[:8]}"
+        staging.mkdir(parents=True)
+        try:
+            staged = staging / f"spec{suffix}"
+            staged.write_text(content, encoding="utf-8")
+            entry, seq = await self._load(spec_id, staged)
+            target_dir.mkdir(parents=True, exist_ok=True)
+            target = target_dir / staged.name
+            os.replace(staged, target)
+            for old in target_dir.glob("spec.*"):
+                if old != target:
+                    old.unlink(missing_ok=True)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return target, entry, seq
+
+    async def reload(self, spec_id: str) -> SpecEntry:
+        """Перечитывает источник зарегистрированной спецификации и подменяет версию."""
+        if spec_id not in self._sources:
+            raise KeyError(spec_id)
+        async with self._locks.setdefault(spec_id, asyncio.Lock()):
+            entry, seq = await self._load(spec_id, self._sources[spec_id])
+            self._versions[spec_id] = self._versions.get(spec_id, 0) + 1
+            return self._publish(entry, seq)
+
+    def remove(self, spec_id: str) -> None:
+        if spec_id not in self._sources:
+            raise KeyError(spec_id)
+        source = self._sources.pop(spec_id)
+        self._entries.pop(spec_id, None)
+        self._versions.pop(spec_id, None)
+        self._published_seq[spec_id] = self._seq.get(spec_id, 0) + 1
+        if source.parent == self.upload_dir / spec_id:
+            shutil.rmtree(source.parent, ignore_errors=True)
+
+    def describe(self) -> List[dict]:
+        return [
+            self._entries[spec_id].info() if spec_id in self._entries
+            else {"spec_id": spec_id, "version": self._versions.get(spec_id), "source": str(source), "loaded": False}
+            for spec_id, source in sorted(self._sources.items())
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "registered": len(self._sources),
+            "loaded": len(self._entries),
+            "memory_bytes": self.memory_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
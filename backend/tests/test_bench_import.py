@@ -0,0 +1,25 @@
+from backend.benchmarks.bench_import import DEFERRED_MODULES, measure_once, parse_importtime, summarize
+
+IMPORTTIME_SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     fastapi.types
+import time:       356 |        476 |   fastapi
+import time:      2000 |       2000 |   backend.cloud_ru
+import time:     83879 |      86355 | backend.main
+"""
+
+
+def test_parse_importtime_and_summarize():
+    rows = parse_importtime(IMPORTTIME_SAMPLE)
+    assert [r["module"] for r in rows] == ["fastapi.types", "fastapi", "backend.cloud_ru", "backend.main"]
+    assert rows[0]["depth"] == 2 and rows[-1]["depth"] == 0
+
+    report = summarize([rows], "backend.main", top=1)
+    assert report["import_ms"]["median"] == 86.4
+    assert report["top_imports_ms"] == {"backend.cloud_ru": 2.0}
+    assert report["deferred_loaded_eagerly"] == []
+
+
+def test_app_imports_without_key_and_heavy_dependencies():
+    rows = measure_once("backend.main")
+    loaded = {r["module"].split(".")[0] for r in rows}
+    assert not loaded & set(DEFERRED_MODULES)
@@ -0,0 +1,55 @@
+from backend.circuit_breaker import CircuitBreaker, BreakerRegistry, CLOSED, OPEN, HALF_OPEN
+
+
+def _clock(monkeypatch, start=100.0):
+    now = [start]
+    monkeypatch.setattr("backend.circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold_failures_in_window(monkeypatch):
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=3, window_s=10, cooldown_s=30)
+    breaker.record_failure()
+    now[0] += 11  # первая ошибка выпала из окна
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_half_open_probe_closes_on_success(monkeypatch):
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_s=30)
+    breaker.record_failure()
+    now[0] += 31
+    assert breaker.allow_request() is True
+    assert breaker.state == HALF_OPEN
+    # пока проба в полёте, остальные идут на fallback
+    assert breaker.allow_request() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_half_open_probe_failure_reopens(monkeypatch):
+    now = _clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_s=30)
+    breaker.record_failure()
+    now[0] += 31
+    assert breaker.allow_request() is True
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+    assert breaker.stats()["opened_count"] == 2
+
+
+def test_registry_keeps_breaker_per_model():
+    registry = BreakerRegistry(failure_threshold=1)
+    registry.get("a").record_failure()
+    assert registry.get("a").state == OPEN
+    assert registry.get("b").state == CLOSED
+    assert set(registry.stats()) == {"a", "b"}
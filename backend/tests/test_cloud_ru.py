@@ -103,4 +103,328 @@ async def test_call_evolution_model_error_without_fallback(monkeypatch):
     monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
 
     with pytest.raises(Exception):
-        await call_evolution([{"role": "user", "content": "hi"}], model=DEFAULT_MODEL)
\ No newline at end of file
+        await call_evolution([{"role": "user", "content": "hi"}], model=DEFAULT_MODEL)
+
+class DummyChunk:
+    def __init__(self, text):
+        self.choices = [
+            type("C", (), {
+                "delta": type("D", (), {"content": text})
+            })
+        ]
+
+
+@pytest.mark.asyncio
+async def test_stream_evolution_yields_deltas(monkeypatch):
+    from backend.cloud_ru import stream_evolution
+
+    async def fake_stream():
+        for text in ["def ", None, "test_x(): pass"]:
+            yield DummyChunk(text)
+
+    async def fake_create(*args, **kwargs):
+        assert kwargs["stream"] is True
+        return fake_stream()
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+
+    parts = [p async for p in stream_evolution([{"role": "user", "content": "hi"}])]
+    assert parts == ["def ", "test_x(): pass"]
+
+
+@pytest.mark.asyncio
+async def test_stream_evolution_empty_stream(monkeypatch):
+    from backend.cloud_ru import stream_evolution
+
+    async def fake_stream():
+        yield DummyChunk(None)
+
+    async def fake_create(*args, **kwargs):
+        return fake_stream()
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+
+    with pytest.raises(ValueError):
+        [p async for p in stream_evolution([{"role": "user", "content": "hi"}])]
+
+
+@pytest.mark.asyncio
+async def test_call_evolution_uses_cache_for_deterministic_calls(monkeypatch, isolated_llm_state):
+    calls = {"count": 0}
+
+    async def fake_create(*args, **kwargs):
+        calls["count"] += 1
+        return DummyResponse(f"answer {calls['count']}")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert await call_evolution(messages) == "answer 1"
+    assert await call_evolution(messages) == "answer 1"
+    assert calls["count"] == 1
+    assert isolated_llm_state.llm_cache.stats()["memory_hits"] == 1
+
+    # bypass и temperature > 0 всегда идут в модель
+    assert await call_evolution(messages, use_cache=False) == "answer 2"
+    assert await call_evolution(messages, temperature=0.7) == "answer 3"
+    assert calls["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_call_evolution_coalesces_identical_concurrent_calls(monkeypatch, isolated_llm_state):
+    import asyncio
+
+    calls = {"count": 0}
+
+    async def fake_create(*args, **kwargs):
+        calls["count"] += 1
+        await asyncio.sleep(0.01)
+        return DummyResponse("shared")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    messages = [{"role": "user", "content": "same prompt"}]
+
+    results = await asyncio.gather(*[call_evolution(messages, use_cache=False) for _ in range(4)])
+    assert results == ["shared"] * 4
+    assert calls["count"] == 1
+    assert isolated_llm_state.inflight.stats()["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_call_evolution_uses_per_type_read_timeout(monkeypatch):
+    seen = {}
+
+    async def fake_create(*args, **kwargs):
+        seen["timeout"] = kwargs["timeout"]
+        return DummyResponse("ok")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    monkeypatch.setattr("backend.cloud_ru.LLM_READ_TIMEOUTS", {"manual_ui": 180.0})
+
+    await call_evolution([{"role": "user", "content": "ui"}], request_type="manual_ui")
+    assert seen["timeout"].read == 180.0
+
+    await call_evolution([{"role": "user", "content": "plan"}], request_type="test_plan")
+    assert seen["timeout"].read == 90.0
+
+
+@pytest.mark.asyncio
+async def test_fallback_answer_is_not_cached_under_primary_model(monkeypatch, isolated_llm_state):
+    primary = "ai-sage/GigaChat3-10B-A1.8B"
+    state = {"primary_down": True}
+
+    async def fake_create(*args, **kwargs):
+        if kwargs["model"] == primary and state["primary_down"]:
+            raise Exception(f"model {primary} is unavailable")
+        return DummyResponse(f"from {kwargs['model']}")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    messages = [{"role": "user", "content": "q"}]
+
+    assert await call_evolution(messages, model=primary) == f"from {DEFAULT_MODEL}"
+    assert isolated_llm_state.llm_cache.stats()["stores"] == 0
+
+    state["primary_down"] = False
+    assert await call_evolution(messages, model=primary) == f"from {primary}"
+    assert await call_evolution(messages, model=primary) == f"from {primary}"
+    assert isolated_llm_state.llm_cache.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_routes_straight_to_fallback(monkeypatch, isolated_llm_state):
+    primary = "ai-sage/GigaChat3-10B-A1.8B"
+    models_called = []
+
+    async def fake_create(*args, **kwargs):
+        models_called.append(kwargs["model"])
+        if kwargs["model"] == primary:
+            raise Exception(f"model {primary} is unavailable")
+        return DummyResponse("fallback")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+
+    for i in range(3):
+        await call_evolution([{"role": "user", "content": f"q{i}"}], model=primary)
+    assert isolated_llm_state.breakers.get(primary).state == "open"
+
+    models_called.clear()
+    assert await call_evolution([{"role": "user", "content": "q4"}], model=primary) == "fallback"
+    assert models_called == [DEFAULT_MODEL]
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_returns_first_response_and_frees_slots(monkeypatch, isolated_llm_state):
+    import asyncio
+
+    calls = []
+
+    async def fake_create(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(10)  # зависшая генерация
+        return DummyResponse("hedged answer")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    monkeypatch.setattr("backend.cloud_ru.LLM_HEDGE_ENABLED", True)
+    isolated_llm_state.hedge.min_delay_s = 0.0
+    isolated_llm_state.hedge.budget_ratio = 1.0
+    for _ in range(isolated_llm_state.hedge.min_samples):
+        isolated_llm_state.hedge.record("auto_api", 0.01)
+
+    result = await asyncio.wait_for(
+        call_evolution([{"role": "user", "content": "hi"}], request_type="auto_api"), timeout=2
+    )
+    await asyncio.sleep(0)
+
+    assert result == "hedged answer"
+    assert len(calls) == 2
+    assert isolated_llm_state.hedge.stats()["hedge_wins"] == 1
+    assert isolated_llm_state.limiter.stats()["in_flight"] == 0
+
+
+class TruncatedResponse:
+    def __init__(self, text, finish_reason):
+        self.choices = [
+            type("M", (), {
+                "message": type("Msg", (), {"content": text}),
+                "finish_reason": finish_reason,
+            })
+        ]
+
+
+@pytest.mark.asyncio
+async def test_call_evolution_continues_truncated_output(monkeypatch):
+    from backend import cloud_ru
+
+    seen = []
+    parts = [
+        TruncatedResponse('def test_a():\n    with allure_step("Arr', "length"),
+        # модель заново начинает оборванную строку
+        TruncatedResponse('    with allure_step("Arrange: x"):\n        x = 1\n', "stop"),
+    ]
+
+    async def fake_create(*args, **kwargs):
+        seen.append(kwargs["messages"])
+        return parts[len(seen) - 1]
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    before = dict(cloud_ru.continuation_stats)
+
+    result = await call_evolution([{"role": "user", "content": "hi"}], max_tokens=4000)
+
+    assert result == 'def test_a():\n    with allure_step("Arrange: x"):\n        x = 1'
+    assert seen[1][-2] == {"role": "assistant", "content": 'def test_a():\n    with allure_step("Arr'}
+    assert seen[1][-1]["role"] == "user"
+    assert cloud_ru.continuation_stats["continuations"] == before["continuations"] + 1
+
+
+@pytest.mark.asyncio
+async def test_call_evolution_caps_continuation_rounds(monkeypatch):
+    calls = []
+
+    async def fake_create(*args, **kwargs):
+        calls.append(1)
+        return TruncatedResponse(f"part{len(calls)} ", "length")
+
+    class DummyClient:
+        class chat:
+            class completions:
+                create = staticmethod(fake_create)
+
+    monkeypatch.setattr("backend.cloud_ru.client", DummyClient)
+    monkeypatch.setattr("backend.cloud_ru.LLM_MAX_CONTINUATIONS", 2)
+
+    result = await call_evolution([{"role": "user", "content": "hi"}], max_tokens=4000)
+    assert len(calls) == 3
+    assert result == "part1 part2 part3"
+
+
+def test_trim_overlap_drops_repeated_tail_only():
+    from backend.cloud_ru import _trim_overlap
+
+    partial = "class VMTests:\n    def test_create_vm(self):\n        with allure_step(\"Arr"
+    assert _trim_overlap(partial, "        with allure_step(\"Arrange\"):\n") == "ange\"):\n"
+    assert _trim_overlap(partial, "```python\nange\"):\n") == "ange\"):\n"
+    # короткое случайное совпадение не считается повтором
+    assert _trim_overlap("x = (1", "1)") == "1)"
+
+
+def test_get_client_is_built_lazily_and_requires_key(monkeypatch):
+    from backend import cloud_ru
+
+    monkeypatch.setattr("backend.cloud_ru.client", None)
+    monkeypatch.setattr("backend.cloud_ru.http_client", None)
+    for name in ("CLOUD_RU_API_KEY", "API_KEY", "OPENAI_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+
+    with pytest.raises(OSError):
+        cloud_ru.get_client()
+    assert cloud_ru.get_llm_stats()["http_pool"] == {}
+
+    monkeypatch.setenv("CLOUD_RU_API_KEY", "test-key")
+    client = cloud_ru.get_client()
+    assert cloud_ru.get_client() is client
+    assert cloud_ru.http_client is not None
+
+
+@pytest.mark.asyncio
+async def test_aclose_drops_clients_so_next_start_builds_a_new_pool(monkeypatch):
+    from backend import cloud_ru
+
+    monkeypatch.setenv("CLOUD_RU_API_KEY", "test-key")
+    monkeypatch.setattr(cloud_ru, "client", None)
+    monkeypatch.setattr(cloud_ru, "http_client", None)
+
+    first = cloud_ru.get_client()
+    pool = cloud_ru.http_client
+    await cloud_ru.aclose()
+
+    assert pool.is_closed
+    assert cloud_ru.client is None and cloud_ru.http_client is None
+    assert cloud_ru.get_client() is not first and not cloud_ru.http_client.is_closed
+    await cloud_ru.aclose()
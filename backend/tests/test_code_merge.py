@@ -0,0 +1,52 @@
+import ast
+
+from backend.code_merge import merge_modules, split_imports
+
+SHARD_A = '''import allure
+from allure import step as allure_step
+
+
+class VMTests:
+    def test_create(self):
+        with allure_step("Arrange: payload"):
+            payload = {}
+'''
+
+SHARD_B = '''import allure
+from allure import step as allure_step
+from allure_commons.types import AttachmentType
+
+
+class DiskTests:
+    def test_create(self):
+        with allure_step("Arrange: payload"):
+            payload = {}
+
+    def test_delete(self):
+        with allure_step("Act: DELETE"):
+            response = None
+'''
+
+
+def test_merge_dedupes_imports_and_keeps_order():
+    merged = merge_modules([SHARD_A, SHARD_B])
+    ast.parse(merged)
+    assert merged.count("import allure\n") == 1
+    assert merged.count("from allure import step as allure_step") == 1
+    assert merged.index("from allure_commons.types import AttachmentType") < merged.index("class VMTests")
+    assert merged.index("class VMTests") < merged.index("class DiskTests")
+
+
+def test_merge_makes_test_and_class_names_unique():
+    merged = merge_modules([SHARD_A, SHARD_B, SHARD_A])
+    tree = ast.parse(merged)
+    classes = [node.name for node in tree.body if isinstance(node, ast.ClassDef)]
+    tests = [n.name for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)]
+    assert classes == ["VMTests", "DiskTests", "VMTests_2"]
+    assert sorted(tests) == ["test_create", "test_create_2", "test_create_3", "test_delete"]
+
+
+def test_split_imports_tolerates_truncated_code():
+    imports, body = split_imports("import allure\n\nclass VMTests:\n    def test_x(self):\n        with allure_step(\"Arr")
+    assert imports == ["import allure"]
+    assert body.startswith("class VMTests:")
@@ -0,0 +1,50 @@
+from backend.endpoint_selection import EndpointIndex, normalize_path
+
+
+def _ep(method, path, tag, op=""):
+    return {"method": method, "path": path, "summary": "", "tags": [tag], "operationId": op, "responses": {}}
+
+
+ENDPOINTS = [
+    _ep("GET", "/api/v1/vms", "VMs", "get_vms"),
+    _ep("GET", "/api/v1/disks", "Disks", "get_disks"),
+    _ep("POST", "/api/v1/disks", "Disks", "create_disk"),
+    _ep("POST", "/api/v1/disks/{disk_id}/attach", "Disks", "attach_disk"),
+    _ep("GET", "/api/v1/flavors/{flavor_id}", "Flavors", "get_flavor"),
+]
+
+
+def test_normalize_path():
+    assert normalize_path("https://compute.api.cloud.ru/api/v1/disks/?limit=1") == "/api/v1/disks"
+    assert normalize_path("api/v1/vms") == "/api/v1/vms"
+
+
+def test_select_by_explicit_criteria_keeps_spec_order():
+    index = EndpointIndex(ENDPOINTS)
+
+    selection = index.select(tags=["flavors", "Nope"], operations=["get_vms", "post /api/v1/disks/"])
+    assert selection.mode == "explicit"
+    assert selection.keys == ("GET /api/v1/vms", "POST /api/v1/disks", "GET /api/v1/flavors/{flavor_id}")
+    assert selection.unmatched == ["Nope"]
+
+    assert len(index.select(paths=["/api/v1/disks"]).endpoints) == 3
+    assert index.select(tags=["Nope"]).endpoints == []
+
+
+def test_select_from_code_calls_matches_path_templates():
+    index = EndpointIndex(ENDPOINTS)
+
+    selection = index.select(calls=[
+        "https://compute.api.cloud.ru/api/v1/flavors/abc",
+        "/api/v1/disks/",  # обрезанная f-строка f"/api/v1/disks/{disk_id}/attach"
+        "/unknown",
+    ])
+    assert selection.mode == "auto"
+    assert selection.keys == (
+        "GET /api/v1/disks", "POST /api/v1/disks", "POST /api/v1/disks/{disk_id}/attach", "GET /api/v1/flavors/{flavor_id}",
+    )
+    assert selection.unmatched == ["/unknown"]
+
+    # вызовы ни с чем не совпали — в промпт идёт вся спецификация
+    assert index.select(calls=["/unknown"]).mode == "all"
+    assert len(index.select().endpoints) == len(ENDPOINTS)
@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from backend.benchmarks.fake_cloud_ru import create_app, FakeConfig, CANNED_RESPONSES
+from backend.benchmarks.bench_generate import percentile, summarize
+from backend.cloud_ru import call_evolution, stream_evolution
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+
+def _fake_client(monkeypatch, **config) -> AsyncOpenAI:
+    """Настоящий AsyncOpenAI из cloud_ru, но поверх локального стенда (ASGI, без сети)."""
+    fake_app = create_app(FakeConfig(latency_median_ms=0, seed=1, **config))
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://fake/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app)),
+    )
+    monkeypatch.setattr("backend.cloud_ru.client", client)
+    return fake_app
+
+
+@pytest.mark.asyncio
+async def test_replays_canned_response_by_prompt_type(monkeypatch):
+    fake_app = _fake_client(monkeypatch)
+    prompt = (PROMPTS_DIR / "manual_api.txt").read_text(encoding="utf-8")
+
+    result = await call_evolution([{"role": "user", "content": prompt}], max_tokens=8700, use_cache=False)
+
+    assert result.strip() == CANNED_RESPONSES["manual_api"].strip()
+    assert fake_app.state.stats["ok"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reports_usage_and_truncation(monkeypatch):
+    fake_app = create_app(FakeConfig(latency_median_ms=0, rate_truncate=1.0, seed=1))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app), base_url="http://fake") as http:
+        r = await http.post("/v1/chat/completions", json={
+            "model": "m",
+            "messages": [{"role": "user", "content": "Сгенерируй тесты"}],
+        })
+    body = r.json()
+    assert body["choices"][0]["finish_reason"] == "length"
+    assert len(body["choices"][0]["message"]["content"]) < len(CANNED_RESPONSES["custom"])
+    assert body["usage"]["prompt_tokens"] > 0
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_injected_429_reaches_client(monkeypatch):
+    _fake_client(monkeypatch, rate_429=1.0)
+
+    with pytest.raises(Exception) as exc:
+        await call_evolution([{"role": "user", "content": "hi"}], use_cache=False)
+    assert "429" in str(exc.value)
+
+
+@pytest.mark.asyncio
+async def test_streaming_chunks_join_to_canned_response(monkeypatch):
+    _fake_client(monkeypatch, chunk_chars=16)
+    prompt = (PROMPTS_DIR / "unit_ci.txt").read_text(encoding="utf-8")
+
+    chunks = [c async for c in stream_evolution([{"role": "user", "content": prompt}], use_cache=False)]
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == CANNED_RESPONSES["unit_ci"]
+
+
+def test_bench_summary_percentiles():
+    results = [{"status": 200, "latency_s": i / 100, "ttft_s": None} for i in range(1, 101)]
+    results.append({"status": 503, "latency_s": 0.01, "ttft_s": None})
+    report = summarize(results, elapsed_s=2.0)
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert report["statuses"] == {"200": 100, "503": 1}
+    assert report["throughput_rps"] == 50.0
+    assert report["latency_ms"]["p50"] < report["latency_ms"]["p95"] <= report["latency_ms"]["p99"]
+
+
+@pytest.mark.asyncio
+async def test_truncated_output_is_completed_by_continuations(monkeypatch):
+    _fake_client(monkeypatch)
+    monkeypatch.setattr("backend.cloud_ru.LLM_MAX_CONTINUATIONS", 5)
+    monkeypatch.setattr("backend.cloud_ru.CONTINUATION_MIN_TOKENS", 1)
+    prompt = (PROMPTS_DIR / "manual_api.txt").read_text(encoding="utf-8")
+
+    result = await call_evolution([{"role": "user", "content": prompt}], max_tokens=1000, use_cache=False)
+
+    assert result == CANNED_RESPONSES["manual_api"].strip()
+
+
+@pytest.mark.asyncio
+async def test_truncated_stream_is_completed_by_continuations(monkeypatch):
+    _fake_client(monkeypatch, chunk_chars=64)
+    monkeypatch.setattr("backend.cloud_ru.LLM_MAX_CONTINUATIONS", 5)
+    monkeypatch.setattr("backend.cloud_ru.CONTINUATION_MIN_TOKENS", 1)
+    prompt = (PROMPTS_DIR / "manual_ui.txt").read_text(encoding="utf-8")
+
+    chunks = [
+        c async for c in stream_evolution([{"role": "user", "content": prompt}], max_tokens=1200, use_cache=False)
+    ]
+
+    assert "".join(chunks) == CANNED_RESPONSES["manual_ui"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_system_prefix_reports_cached_tokens(monkeypatch):
+    from backend.cloud_ru import track_usage, get_llm_stats
+
+    _fake_client(monkeypatch)
+    system = (PROMPTS_DIR / "optimize.txt").read_text(encoding="utf-8")
+    usage = track_usage()
+
+    for code in ("def test_a(): pass", "def test_b(): pass"):
+        await call_evolution(
+            [{"role": "system", "content": system}, {"role": "user", "content": code}],
+            max_tokens=4000,
+            use_cache=False,
+        )
+
+    assert usage["calls"] == 2
+    assert 0 < usage["cached_tokens"] < usage["prompt_tokens"]
+    assert get_llm_stats()["usage"]["cached_ratio"] > 0
@@ -0,0 +1,55 @@
+import ast
+
+from backend.fanout import SHARED_CONFTEST, group_instruction, path_prefix, plan_endpoint_groups, stitch_package
+
+
+def _ep(method, path, *tags):
+    return {"method": method, "path": path, "tags": list(tags)}
+
+
+ENDPOINTS = [
+    _ep("GET", "/api/v1/disks", "Disks"),
+    _ep("POST", "/api/v1/disks/{disk_id}/attach", "Disks"),
+    _ep("GET", "/api/v1/flavors", "Flavors"),
+    _ep("GET", "/api/v1/flavors/{flavor_id}", "Flavors"),
+    _ep("GET", "/api/v1/quotas"),
+]
+
+
+def test_path_prefix_stops_at_first_parameter():
+    assert path_prefix("/api/v1/disks/{disk_id}/attach") == "/api/v1/disks"
+    assert path_prefix("/api/v1/vms/{vm_id}", depth=2) == "/api/v1"
+
+
+def test_plan_groups_by_tag_with_prefix_fallback_and_splits_large_groups():
+    groups = plan_endpoint_groups(ENDPOINTS, by="tag")
+    assert [(g.name, len(g.endpoints)) for g in groups] == [("Disks", 2), ("Flavors", 2), ("/api/v1/quotas", 1)]
+    assert groups[2].slug == "api_v1_quotas" and groups[0].class_name == "TestDisksAPI"
+
+    split = plan_endpoint_groups(ENDPOINTS, by="prefix", max_endpoints=1)
+    assert [g.name for g in split][:2] == ["/api/v1/disks 1", "/api/v1/disks 2"]
+    assert all(g.total == len(split) == 5 for g in split)
+
+
+def test_instruction_lists_group_endpoints_and_missing():
+    group = plan_endpoint_groups(ENDPOINTS)[1]
+    text = group_instruction(group, missing=["GET /api/v1/flavors/{flavor_id}"])
+    assert "ЧАСТЬ 2 ИЗ 3" in text and "TestFlavorsAPI" in text
+    assert "- GET /api/v1/flavors\n" in text
+    assert "не покрыты эндпоинты: GET /api/v1/flavors/{flavor_id}" in text
+
+
+def test_stitch_package_shares_fixtures_through_conftest():
+    groups = plan_endpoint_groups(ENDPOINTS[:4])
+    module = (
+        "import pytest\n\n\n@pytest.fixture\ndef auth_headers():\n    return {}\n\n\n"
+        "def test_list(auth_headers):\n    assert auth_headers is not None\n"
+    )
+
+    code, files = stitch_package(groups, [module, module])
+
+    assert files["conftest.py"] == SHARED_CONFTEST
+    assert "def auth_headers" not in files["test_disks.py"]
+    assert code.count("def auth_headers") == 1
+    assert "def test_list_2(" in code
+    ast.parse(code)
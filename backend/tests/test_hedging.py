@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from backend.hedging import HedgePolicy
+
+
+def _warm(policy: HedgePolicy, request_type: str, latency_s: float, n: int) -> None:
+    for _ in range(n):
+        policy.record(request_type, latency_s)
+    policy.requests += n
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_enough_samples():
+    policy = HedgePolicy(min_samples=5, min_delay_s=0.0)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    assert await policy.run("manual_ui", factory) == "ok"
+    assert len(calls) == 1
+    assert policy.stats()["hedged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_loser_is_cancelled():
+    policy = HedgePolicy(min_samples=5, min_delay_s=0.0, budget_ratio=0.5)
+    _warm(policy, "auto_api", 0.01, 10)
+    cancelled = []
+    attempts = []
+
+    async def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            try:
+                await asyncio.sleep(10)  # зависший upstream
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        return "hedged"
+
+    result = await asyncio.wait_for(policy.run("auto_api", factory), timeout=2)
+
+    assert result == "hedged"
+    await asyncio.sleep(0)
+    assert cancelled == [1]
+    stats = policy.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["delay_s"]["auto_api"] == pytest.approx(0.01)
+
+
+@pytest.mark.asyncio
+async def test_budget_and_capacity_limit_hedges():
+    policy = HedgePolicy(min_samples=5, min_delay_s=0.0, budget_ratio=0.05)
+    _warm(policy, "auto_api", 0.001, 10)
+    attempts = []
+
+    async def slow():
+        attempts.append(1)
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    # 11 вызовов * 5% < 1 дополнительного запроса — бюджета нет
+    assert await policy.run("auto_api", slow) == "ok"
+    assert policy.stats()["budget_denied"] == 1
+
+    policy.budget_ratio = 1.0
+    assert await policy.run("auto_api", slow, has_capacity=lambda: False) == "ok"
+    assert policy.stats()["no_capacity"] == 1
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_primary_error_falls_back_to_hedge_result():
+    policy = HedgePolicy(min_samples=1, min_delay_s=0.0, budget_ratio=1.0)
+    _warm(policy, "t", 0.001, 3)
+    attempts = []
+
+    async def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.02)
+            raise RuntimeError("502")
+        await asyncio.sleep(0.05)
+        return "second"
+
+    assert await policy.run("t", factory) == "second"
+
+
+@pytest.mark.asyncio
+async def test_all_attempts_failing_raises_primary_error():
+    policy = HedgePolicy()
+
+    async def factory():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        await policy.run("t", factory)
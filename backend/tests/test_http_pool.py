@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+import pytest
+from backend.http_pool import build_http_client, pool_stats
+
+
+async def _start_keepalive_server():
+    async def handle(reader, writer):
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            if not request:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok")
+            await writer.drain()
+
+    async def safe_handle(reader, writer):
+        try:
+            await handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(safe_handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_keepalive_connection_and_reports_metrics():
+    server, port = await _start_keepalive_server()
+    client = build_http_client(max_connections=4, max_keepalive_connections=2)
+    try:
+        for _ in range(3):
+            r = await client.get(f"http://127.0.0.1:{port}/")
+            assert r.text == "ok"
+
+        stats = pool_stats(client)
+        assert stats["requests_total"] == 3
+        assert stats["new_connections"] == 1
+        assert stats["reused_connections"] == 2
+        assert stats["connections_idle"] == 1
+        assert stats["requests_in_flight"] == 0
+        assert stats["acquire_wait_max_ms"] >= 0
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr("backend.http_pool.http2_available", lambda: False)
+    client = build_http_client(http2=True)
+    assert pool_stats(client)["connections_total"] == 0
+
+
+def test_pool_stats_for_foreign_client_is_empty():
+    assert pool_stats(httpx.AsyncClient()) == {}
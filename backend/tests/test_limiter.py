@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from backend.limiter import AdaptiveLimiter, LimiterOverloaded, is_overload_error
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_is_overload_error_classification():
+    assert is_overload_error(StatusError(429))
+    assert is_overload_error(StatusError(502))
+    assert not is_overload_error(StatusError(400))
+    assert is_overload_error(type("APITimeoutError", (Exception,), {})())
+    assert not is_overload_error(ValueError("bad"))
+
+
+@pytest.mark.asyncio
+async def test_window_grows_on_success_and_shrinks_on_overload():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, max_limit=8, decrease_cooldown_s=0)
+    for _ in range(8):
+        async with limiter.slot():
+            pass
+    assert limiter.limit > 4
+
+    grown = limiter.limit
+    with pytest.raises(StatusError):
+        async with limiter.slot():
+            raise StatusError(429)
+    assert limiter.limit == max(1, int(grown * 0.5))
+    assert limiter.stats()["decreases"] == 1
+
+
+@pytest.mark.asyncio
+async def test_non_overload_error_keeps_window():
+    limiter = AdaptiveLimiter(initial_limit=3)
+    with pytest.raises(ValueError):
+        async with limiter.slot():
+            raise ValueError("empty answer")
+    assert limiter.limit == 3
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_waits_for_free_slot():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1, max_queue=2)
+    order = []
+    release = asyncio.Event()
+
+    async def worker(name):
+        async with limiter.slot():
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(worker("first"))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(worker("second"))
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert order == ["first", "second"]
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately_with_retry_after():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1, max_queue=0)
+    await limiter.acquire()
+    with pytest.raises(LimiterOverloaded) as exc:
+        await limiter.acquire()
+    assert exc.value.retry_after >= 1
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_rejects_and_cleans_up():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1, max_queue=5, queue_timeout_s=0.01)
+    await limiter.acquire()
+    with pytest.raises(LimiterOverloaded):
+        await limiter.acquire()
+    stats = limiter.stats()
+    assert stats["queue_timeouts"] == 1
+    assert stats["queued"] == 0
+
+    limiter.release(True)
+    await limiter.acquire()
+    assert limiter.stats()["in_flight"] == 1
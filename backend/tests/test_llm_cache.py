@@ -0,0 +1,57 @@
+import pytest
+from backend.llm_cache import LLMCache, make_cache_key
+
+
+def test_make_cache_key_depends_on_all_inputs():
+    messages = [{"role": "user", "content": "hi"}]
+    base = make_cache_key("m", messages, max_tokens=10)
+    assert base == make_cache_key("m", [{"role": "user", "content": "hi"}], max_tokens=10)
+    assert base != make_cache_key("other", messages, max_tokens=10)
+    assert base != make_cache_key("m", messages, max_tokens=11)
+    assert base != make_cache_key("m", [{"role": "user", "content": "hello"}], max_tokens=10)
+
+
+@pytest.mark.asyncio
+async def test_memory_lru_eviction():
+    cache = LLMCache(max_entries=2)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    assert await cache.get("a") == "1"  # "a" становится самым свежим
+    await cache.set("c", "3")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert await cache.get("c") == "3"
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("backend.llm_cache.time.time", lambda: now[0])
+    cache = LLMCache(ttl_s=10)
+    await cache.set("k", "v")
+    now[0] += 11
+    assert await cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_instance(tmp_path):
+    db = tmp_path / "cache.sqlite3"
+    first = LLMCache(db_path=db)
+    await first.set("k", "persisted")
+
+    second = LLMCache(db_path=db)
+    assert await second.get("k") == "persisted"
+    assert await second.get("k") == "persisted"
+    stats = second.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_bounded(tmp_path):
+    cache = LLMCache(db_path=tmp_path / "cache.sqlite3", max_entries=1, max_disk_entries=2)
+    for key in ["a", "b", "c"]:
+        await cache.set(key, key)
+    count = cache._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    assert count == 2
@@ -1,17 +1,38 @@
 import asyncio
+import re
 import time
+from pathlib import Path
 import httpx
+import pytest
 from fastapi.testclient import TestClient
 from backend.main import app
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def generation_store(monkeypatch):
+    """Тесты прошлых генераций по операциям — только в памяти и только в пределах теста."""
+    from backend.spec_diff import GenerationStore
+
+    store = GenerationStore(db_path=None)
+    monkeypatch.setattr("backend.main.generation_store", store)
+    return store
+
+
 def test_root_endpoint():
     r = client.get("/")
     assert r.status_code == 200
     assert "TestOps Copilot" in r.json()["message"]
 
 
+def test_disk_caches_are_outside_the_source_tree():
+    from backend import main
+
+    for path in (main.OPENAPI_CACHE_DIR, main.PROMPT_BYTECODE_CACHE_DIR, main.SPEC_UPLOAD_DIR, main.GENERATION_STORE_PATH):
+        assert not Path(path).resolve().is_relative_to(main.BASE_DIR), path
+
+
 def test_get_original_prompt():
     r = client.get("/prompt/manual_ui")
     assert r.status_code == 200
@@ -21,6 +42,22 @@ def test_get_original_prompt():
     assert len(data["prompt"]) > 10
 
 
+def test_get_original_prompt_supports_etag():
+    r = client.get("/prompt/optimize")
+    etag = r.headers["etag"]
+    assert "{вставь сюда весь код" in r.json()["prompt"]
+
+    r = client.get("/prompt/optimize", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+
+    assert client.get("/prompt/optimize", headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+    assert client.get("/prompt/optimize", headers={"If-None-Match": "*"}).status_code == 304
+    # Часть тега или тег с лишними символами — не совпадение
+    assert client.get("/prompt/optimize", headers={"If-None-Match": etag[:8] + '"'}).status_code == 200
+    assert client.get("/prompt/optimize", headers={"If-None-Match": f'"v2{etag}"'}).status_code == 200
+
+
 def test_generate_manual_ui(monkeypatch):
     async def fake_llm(*args, **kwargs):
         return """import allure
@@ -320,7 +357,7 @@ def test_generate_optimize_injects_defects(monkeypatch):
     captured_prompt = {}
 
     async def fake_llm(messages, **kwargs):
-        captured_prompt["value"] = messages[0]["content"]
+        captured_prompt["value"] = messages[-1]["content"]
         return "print('optimized')"
 
     monkeypatch.setattr("backend.main.analyze_defects", fake_analyze_defects)
@@ -775,6 +812,34 @@ def test_check_coverage():
     assert len(missing) == 1
 
 
+def test_check_coverage_matches_templated_paths_and_methods():
+    from backend.main import check_coverage
+    endpoints = [{"method": "GET", "path": "/vms/{vm_id}"}, {"method": "DELETE", "path": "/vms/{vm_id}"}]
+    code = "import requests\ndef test_vm(vm_id):\n    requests.get(f'/vms/{vm_id}')\n"
+    assert check_coverage(endpoints, code) == ["DELETE /vms/{vm_id}"]
+
+
+def test_check_coverage_falls_back_to_literal_path_for_unrecognized_calls():
+    from backend.main import check_coverage
+    endpoints = [{"method": "GET", "path": "/vms"}, {"method": "GET", "path": "/disks"}, {"method": "GET", "path": "/nets"}]
+    code = (
+        "import httpx\n"
+        "def _get(path):\n    return api.get(path)\n"
+        "def test_vms():\n    httpx.get('/vms')\n"
+        "def test_disks():\n    _get('/disks')\n"
+    )
+    assert check_coverage(endpoints, code) == ["GET /nets"]
+
+
+def test_check_coverage_uses_spec_trie():
+    from backend.main import check_coverage
+    from backend.path_trie import PathTrie
+    spec = [{"method": "GET", "path": "/vms/{vm_id}"}, {"method": "DELETE", "path": "/vms/{vm_id}"}, {"method": "GET", "path": "/disks"}]
+    code = "import requests\ndef test_vm(vm_id):\n    requests.get(f'/vms/{vm_id}')\n"
+    # дерево всей спецификации, проверяются только переданные эндпоинты
+    assert check_coverage(spec[:2], code, PathTrie(spec)) == ["DELETE /vms/{vm_id}"]
+
+
 def test_generate_syntax_error_fix_loop(monkeypatch):
     """Тест, что синтаксические ошибки исправляются в цикле до 8 раз"""
     call_count = [0]
@@ -809,4 +874,449 @@ def test_generate_edited_prompt_uses_custom(monkeypatch):
         "type": "manual_ui",
         "custom_prompt": "custom edited prompt text"
     })
-    assert r.status_code == 200
\ No newline at end of file
+    assert r.status_code == 200
+
+def _parse_sse(text: str) -> list[tuple[str, dict]]:
+    import json
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_generate_stream_emits_tokens_and_result(monkeypatch):
+    async def fake_stream(*args, **kwargs):
+        for part in ["def test_x():\n", "    pass"]:
+            yield part
+
+    monkeypatch.setattr("backend.main.stream_evolution", fake_stream)
+
+    r = client.post("/generate/stream", json={"type": "test_plan", "previous_code": "def test_x(): pass"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(r.text)
+    assert [e for e, _ in events] == ["token", "token", "result"]
+    result = events[-1][1]
+    assert result["code"] == "def test_x():\n    pass"
+    assert "duration_s" in result["metrics"]
+
+
+def test_generate_stream_reports_timeout_as_error_event(monkeypatch):
+    async def fake_stream(*args, **kwargs):
+        yield "def test_x():"
+        raise httpx.ReadTimeout("timeout")
+
+    monkeypatch.setattr("backend.main.stream_evolution", fake_stream)
+
+    r = client.post("/generate/stream", json={"type": "test_plan", "previous_code": "def test_x(): pass"})
+    events = _parse_sse(r.text)
+    assert events[-1][0] == "error"
+    assert events[-1][1]["status_code"] == 504
+
+
+def test_generate_stream_validates_before_streaming():
+    r = client.post("/generate/stream", json={"type": "optimize"})
+    assert r.status_code == 400
+
+
+def test_generate_stream_rejects_multi_call_options():
+    for extra in ({"shards": 3}, {"fanout": "tag"}, {"incremental": True}):
+        r = client.post("/generate/stream", json={"type": "auto_api", **extra})
+        assert r.status_code == 400, extra
+        assert next(iter(extra)) in r.json()["detail"]
+
+
+def test_generate_overload_returns_503_with_retry_after(monkeypatch):
+    from backend.limiter import LimiterOverloaded
+
+    async def fake_llm(*args, **kwargs):
+        raise LimiterOverloaded("Очередь запросов к модели переполнена", retry_after=7)
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate", json={"type": "test_plan", "previous_code": "def test_x(): pass"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "7"
+
+
+def test_generate_prompt_fits_context_window(monkeypatch):
+    from backend.token_budget import estimate_tokens
+
+    seen = {}
+
+    async def fake_llm(messages, max_tokens, **kwargs):
+        seen["prompt"] = messages[-1]["content"]
+        seen["max_tokens"] = max_tokens
+        return "def test_x(): pass"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    monkeypatch.setattr("backend.main.CONTEXT_WINDOW", 8000)
+
+    huge_code = "\n".join(f"def test_case_{i}():\n    assert client.get('/v3/vms/{i}').status_code == 200" for i in range(3000))
+    r = client.post("/generate", json={"type": "optimize", "previous_code": huge_code})
+    assert r.status_code == 200
+    assert "пропущено строк" in seen["prompt"]
+    assert estimate_tokens(seen["prompt"]) + seen["max_tokens"] <= 8000
+
+
+def test_fit_prompt_to_budget_rejects_oversize_template():
+    from fastapi import HTTPException
+    from backend.main import fit_prompt_to_budget, prompt_engine
+
+    system = prompt_engine.from_text("Ты — QA. " * 5000)
+    user = prompt_engine.from_text("Задание")
+    with pytest.raises(HTTPException) as exc:
+        fit_prompt_to_budget("custom", system, user, {}, 4000, context_window=8000)
+    assert exc.value.status_code == 400
+
+
+def test_generate_batch_runs_items_concurrently(monkeypatch):
+    # Каждый вызов модели ждёт, пока не начнутся все три: при последовательном выполнении — таймаут
+    started = {"count": 0}
+    all_started = asyncio.Event()
+
+    async def fake_llm(messages, **kwargs):
+        started["count"] += 1
+        if started["count"] == 3:
+            all_started.set()
+        await asyncio.wait_for(all_started.wait(), timeout=5)
+        return "import allure\n\ndef test_x():\n    assert True\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate/batch", json={"requests": [
+        {"type": "manual_ui"},
+        {"type": "manual_api"},
+        {"type": "auto_ui"},
+        {"type": "test_plan"},  # без previous_code — 400 только для этого элемента
+    ]})
+
+    assert r.status_code == 200
+    data = r.json()
+    assert [item["status_code"] for item in data["results"]] == [200, 200, 200, 400]
+    assert data["results"][0]["result"]["type"] == "manual_ui"
+    assert "previous_code" in data["results"][3]["detail"]
+    assert data["metrics"]["succeeded"] == 3 and data["metrics"]["failed"] == 1
+
+
+def test_generate_batch_isolates_unexpected_item_errors(monkeypatch):
+    from backend import main
+
+    build_prompt = main.build_generation_prompt
+
+    async def flaky_build(req, spec_entry=None):
+        if req.type == "auto_ui":
+            raise RuntimeError("boom")
+        return await build_prompt(req, spec_entry)
+
+    async def fake_llm(messages, **kwargs):
+        return "def test_x():\n    assert True\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    monkeypatch.setattr("backend.main.build_generation_prompt", flaky_build)
+
+    r = client.post("/generate/batch", json={"requests": [{"type": "manual_ui"}, {"type": "auto_ui"}]})
+
+    assert r.status_code == 200
+    assert [item["status_code"] for item in r.json()["results"]] == [200, 500]
+
+
+def test_generate_batch_stream_emits_items_then_done(monkeypatch):
+    async def fake_llm(messages, request_type=None, **kwargs):
+        await asyncio.sleep(0.2 if request_type == "manual_ui" else 0.01)
+        return "def test_x():\n    assert True\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate/batch", json={
+        "requests": [{"type": "manual_ui"}, {"type": "auto_ui"}],
+        "stream": True,
+    })
+    events = _parse_sse(r.text)
+    assert [name for name, _ in events] == ["item", "item", "done"]
+    # готовые раньше элементы приходят раньше
+    assert [data["type"] for _, data in events[:2]] == ["auto_ui", "manual_ui"]
+    assert events[-1][1]["total"] == 2
+
+
+def test_generate_batch_validates_size():
+    assert client.post("/generate/batch", json={"requests": []}).status_code == 400
+    r = client.post("/generate/batch", json={"requests": [{"type": "manual_ui"}] * 9})
+    assert r.status_code == 400
+
+
+def test_generate_sharded_manual_api_merges_and_retries_truncated_shard(monkeypatch):
+    calls = []
+
+    async def fake_llm(messages, max_tokens, use_cache=True, **kwargs):
+        prompt = messages[-1]["content"]
+        cls = next(name for name in ("VMTests", "DiskTests", "FlavorTests") if f"ТОЛЬКО класс(ы) {name}" in prompt)
+        calls.append((cls, max_tokens, use_cache))
+        header = "import allure\nfrom allure import step as allure_step\n\n"
+        if cls == "DiskTests" and len([c for c in calls if c[0] == "DiskTests"]) == 1:
+            return header + "class DiskTests:\n    def test_a(self):\n        with allure_step(\"Arrange"  # обрезано
+        tests = "".join(
+            f"    def test_case_{i}(self):\n        with allure_step(\"Arrange: x\"):\n            x = 1\n"
+            for i in range(11)
+        )
+        return header + f"@allure.manual\n@allure.label(\"owner\", \"qa_team\")\nclass {cls}:\n" + tests
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate", json={"type": "manual_api", "shards": 3})
+    assert r.status_code == 200
+    data = r.json()
+    code = data["code"]
+    assert code.count("import allure\n") == 1
+    assert all(f"class {name}" in code for name in ("VMTests", "DiskTests", "FlavorTests"))
+    assert "test_case_0_2" in code  # одинаковые имена тестов разных частей переименованы
+    shards = data["metrics"]["shards"]
+    assert [s["retried"] for s in shards] == [False, True, False]
+    disk_calls = [c for c in calls if c[0] == "DiskTests"]
+    assert len(disk_calls) == 2
+    # первая попытка — доля лимита, повтор обрезанной части — полный лимит
+    assert disk_calls[0][1] < disk_calls[1][1] == 8700
+
+
+def test_generate_shards_rejected_for_non_manual_types():
+    r = client.post("/generate", json={"type": "auto_ui", "shards": 2})
+    assert r.status_code == 400
+
+
+def test_generate_keeps_static_system_prefix_and_request_data_last(monkeypatch):
+    seen = []
+
+    async def fake_llm(messages, **kwargs):
+        seen.append(messages)
+        return "def test_x():\n    assert True\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    for code in ("def test_one(): pass", "def test_two(): pass"):
+        r = client.post("/generate", json={"type": "optimize", "previous_code": code})
+        assert r.status_code == 200
+        assert r.json()["metrics"]["llm_usage"]["calls"] == 0  # вызов модели подменён
+
+    first, second = seen
+    assert [m["role"] for m in first] == ["system", "user"]
+    # префикс не зависит от данных запроса — upstream может переиспользовать его KV-кэш
+    assert first[0] == second[0]
+    assert "test_one" not in first[0]["content"]
+    assert "КОД ДЛЯ АНАЛИЗА — см. сообщение пользователя" in first[0]["content"]
+    assert first[1]["content"].startswith("### КОД ДЛЯ АНАЛИЗА\ndef test_one(): pass")
+
+
+def test_generate_edited_prompt_substitutes_placeholders(monkeypatch):
+    seen = []
+
+    async def fake_llm(messages, **kwargs):
+        seen.append(messages[1]["content"])
+        return "def test_x(): pass"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate", json={
+        "type": "optimize",
+        "previous_code": "def test_one(): pass",
+        "custom_prompt": "Улучши код:\n{вставь сюда весь код}\nДефекты: {historical_bugs}",
+    })
+    assert r.status_code == 200
+    assert "def test_one(): pass" in seen[-1]
+    assert "Дефекты: No historical bugs provided" in seen[-1]
+
+    r = client.post("/generate", json={
+        "type": "auto_api",
+        "endpoint_tags": ["Flavors"],
+        "custom_prompt": "Эндпоинты: {openapi_endpoints}\n{{ не jinja }}",
+    })
+    assert r.status_code == 200
+    assert "GET /api/v1/flavors/{flavor_id}" in seen[-1]
+    # пользовательский текст не компилируется как Jinja
+    assert "{openapi_endpoints}" not in seen[-1] and "{{ не jinja }}" in seen[-1]
+
+
+def test_generate_auto_api_selects_endpoints_by_tag(monkeypatch):
+    seen = {}
+
+    async def fake_llm(messages, **kwargs):
+        seen["system"] = messages[0]["content"]
+        return "def test_x(): pass"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate", json={"type": "auto_api", "endpoint_tags": ["Flavors"]})
+    assert r.status_code == 200
+    assert r.json()["metrics"]["endpoints_in_prompt"] == 2
+    assert "GET /api/v1/flavors/{flavor_id}" in seen["system"]
+    assert "/api/v1/disks" not in seen["system"]
+
+    r = client.post("/generate", json={"type": "auto_api", "endpoint_tags": ["NoSuchTag"]})
+    assert r.status_code == 400
+    assert "Disks" in r.json()["detail"]
+
+
+def test_generate_auto_api_fanout_by_tag_retries_only_uncovered_group(monkeypatch):
+    calls = []
+
+    async def fake_llm(messages, *args, **kwargs):
+        user = messages[-1]["content"]
+        group = re.search(r"группа «(\w+)»", user).group(1)
+        operations = re.findall(r"^- ([A-Z]+) (\S+)$", user, re.MULTILINE)
+        calls.append(group)
+        if group == "Disks" and "не покрыты" not in user:
+            operations = operations[:1]
+        tests = "\n\n".join(
+            f'def test_{group.lower()}_{i}(auth_headers):\n'
+            f'    url = "{path}"\n'
+            f'    requests.{method.lower()}(f"{{BASE_URL}}{{url}}", headers=auth_headers)'
+            for i, (method, path) in enumerate(operations)
+        )
+        return f"import pytest\nimport requests\n\n\n@pytest.fixture\ndef auth_headers():\n    return {{}}\n\n\n{tests}\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+
+    r = client.post("/generate", json={"type": "auto_api", "endpoint_tags": ["Flavors", "Disks"], "fanout": "tag"})
+    assert r.status_code == 200
+    data = r.json()
+    assert sorted(calls) == ["Disks", "Disks", "Flavors"]
+    assert set(data["files"]) == {"conftest.py", "test_disks.py", "test_flavors.py"}
+    # Общие фикстуры объявлены только в conftest
+    assert "def auth_headers" not in data["files"]["test_disks.py"]
+    assert data["code"].count("def auth_headers") == 1
+    groups = {g["name"]: g for g in data["metrics"]["groups"]}
+    assert groups["Disks"]["retries"] == 1 and groups["Disks"]["missing"] == []
+    assert groups["Flavors"]["retries"] == 0
+    assert data["metrics"]["endpoints_in_prompt"] == 9
+
+    r = client.post("/generate", json={"type": "manual_ui", "fanout": "tag"})
+    assert r.status_code == 400
+
+
+def test_health_ready_waits_for_background_spec_load(monkeypatch):
+    async def fake_llm(messages, **kwargs):
+        return "def test_x(): pass"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    monkeypatch.setattr(app.state, "openapi_spec", None)
+
+    r = client.get("/health/ready")
+    assert r.status_code == 503
+    assert r.json()["status"] == "not_ready"
+
+    # auto_api-запрос дожидается загрузки в рабочем потоке, а не разбирает спецификацию сам
+    r = client.post("/generate", json={"type": "auto_api", "endpoint_tags": ["Flavors"]})
+    assert r.status_code == 200
+
+    r = client.get("/health/ready")
+    assert r.status_code == 200
+    assert r.json()["openapi"]["state"] == "ready"
+    assert r.json()["openapi"]["endpoints"] > 0
+
+
+def test_generate_fanout_keeps_one_spec_version_per_request(monkeypatch, tmp_path):
+    from backend.main import spec_fragments
+    from backend.spec_registry import SpecRegistry
+
+    registry = SpecRegistry(tmp_path / "specs", None, spec_fragments, max_bytes=10 ** 9)
+    seen = []
+
+    async def fake_llm(messages, **kwargs):
+        seen.append(messages[0]["content"])
+        if "billing" in registry:
+            registry.remove("billing")  # спецификацию удалили посреди запроса
+        return "import requests\ndef test_x():\n    requests.get('/invoices')\n    requests.get('/payments')\n"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    monkeypatch.setattr("backend.main.spec_registry", registry)
+    ops = "".join(
+        f"  /{name}:\n    get:\n      tags: [{name}]\n      responses:\n        '200':\n          description: ok\n"
+        for name in ("invoices", "payments")
+    )
+    content = f"openapi: 3.0.0\ninfo:\n  title: billing\n  version: '1'\npaths:\n{ops}"
+    assert client.post("/specs", json={"spec_id": "billing", "content": content}).status_code == 200
+
+    r = client.post("/generate", json={"type": "auto_api", "spec_id": "billing", "fanout": "tag"})
+    assert r.status_code == 200
+    assert len(seen) == 2 and all("GET /" in system for system in seen)
+
+
+def test_generate_auto_api_with_registered_spec(monkeypatch, tmp_path):
+    from backend.main import spec_fragments
+    from backend.spec_registry import SpecRegistry
+
+    seen = {}
+
+    async def fake_llm(messages, **kwargs):
+        seen["system"] = messages[0]["content"]
+        return "def test_x(): pass"
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    monkeypatch.setattr(
+        "backend.main.spec_registry",
+        SpecRegistry(tmp_path / "specs", None, spec_fragments, max_bytes=10 ** 9),
+    )
+    content = (
+        "openapi: 3.0.0\ninfo:\n  title: billing\n  version: '1'\npaths:\n"
+        "  /invoices:\n    get:\n      tags: [Invoices]\n      responses:\n        '200':\n          description: ok\n"
+    )
+
+    r = client.post("/specs", json={"spec_id": "billing", "content": content})
+    assert r.status_code == 200
+    assert r.json()["endpoints"] == 1 and r.json()["tags"] == ["Invoices"]
+    assert client.get("/specs").json()["specs"][0]["spec_id"] == "billing"
+
+    r = client.post("/generate", json={"type": "auto_api", "spec_id": "billing"})
+    assert r.status_code == 200
+    assert "GET /invoices" in seen["system"] and "/api/v1/disks" not in seen["system"]
+
+    assert client.post("/generate", json={"type": "auto_api", "spec_id": "nope"}).status_code == 404
+    # Регистрация по пути без SPEC_SOURCE_ROOT запрещена; ошибка разбора не пересказывает содержимое файла
+    assert client.post("/specs", json={"spec_id": "x", "path": "/etc/passwd"}).status_code == 403
+    r = client.post("/specs", json={"spec_id": "x", "content": "secret-token: [unclosed"})
+    assert r.status_code == 422 and "secret-token" not in r.text
+    assert client.post("/specs", json={"spec_id": "x"}).status_code == 400
+    assert client.delete("/specs/billing").status_code == 200
+
+
+def test_generate_auto_api_incremental_regenerates_only_changed_operations(monkeypatch, generation_store):
+    prompts = []
+
+    async def fake_llm(messages, **kwargs):
+        prompts.append("\n".join(m["content"] for m in messages))
+        return (
+            "import requests\n\nBASE_URL = 'https://compute.api.cloud.ru'\n\n\n"
+            "class TestFlavorsAPI:\n"
+            "    def test_list_flavors(self):\n"
+            "        requests.get(f'{BASE_URL}/api/v1/flavors')\n\n"
+            "    def test_get_flavor(self, flavor_id):\n"
+            "        requests.get(f'{BASE_URL}/api/v1/flavors/{flavor_id}')\n"
+        )
+
+    monkeypatch.setattr("backend.main.call_evolution", fake_llm)
+    request = {"type": "auto_api", "endpoint_tags": ["Flavors"], "incremental": True}
+
+    r = client.post("/generate", json=request)
+    assert r.status_code == 200
+    first = r.json()
+    assert first["metrics"]["incremental"]["added"] == ["GET /api/v1/flavors", "GET /api/v1/flavors/{flavor_id}"]
+    assert "def test_get_flavor(" in first["code"]
+
+    # Спецификация не менялась — модель не вызывается, тесты собираются из хранилища
+    r = client.post("/generate", json=request)
+    assert len(prompts) == 1
+    assert r.json()["code"] == first["code"]
+    assert r.json()["metrics"]["incremental"]["reused"] == 2
+
+    # Изменилась одна операция — в промпт попадает только она
+    op_hash, tests = generation_store._memory["default"]["GET /api/v1/flavors/{flavor_id}"]
+    generation_store._memory["default"]["GET /api/v1/flavors/{flavor_id}"] = ("stale", tests)
+    r = client.post("/generate", json=request)
+    data = r.json()
+    assert len(prompts) == 2
+    assert "GET /api/v1/flavors/{flavor_id} —" in prompts[1] and "GET /api/v1/flavors —" not in prompts[1]
+    assert data["metrics"]["incremental"]["changed"] == ["GET /api/v1/flavors/{flavor_id}"]
+    assert data["metrics"]["incremental"]["reused"] == 1
+    assert data["code"].count("def test_list_flavors(") == 1 and data["code"].count("class TestFlavorsAPI") == 1
+
+    assert client.post("/generate", json={"type": "manual_ui", "incremental": True}).status_code == 400
@@ -0,0 +1,109 @@
+import copy
+
+from backend.openapi_compact import CompactSerializer
+
+ERROR = {
+    "title": "DiskNotFoundExceptionSchema",
+    "type": "object",
+    "required": ["code", "message"],
+    "properties": {"code": {"type": "string", "description": "Код ошибки."}, "message": {"type": "string"}},
+}
+ZONE = {
+    "type": "object",
+    "required": ["id"],
+    "properties": {"id": {"type": "string", "format": "uuid4"}, "name": {"type": "string"}},
+}
+DISK = {
+    "title": "Disk",
+    "type": "object",
+    "required": ["name", "size"],
+    "properties": {
+        "name": {"type": "string", "minLength": 1, "maxLength": 64, "description": "Название диска."},
+        "size": {"type": "integer", "minimum": 1, "maximum": 16384},
+        "shared": {"type": "boolean", "default": False},
+        "state": {"enum": ["creating", "available"]},
+        "zone": ZONE,
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "labels": {"type": "object", "additionalProperties": {"type": "string"}},
+        "parent_id": {"anyOf": [{"type": "string", "format": "uuid4"}, {"type": "null"}]},
+    },
+}
+SPEC = {
+    "components": {
+        "schemas": {
+            "Disk": DISK,
+            "Zone": ZONE,
+            "DiskNotFoundExceptionSchema": ERROR,
+            "VmNotFoundExceptionSchema": {**ERROR, "title": "VmNotFoundExceptionSchema"},
+        }
+    }
+}
+
+
+def _endpoint():
+    # prance подставляет $ref копиями: у встроенных схем нет идентичности с components
+    return {
+        "method": "PUT",
+        "path": "/disks/{disk_id}",
+        "parameters": [
+            {"name": "disk_id", "in": "path", "required": True, "schema": {"type": "string", "format": "uuid4"}},
+            {"name": "force", "in": "query", "schema": {"type": "boolean"}},
+        ],
+        "requestBody": {"required": True, "content": {"application/json": {"schema": copy.deepcopy(DISK)}}},
+        "responses": {
+            "200": {"content": {"application/json": {"schema": copy.deepcopy(DISK)}}},
+            "404": {
+                "description": "Диск не найден",
+                "content": {"application/json": {"schema": {"type": "array", "items": copy.deepcopy(ERROR)}}},
+            },
+        },
+    }
+
+
+def test_operation_references_named_schemas_by_name():
+    serializer = CompactSerializer(SPEC)
+
+    assert serializer.operation(_endpoint()) == (
+        "PUT /disks/{disk_id}\n"
+        "  path: disk_id: uuid4\n"
+        "  query: force?: bool\n"
+        "  body: Disk\n"
+        "  200: Disk"
+    )
+    assert serializer.negative_responses(_endpoint()) == (
+        "PUT /disks/{disk_id}: 404 [DiskNotFoundExceptionSchema] — Диск не найден"
+    )
+
+
+def test_definitions_are_emitted_once_with_minimal_types():
+    serializer = CompactSerializer(SPEC)
+    serializer.operation(_endpoint())
+    serializer.operation(_endpoint())
+
+    definitions = serializer.definitions()
+
+    assert definitions.count("Disk {") == 1
+    assert "  name: str(1..64)  # Название диска.\n" in definitions
+    assert "  size: int(1..16384)\n" in definitions
+    assert "  shared?: bool = false\n" in definitions
+    assert '  state?: "creating"|"available"\n' in definitions
+    # Встроенная копия Zone без title узнаётся по структуре
+    assert "  zone?: Zone\n" in definitions
+    assert "Zone {\n  id: uuid4\n  name?: str\n}" in definitions
+    assert "  tags?: [str]\n  labels?: {str: str}\n  parent_id?: uuid4 | null\n" in definitions
+
+
+def test_identical_schemas_share_one_definition_and_budget_limits_descriptions():
+    serializer = CompactSerializer(SPEC, description_budget=0)
+    endpoint = _endpoint()
+    endpoint["responses"]["409"] = {
+        "content": {"application/json": {"schema": {**copy.deepcopy(ERROR), "title": "VmNotFoundExceptionSchema"}}}
+    }
+    serializer.operation(endpoint)
+    serializer.negative_responses(endpoint)
+
+    definitions = serializer.definitions()
+
+    assert "DiskNotFoundExceptionSchema, VmNotFoundExceptionSchema {\n  code: str\n  message: str\n}" in definitions
+    assert "#" not in definitions
+    assert serializer.negative_responses(endpoint).endswith("404 [DiskNotFoundExceptionSchema]; 409 VmNotFoundExceptionSchema")
@@ -25,7 +25,8 @@ async def test_optimize_uses_previous_code(monkeypatch):
     data = r.json()
     assert data["validation"]["valid"] is True
 
-    assert prev in called["messages"][0]["content"]
+    assert called["messages"][0]["role"] == "system"
+    assert prev in called["messages"][-1]["content"]
 
     assert data["code"] == "print('ok')"
 
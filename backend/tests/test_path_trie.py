@@ -0,0 +1,44 @@
+from backend.path_trie import PathTrie
+from backend.validator import ApiCall
+
+
+def _ep(method, path):
+    return {"method": method, "path": path}
+
+
+ENDPOINTS = [
+    _ep("GET", "/api/v1/disks"),
+    _ep("POST", "/api/v1/disks"),
+    _ep("GET", "/api/v1/disks/{disk_id}"),
+    _ep("GET", "/api/v1/disks/search"),
+    _ep("POST", "/api/v1/disks/{disk_id}/attach"),
+    _ep("GET", "/api/v1/vms/{vm_id}"),
+]
+
+
+def _keys(endpoints):
+    return sorted(f"{ep['method']} {ep['path']}" for ep in endpoints)
+
+
+def test_concrete_url_resolves_to_template_and_prefers_literal_segment():
+    trie = PathTrie(ENDPOINTS)
+    assert _keys(trie.match("https://compute.api.cloud.ru/api/v1/disks/9f1c-77/attach?x=1")) == [
+        "POST /api/v1/disks/{disk_id}/attach"
+    ]
+    assert _keys(trie.match("/api/v1/disks/search")) == ["GET /api/v1/disks/search"]
+    assert _keys(trie.match("/api/v1/disks/", method="post")) == ["POST /api/v1/disks"]
+    assert trie.match("/api/v1/images/1") == []
+
+
+def test_wildcard_segment_and_prefix_match():
+    trie = PathTrie(ENDPOINTS)
+    assert _keys(trie.match("/api/v1/disks/{}", method="GET")) == [
+        "GET /api/v1/disks/search", "GET /api/v1/disks/{disk_id}"
+    ]
+    assert _keys(trie.match("/api/v1/vms", prefix=True)) == ["GET /api/v1/vms/{vm_id}"]
+
+
+def test_covered_takes_method_into_account():
+    trie = PathTrie(ENDPOINTS)
+    calls = [ApiCall("GET", "/api/v1/vms/{}"), ApiCall("DELETE", "/api/v1/disks/1"), ApiCall(None, "/api/v1/disks")]
+    assert trie.covered(calls) == {"GET /api/v1/vms/{vm_id}", "GET /api/v1/disks", "POST /api/v1/disks"}
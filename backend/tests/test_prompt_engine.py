@@ -0,0 +1,114 @@
+import os
+
+from backend.prompt_engine import PROMPTS_DIR, PromptEngine, sync_jinja_templates, txt_to_jinja
+
+
+def test_txt_to_jinja_maps_placeholders_and_escapes_jinja_syntax():
+    text = "Код: {вставь сюда весь код, который только что сгенерировал}\nБаги {defects_summary}: {historical_bugs}\n{{ raw }} {% x %} {unknown}"
+    source = txt_to_jinja(text)
+    assert "{{ previous_code }}" in source and source.count("{{ historical_bugs }}") == 2
+
+    template = PromptEngine(PROMPTS_DIR).env.from_string(source)
+    rendered = template.render(previous_code="print('{{ historical_bugs }}')", historical_bugs="нет")
+    # подставленный код не рендерится повторно, чужие фигурные скобки остаются как есть
+    assert rendered == "Код: print('{{ historical_bugs }}')\nБаги нет: нет\n{{ raw }} {% x %} {unknown}"
+
+
+def test_jinja_templates_are_in_sync_with_txt():
+    for txt_path in PROMPTS_DIR.glob("*.txt"):
+        jinja_path = txt_path.with_suffix(".jinja")
+        assert jinja_path.exists(), jinja_path.name
+        assert jinja_path.read_text(encoding="utf-8") == txt_to_jinja(txt_path.read_text(encoding="utf-8")), (
+            f"{jinja_path.name} устарел: python -m backend.prompt_engine"
+        )
+
+
+def test_engine_compiles_all_templates_with_bytecode_cache(tmp_path):
+    engine = PromptEngine(PROMPTS_DIR, cache_dir=tmp_path)
+
+    names = engine.load_all()
+    assert {"auto_api", "optimize", "manual_ui"} <= set(names)
+    assert list(tmp_path.iterdir())  # байткод сохранён на диск
+    assert engine.get("optimize") is engine.get("optimize")
+    assert engine.variable_counts(engine.get("optimize")) == {"previous_code": 1, "historical_bugs": 2}
+    assert engine.variable_counts(engine.get("auto_api"))["schemas"] == 1
+
+
+def test_engine_creates_bytecode_dir_lazily(tmp_path):
+    cache_dir = tmp_path / "jinja"
+    engine = PromptEngine(PROMPTS_DIR, cache_dir=cache_dir)
+    assert not cache_dir.exists()  # импорт main не трогает файловую систему
+
+    engine.get("optimize")
+    assert list(cache_dir.iterdir())
+
+
+def test_engine_renders_when_bytecode_dir_is_not_writable(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("", encoding="utf-8")
+    engine = PromptEngine(PROMPTS_DIR, cache_dir=blocker / "jinja")  # каталог не создать
+
+    assert engine.get("optimize").render(previous_code="x", historical_bugs="нет")
+
+
+def test_from_text_cache_is_bounded(tmp_path):
+    engine = PromptEngine(tmp_path, text_cache_size=2)
+    first = engine.from_text("a {{ x }}")
+    engine.from_text("b {{ x }}")
+    assert engine.from_text("a {{ x }}") is first  # обращение продлевает жизнь шаблона
+    engine.from_text("c {{ x }}")
+
+    assert list(engine._texts) == ["a {{ x }}", "c {{ x }}"]
+    assert engine.from_text("a {{ x }}") is first
+
+
+def _touch(path, text, mtime_ns):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_engine_hot_reloads_changed_templates_atomically(tmp_path):
+    _touch(tmp_path / "t.txt", "Код: {previous_code}", 1_000_000_000)
+    engine = PromptEngine(tmp_path, poll_interval_s=0)
+    first = engine.entry("t")
+    assert first.template.render(previous_code="x") == "Код: x"
+
+    # .txt правят в проде: .jinja ещё нет — шаблон собирается из .txt
+    _touch(tmp_path / "t.txt", "Код v2: {previous_code}", 2_000_000_000)
+    assert engine.refresh() == ["t"]
+    second = engine.entry("t")
+    assert second.template.render(previous_code="x") == "Код v2: x"
+    assert second.etag != first.etag
+
+    # битая правка .jinja не подменяет рабочую версию
+    _touch(tmp_path / "t.jinja", "{{ previous_code ", 3_000_000_000)
+    assert engine.refresh() == []
+    assert engine.entry("t") is second
+    assert engine.stats()["reload_errors"] == 1
+    assert engine.refresh() == []  # тот же файл повторно не компилируется
+    assert engine.stats()["reload_errors"] == 1
+
+    # .jinja главнее расходящегося с ним .txt, даже более свежего: выбор не зависит от mtime
+    _touch(tmp_path / "t.jinja", "старый {{ previous_code }}", 3_000_000_000)
+    _touch(tmp_path / "t.txt", "Код v3: {previous_code}", 4_000_000_000)
+    engine.refresh()
+    assert engine.get("t").render(previous_code="x") == "старый x"
+    assert engine.stats()["reloads"] == 2
+
+
+def test_txt_source_is_an_explicit_mode(tmp_path):
+    _touch(tmp_path / "t.txt", "Код: {previous_code}", 1_000_000_000)
+    _touch(tmp_path / "t.jinja", "правка {{ previous_code }}", 2_000_000_000)
+
+    assert PromptEngine(tmp_path).get("t").render(previous_code="x") == "правка x"
+    assert PromptEngine(tmp_path, source="txt").get("t").render(previous_code="x") == "Код: x"
+
+
+def test_sync_check_reports_stale_templates_without_writing(tmp_path):
+    (tmp_path / "t.txt").write_text("Код: {previous_code}", encoding="utf-8")
+    (tmp_path / "t.jinja").write_text("правка {{ previous_code }}", encoding="utf-8")
+
+    assert sync_jinja_templates(tmp_path, check=True) == ["t"]
+    assert (tmp_path / "t.jinja").read_text(encoding="utf-8") == "правка {{ previous_code }}"
+    assert sync_jinja_templates(tmp_path) == ["t"]
+    assert sync_jinja_templates(tmp_path, check=True) == []
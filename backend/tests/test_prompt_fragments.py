@@ -0,0 +1,37 @@
+from backend.prompt_fragments import FragmentCache, build_spec_fragments, spec_content_hash
+
+VM_SCHEMA = {"title": "VM", "type": "object", "required": ["name"], "properties": {"name": {"type": "string"}}}
+SPEC = {
+    "components": {"schemas": {"VM": VM_SCHEMA, "Disk": {}}},
+}
+ENDPOINTS = [
+    {"method": "GET", "path": "/vms", "summary": "List VMs", "parameters": [], "requestBody": {}, "responses": {"200": {}}},
+    {
+        "method": "POST", "path": "/vms", "summary": "Create VM", "parameters": [],
+        "requestBody": {"required": True, "content": {"application/json": {"schema": dict(VM_SCHEMA)}}},
+        "responses": {"201": {}, "400": {"description": "bad"}, "500": {}},
+    },
+]
+
+
+def test_build_spec_fragments_renders_all_sections():
+    fragments = build_spec_fragments(SPEC, ENDPOINTS, "h").as_fragments()
+
+    # В разделе схем — только схемы, на которые ссылаются операции
+    assert fragments["schemas"] == "VM {\n  name: str\n}"
+    assert fragments["openapi_endpoints"] == "GET /vms — List VMs\nPOST /vms — Create VM"
+    assert fragments["endpoints_detailed"] == "GET /vms\n  200: —\nPOST /vms\n  body: VM\n  201: —"
+    assert fragments["negative_responses"] == "POST /vms: 400 — bad; 500"
+
+
+def test_fragment_cache_builds_once_per_spec_content():
+    cache = FragmentCache(max_entries=1)
+
+    first = cache.get_or_build(SPEC, ENDPOINTS)
+    assert cache.get_or_build({"components": {"schemas": {"VM": dict(VM_SCHEMA), "Disk": {}}}}, ENDPOINTS) is first
+    assert cache.stats() == {"entries": 1, "hits": 1, "builds": 1}
+    assert first.spec_hash == spec_content_hash(SPEC)
+
+    cache.get_or_build({"components": {}}, [])
+    assert cache.stats()["entries"] == 1
+    assert cache.get_or_build(SPEC, ENDPOINTS) is not first
@@ -0,0 +1,22 @@
+from backend.sharding import SHARD_CLASSES, plan_shards, shard_instruction, shard_max_tokens
+
+
+def test_plan_covers_every_class_once_and_balances_tests():
+    plan = plan_shards("manual_ui", 2)
+    names = [c.name for shard in plan for c in shard.classes]
+    assert sorted(names) == sorted(c.name for c in SHARD_CLASSES["manual_ui"])
+    assert abs(plan[0].min_tests - plan[1].min_tests) <= 6
+
+
+def test_plan_caps_shards_by_class_count():
+    plan = plan_shards("manual_api", 10)
+    assert len(plan) == 3
+    assert [shard.classes[0].name for shard in plan] == ["VMTests", "DiskTests", "FlavorTests"]
+    assert sum(shard.min_tests for shard in plan) >= 29  # порог precheck_manual_generation
+
+
+def test_instruction_and_token_share():
+    shard = plan_shards("manual_api", 3)[2]
+    text = shard_instruction(shard)
+    assert "ЧАСТЬ 3 ИЗ 3" in text and "FlavorTests" in text and "VMTests" not in text
+    assert shard_max_tokens(shard, "manual_api", 8700) < 8700 / 2
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from backend.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = {"count": 0}
+    release = asyncio.Event()
+
+    async def work():
+        calls["count"] += 1
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert calls["count"] == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("upstream down")
+
+    waiters = [asyncio.create_task(flight.do("k", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return "fresh"
+
+    assert await flight.do("k", ok) == "fresh"
+    assert flight.stats()["leaders"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_others():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
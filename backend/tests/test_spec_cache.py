@@ -0,0 +1,45 @@
+from backend.spec_cache import load_resolved_spec, snapshot_path, source_hash
+
+
+def _parser(calls):
+    def parse(path):
+        calls.append(path)
+        return {"openapi": "3.0.0", "paths": {"/vms": {"get": {"summary": str(len(calls))}}}}
+    return parse
+
+
+def test_snapshot_is_reused_until_sources_change(tmp_path):
+    spec_dir = tmp_path / "openapi"
+    spec_dir.mkdir()
+    spec_file = spec_dir / "api.yaml"
+    spec_file.write_text("openapi: 3.0.0\n")
+    cache_dir = tmp_path / "cache"
+    calls = []
+
+    first, hit = load_resolved_spec(spec_file, cache_dir, parse=_parser(calls))
+    assert not hit and len(calls) == 1
+    second, hit = load_resolved_spec(spec_file, cache_dir, parse=_parser(calls))
+    assert hit and second == first and len(calls) == 1
+
+    # Правка соседнего файла (цель $ref) тоже инвалидирует снимок; старый снимок удаляется
+    old_snapshot = snapshot_path(spec_file, source_hash(spec_file), cache_dir)
+    (spec_dir / "schemas.yaml").write_text("Disk: {}\n")
+    third, hit = load_resolved_spec(spec_file, cache_dir, parse=_parser(calls))
+    assert not hit and len(calls) == 2
+    assert not old_snapshot.exists()
+    assert [p.name for p in cache_dir.iterdir()] == [snapshot_path(spec_file, source_hash(spec_file)).name]
+
+
+def test_corrupt_snapshot_and_disabled_cache_fall_back_to_parsing(tmp_path):
+    spec_file = tmp_path / "api.yaml"
+    spec_file.write_text("openapi: 3.0.0\n")
+    cache_dir = tmp_path / "cache"
+    calls = []
+
+    load_resolved_spec(spec_file, cache_dir, parse=_parser(calls))
+    snapshot_path(spec_file, source_hash(spec_file), cache_dir).write_bytes(b"not a pickle")
+    spec, hit = load_resolved_spec(spec_file, cache_dir, parse=_parser(calls))
+    assert not hit and spec["paths"]["/vms"]["get"]["summary"] == "2"
+
+    _, hit = load_resolved_spec(spec_file, None, parse=_parser(calls))
+    assert not hit and len(calls) == 3
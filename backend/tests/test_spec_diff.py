@@ -0,0 +1,92 @@
+import ast
+
+from backend.spec_diff import (
+    GenerationStore, OperationTests, StoredOperation, assemble_module, diff_operations,
+    operation_hash, split_operation_tests,
+)
+
+
+def _ep(method, path, responses=None):
+    return {"method": method, "path": path, "parameters": [], "requestBody": {}, "responses": responses or {"200": {}}}
+
+
+ENDPOINTS = [
+    _ep("GET", "/api/v1/disks"),
+    _ep("POST", "/api/v1/disks/{disk_id}/attach"),
+    _ep("GET", "/api/v1/flavors/{flavor_id}"),
+]
+
+CODE = '''import allure
+import requests
+
+BASE_URL = "https://compute.api.cloud.ru"
+
+
+@allure.feature("Disks")
+class TestDisksAPI:
+    """Диски."""
+
+    def test_list(self, auth_headers):
+        requests.get(f"{BASE_URL}/api/v1/disks", headers=auth_headers)
+
+    def test_list_is_stable(self):
+        assert True
+
+    def test_attach(self, disk_id):
+        url = f"{BASE_URL}/api/v1/disks/{disk_id}/attach"
+        requests.post(url)
+
+
+def test_flavor():
+    requests.get(BASE_URL + "/api/v1/flavors/abc")
+'''
+
+
+def test_operation_hash_tracks_parameters_body_and_responses():
+    ep = _ep("GET", "/api/v1/disks")
+    assert operation_hash(ep) == operation_hash({**ep, "summary": "другое описание"})
+    assert operation_hash(ep) != operation_hash({**ep, "responses": {"200": {}, "404": {}}})
+
+    diff = diff_operations({"GET /a": "1", "GET /b": "2", "GET /c": "3"}, {"GET /a": "1", "GET /b": "x", "GET /d": "4"})
+    assert (diff.added, diff.changed, diff.unchanged, diff.removed) == (["GET /c"], ["GET /b"], ["GET /a"], ["GET /d"])
+
+
+def test_split_by_first_called_operation_and_assemble_back():
+    parts = split_operation_tests(CODE, ENDPOINTS)
+
+    assert {key: [case.name for case in part.cases] for key, part in parts.items()} == {
+        # Тест без HTTP-вызовов остаётся с предыдущим
+        "GET /api/v1/disks": ["test_list", "test_list_is_stable"],
+        "POST /api/v1/disks/{disk_id}/attach": ["test_attach"],
+        "GET /api/v1/flavors/{flavor_id}": ["test_flavor"],
+    }
+    code = assemble_module(parts.values())
+    ast.parse(code)
+    assert code.count("BASE_URL = ") == 1 and code.count("class TestDisksAPI") == 1
+    assert code.index("def test_list(") < code.index("def test_attach(") < code.index("def test_flavor(")
+
+
+def test_assemble_renames_different_tests_with_same_name():
+    first = split_operation_tests(CODE, ENDPOINTS)["GET /api/v1/flavors/{flavor_id}"]
+    other = OperationTests(
+        imports=["import requests"],
+        cases=[first.cases[0].model_copy(update={"source": first.cases[0].source + "\n    assert True"})],
+    )
+
+    code = assemble_module([first, first, other])
+
+    assert code.count("def test_flavor():") == 1 and "def test_flavor_2():" in code
+
+
+async def test_store_roundtrip_and_removal(tmp_path):
+    store = GenerationStore(tmp_path / "generations.sqlite3")
+    tests = split_operation_tests(CODE, ENDPOINTS)
+    await store.save("compute", {key: StoredOperation("h", item) for key, item in tests.items()})
+
+    reopened = GenerationStore(tmp_path / "generations.sqlite3")
+    await reopened.save("compute", {}, removed=["GET /api/v1/disks"])
+    loaded = await reopened.load("compute")
+
+    assert sorted(loaded) == ["GET /api/v1/flavors/{flavor_id}", "POST /api/v1/disks/{disk_id}/attach"]
+    assert loaded["GET /api/v1/flavors/{flavor_id}"].tests == tests["GET /api/v1/flavors/{flavor_id}"]
+    assert await reopened.load("other") == {}
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.spec_loader import SpecLoader, SpecNotReady
+
+
+async def test_concurrent_waiters_share_one_load_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    calls, published = [], []
+
+    def load():
+        calls.append(threading.get_ident())
+        return {"spec": 1}
+
+    loader = SpecLoader(load, lambda prepared: published.append(prepared) or {"endpoints": 1})
+
+    await asyncio.gather(*(loader.ensure(timeout=5) for _ in range(5)))
+
+    assert len(calls) == 1 and calls[0] != loop_thread
+    assert published == [{"spec": 1}]
+    assert loader.status()["state"] == "ready" and loader.status()["endpoints"] == 1
+
+
+async def test_failed_load_is_retried_by_next_waiter():
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("broken spec")
+        return {}
+
+    loader = SpecLoader(load, lambda prepared: None)
+
+    with pytest.raises(ValueError):
+        await loader.ensure(timeout=5)
+    assert loader.status()["state"] == "failed" and loader.status()["error"] == "broken spec"
+
+    await loader.ensure(timeout=5)
+    assert loader.state == "ready" and loader.attempts == 2
+
+
+async def test_slow_load_times_out_without_being_cancelled():
+    release = threading.Event()
+    loader = SpecLoader(lambda: release.wait(5), lambda prepared: None)
+
+    with pytest.raises(SpecNotReady):
+        await loader.ensure(timeout=0.05)
+    assert loader.state == "loading"
+
+    release.set()
+    await loader.ensure(timeout=5)
+    assert loader.state == "ready" and loader.attempts == 1
@@ -0,0 +1,136 @@
+import pytest
+
+from backend.prompt_fragments import FragmentCache
+from backend.spec_registry import SpecParseError, SpecRegistry
+
+
+def _spec(*paths: str) -> str:
+    ops = "".join(
+        f"  {path}:\n    get:\n      tags: [Pets]\n      summary: list\n      responses:\n        '200':\n          description: ok\n"
+        for path in paths
+    )
+    return f"openapi: 3.0.0\ninfo:\n  title: pets\n  version: '1'\npaths:\n{ops}"
+
+
+def _registry(tmp_path, max_bytes=10 ** 9, source_root=None):
+    return SpecRegistry(
+        tmp_path / "specs", tmp_path / "cache", FragmentCache(max_entries=8),
+        max_bytes=max_bytes, source_root=source_root,
+    )
+
+
+async def test_new_version_is_swapped_in_and_old_one_stays_usable(tmp_path):
+    registry = _registry(tmp_path)
+
+    first = await registry.register("pets", content=_spec("/pets"))
+    assert first.version == 1 and [ep["path"] for ep in first.endpoints] == ["/pets"]
+    assert await registry.get("pets") is first
+
+    second = await registry.register("pets", content=_spec("/pets", "/owners"))
+    assert second.version == 2 and await registry.get("pets") is second
+    # Запрос, получивший первую версию, дорабатывает с ней
+    assert [ep["path"] for ep in first.endpoints] == ["/pets"]
+
+    with pytest.raises(SpecParseError):
+        await registry.register("pets", content="openapi: 3.0.0\npaths: [broken")
+    assert await registry.get("pets") is second
+    assert [p.name for p in (tmp_path / "specs").iterdir()] == ["pets"]
+
+
+async def test_lru_evicts_by_memory_and_reloads_on_demand(tmp_path):
+    registry = _registry(tmp_path, max_bytes=1)
+
+    await registry.register("a", content=_spec("/a"))
+    await registry.register("b", content=_spec("/b"))
+    assert [item.get("loaded", True) for item in registry.describe()] == [False, True]
+    assert registry.stats()["evictions"] == 1
+
+    entry = await registry.get("a")
+    assert entry.endpoints[0]["path"] == "/a" and entry.from_snapshot
+    assert registry.stats()["loads"] == 3
+
+    with pytest.raises(KeyError):
+        await registry.get("missing")
+
+
+async def test_register_by_path_and_rediscover_uploads(tmp_path):
+    (tmp_path / "sources").mkdir()
+    spec_file = tmp_path / "sources" / "svc.yaml"
+    spec_file.write_text(_spec("/svc"))
+    registry = _registry(tmp_path, source_root=tmp_path / "sources")
+
+    entry = await registry.register("svc", path=spec_file.as_uri())
+    assert entry.source == str(spec_file.resolve())
+    await registry.register("up", content=_spec("/up"))
+    with pytest.raises(ValueError):
+        await registry.register("bad id", content=_spec("/x"))
+
+    # Загруженные через API файлы находятся заново после рестарта, пути — нет
+    restarted = _registry(tmp_path)
+    assert "up" in restarted and "svc" not in restarted
+    assert (await restarted.get("up")).endpoints[0]["path"] == "/up"
+
+    restarted.remove("up")
+    assert not (tmp_path / "specs" / "up").exists()
+
+
+async def test_register_by_path_is_confined_to_source_root(tmp_path):
+    (tmp_path / "sources").mkdir()
+    (tmp_path / "sources" / "svc.yaml").write_text(_spec("/svc"))
+    outside = tmp_path / "outside.yaml"
+    outside.write_text(_spec("/outside"))
+
+    with pytest.raises(PermissionError):
+        await _registry(tmp_path).register("svc", path=str(tmp_path / "sources" / "svc.yaml"))
+
+    registry = _registry(tmp_path, source_root=tmp_path / "sources")
+    assert (await registry.register("svc", path="svc.yaml")).endpoints[0]["path"] == "/svc"
+    for path in (str(outside), "../outside.yaml", outside.as_uri()):
+        with pytest.raises(PermissionError):
+            await registry.register("x", path=path)
+    with pytest.raises(FileNotFoundError):
+        await registry.register("x", path="missing.yaml")
+
+
+async def test_entry_size_covers_derived_structures(tmp_path):
+    from backend.spec_registry import deep_sizeof
+
+    entry = await _registry(tmp_path).register("pets", content=_spec("/pets", "/owners"))
+
+    assert entry.size_bytes == deep_sizeof(entry.spec, entry.endpoints, entry.index, entry.fragments)
+    assert entry.size_bytes > deep_sizeof(entry.spec) + deep_sizeof(entry.fragments.endpoints_detailed)
+    assert entry.trie is entry.index.trie  # дерево путей для check_coverage — из индекса, а не заново
+
+
+def _spec_with_ref(ref: str) -> str:
+    return (
+        "openapi: 3.0.0\ninfo:\n  title: pets\n  version: '1'\npaths:\n  /pets:\n    get:\n"
+        f"      responses:\n        '200':\n          $ref: '{ref}'\n"
+    )
+
+
+async def test_uploaded_spec_cannot_reference_files_or_urls(tmp_path):
+    secret = tmp_path / "secret" / "leak.yaml"
+    secret.parent.mkdir()
+    secret.write_text("Resp:\n  description: TOPSECRET\n")
+    registry = _registry(tmp_path, source_root=tmp_path)
+
+    for ref in (f"file://{secret}#/Resp", "http://169.254.169.254/latest#/Resp", "secret/leak.yaml#/Resp"):
+        with pytest.raises(SpecParseError):
+            await registry.register("pets", content=_spec_with_ref(ref))
+    assert "pets" not in registry
+
+
+async def test_path_spec_references_stay_inside_source_root(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "common.yaml").write_text("Ok:\n  description: shared\n")
+    (tmp_path / "leak.yaml").write_text("Resp:\n  description: TOPSECRET\n")
+    (sources / "svc.yaml").write_text(_spec_with_ref("common.yaml#/Ok"))
+    (sources / "bad.yaml").write_text(_spec_with_ref("../leak.yaml#/Resp"))
+    registry = _registry(tmp_path, source_root=sources)
+
+    entry = await registry.register("svc", path="svc.yaml")
+    assert entry.endpoints[0]["responses"]["200"]["description"] == "shared"
+    with pytest.raises(SpecParseError):
+        await registry.register("bad", path="bad.yaml")
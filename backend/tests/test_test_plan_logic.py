@@ -10,7 +10,7 @@ async def test_test_plan_injects_previous_code(monkeypatch):
 
     async def fake_llm(*args, **kwargs):
         messages = kwargs.get("messages", args[0] if args else None)
-        called["msg"] = messages[0]["content"]
+        called["msg"] = messages[-1]["content"]
         return "# Тест-план\nOK"
 
     monkeypatch.setattr("backend.main.call_evolution", fake_llm)
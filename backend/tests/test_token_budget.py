@@ -0,0 +1,50 @@
+from backend.token_budget import (
+    estimate_tokens,
+    truncate_to_tokens,
+    fit_fragments,
+    completion_budget,
+)
+
+
+def test_estimate_tokens_grows_with_text():
+    assert estimate_tokens("") == 0
+    short = estimate_tokens("Сгенерируй тесты для GET /v3/vms")
+    long = estimate_tokens("Сгенерируй тесты для GET /v3/vms\n" * 50)
+    assert 0 < short < long
+    # код и кириллица плотнее одного токена на 4 символа, но не на символ
+    assert len("Сгенерируй тесты") / 4 < estimate_tokens("Сгенерируй тесты") < len("Сгенерируй тесты")
+
+
+def test_truncate_keeps_whole_lines_and_marks_cut():
+    text = "\n".join(f"GET /v3/vms/{i} — получить ВМ" for i in range(200))
+    cut = truncate_to_tokens(text, 100)
+    assert estimate_tokens(cut) < estimate_tokens(text)
+    assert cut.startswith("GET /v3/vms/0 — получить ВМ\n")
+    assert "пропущено строк" in cut
+    assert truncate_to_tokens("коротко", 100) == "коротко"
+
+
+def test_fit_fragments_cuts_lowest_priority_first():
+    big = "\n".join(f"POST /v3/disks: {{'400': 'Bad Request {i}'}}" for i in range(500))
+    fragments = {"negative_responses": big, "previous_code": "def test_x():\n    pass\n"}
+    fitted, truncated = fit_fragments(
+        fixed_tokens=200,
+        fragments=fragments,
+        occurrences={"negative_responses": 1, "previous_code": 1},
+        priorities={"negative_responses": 0, "previous_code": 5},
+        limit_tokens=1000,
+    )
+    assert truncated == ["negative_responses"]
+    assert fitted["previous_code"] == fragments["previous_code"]
+    assert 200 + estimate_tokens(fitted["negative_responses"]) + estimate_tokens(fitted["previous_code"]) <= 1000
+
+
+def test_fit_fragments_accounts_for_repeated_placeholders():
+    text = "\n".join(f"Путь: /v3/vms/{i}" for i in range(300))
+    fitted, _ = fit_fragments(0, {"endpoints_detailed": text}, {"endpoints_detailed": 2}, {}, limit_tokens=600)
+    assert 2 * estimate_tokens(fitted["endpoints_detailed"]) <= 600
+
+
+def test_completion_budget_is_capped_by_window():
+    assert completion_budget(1000, 4000, context_window=32768, safety_margin=1000) == 4000
+    assert completion_budget(30000, 4000, context_window=32768, safety_margin=1000) == 1768
@@ -1,4 +1,6 @@
-from backend.validator import validate_allure_code, extract_api_calls
+import pytest
+
+from backend.validator import ApiCall, call_sites_by_function, validate_allure_code, extract_api_calls, extract_call_sites
 
 def test_validator_accepts_valid_manual_ui():
     code = (
@@ -130,6 +132,50 @@ def test_extract_api_calls_without_args():
     assert extract_api_calls(code) == []
 
 
+def test_extract_call_sites_resolves_fstrings_and_scoped_variables():
+    code = (
+        "import requests\n"
+        "BASE_URL = 'https://compute.api.cloud.ru'\n"
+        "def test_attach(api_session, disk_id):\n"
+        "    url = f'{BASE_URL}/api/v1/disks/{disk_id}/attach'\n"
+        "    api_session.post(url, json={})\n"
+        "def test_list():\n"
+        "    url = '/api/v1/disks'\n"
+        "    requests.get(BASE_URL + url)\n"
+        "    requests.request('DELETE', url=f'/api/v1/vms/{1}')\n"
+        "    cache.get('/not/an/api')\n"
+    )
+    assert extract_call_sites(code) == [
+        ApiCall("POST", "/api/v1/disks/{}/attach"),
+        ApiCall("GET", "/api/v1/disks"),
+        ApiCall("DELETE", "/api/v1/vms/{}"),
+    ]
+
+
+def test_call_sites_by_function_groups_calls_by_test():
+    code = (
+        "import requests\n"
+        "requests.get('/health')\n"
+        "class TestVMs:\n"
+        "    def test_get(self):\n"
+        "        def inner():\n"
+        "            requests.delete('/vms/1')\n"
+        "        requests.get('/vms/1')\n"
+        "def test_list():\n"
+        "    requests.get('/vms')\n"
+    )
+    assert call_sites_by_function(code) == {
+        "": [ApiCall("GET", "/health")],
+        "TestVMs.test_get": [ApiCall("DELETE", "/vms/1"), ApiCall("GET", "/vms/1")],
+        "test_list": [ApiCall("GET", "/vms")],
+    }
+
+
+def test_extract_call_sites_raises_on_invalid_code():
+    with pytest.raises(SyntaxError):
+        extract_call_sites("def nope(:")
+
+
 def test_validator_auto_api_ok_with_title_and_feature():
     code = (
         "@allure.feature('X')\n"
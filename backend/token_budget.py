@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+
+try:
+    from tokenizers import Tokenizer
+    HAS_TOKENIZERS = True
+except ImportError:
+    HAS_TOKENIZERS = False
+
+logger = logging.getLogger("app")
+
+# Калибровка оценщика под BPE-токенайзер Qwen: символов на токен по классам символов
+_CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+_ALNUM_RE = re.compile(r"[A-Za-z0-9_]")
+_PUNCT_RE = re.compile(r"[!-/:-@\[-`{-~]")
+CHARS_PER_TOKEN_CYRILLIC = 2.7
+CHARS_PER_TOKEN_LATIN = 3.6
+TOKENS_PER_PUNCT = 0.6
+TOKENS_PER_NEWLINE = 0.3
+TOKENS_PER_MESSAGE = 8  # служебные токены чат-шаблона на одно сообщение
+
+# Контекстное окно модели и запас на погрешность оценки (доля окна)
+CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "32768"))
+SAFETY_MARGIN_RATIO = float(os.getenv("LLM_CONTEXT_SAFETY_MARGIN", "0.1"))
+MIN_COMPLETION_TOKENS = int(os.getenv("LLM_MIN_COMPLETION_TOKENS", "1024"))
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _get_tokenizer():
+    """Точный токенайзер модели, если задан LLM_TOKENIZER_PATH (tokenizer.json) и установлен tokenizers."""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        path = os.getenv("LLM_TOKENIZER_PATH")
+        if path and HAS_TOKENIZERS:
+            try:
+                _tokenizer = Tokenizer.from_file(path)
+            except Exception as e:
+                logger.warning("tokenizer_load_failed", extra={"path": path, "error": str(e)})
+    return _tokenizer
+
+
+def estimate_tokens(text: str) -> int:
+    """Число токенов текста: точный подсчёт токенайзером модели или калиброванная оценка."""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text).ids)
+
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    latin = len(_ALNUM_RE.findall(text))
+    punct = len(_PUNCT_RE.findall(text))
+    newlines = text.count("\n")
+    other = len(text) - cyrillic - latin - punct - newlines - text.count(" ") - text.count("\t")
+    estimate = (
+        cyrillic / CHARS_PER_TOKEN_CYRILLIC
+        + latin / CHARS_PER_TOKEN_LATIN
+        + punct * TOKENS_PER_PUNCT
+        + newlines * TOKENS_PER_NEWLINE
+        + max(other, 0)
+    )
+    return int(estimate) + 1
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Обрезает текст по целым строкам до max_tokens и помечает, сколько строк пропущено.
+    Одна гигантская строка режется по символам пропорционально.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return "(раздел опущен: не помещается в контекстное окно модели)"
+
+    lines = text.split("\n")
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+
+    if not kept:
+        ratio = max_tokens / max(estimate_tokens(lines[0]), 1)
+        kept = [lines[0][: int(len(lines[0]) * ratio)]]
+
+    skipped = len(lines) - len(kept)
+    return "\n".join(kept) + f"\n… (сокращено для контекстного окна: пропущено строк — {skipped})"
+
+
+def fit_fragments(
+    fixed_tokens: int,
+    fragments: Dict[str, str],
+    occurrences: Dict[str, int],
+    priorities: Dict[str, int],
+    limit_tokens: int,
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Ужимает подставляемые разделы промпта под limit_tokens.
+    fixed_tokens — стоимость неизменяемой части шаблона; occurrences — сколько раз
+    раздел встречается в шаблоне; разделы с меньшим priority режутся первыми.
+    Возвращает (новые разделы, имена сокращённых разделов).
+    """
+    costs = {name: estimate_tokens(text) * occurrences.get(name, 0) for name, text in fragments.items()}
+    total = fixed_tokens + sum(costs.values())
+    fitted = dict(fragments)
+    truncated: List[str] = []
+
+    for name in sorted(fragments, key=lambda n: priorities.get(n, 0)):
+        if total <= limit_tokens:
+            break
+        count = occurrences.get(name, 0)
+        if not count:
+            continue
+        excess = total - limit_tokens
+        allowed = max(0, (costs[name] - excess) // count)
+        fitted[name] = truncate_to_tokens(fragments[name], allowed)
+        new_cost = estimate_tokens(fitted[name]) * count
+        total -= costs[name] - new_cost
+        costs[name] = new_cost
+        truncated.append(name)
+
+    return fitted, truncated
+
+
+def completion_budget(prompt_tokens: int, desired_max_tokens: int, context_window: int, safety_margin: int) -> int:
+    """max_tokens для ответа: желаемый лимит, но не больше остатка контекстного окна."""
+    return min(desired_max_tokens, context_window - safety_margin - prompt_tokens)
+
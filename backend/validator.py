@@ -1,6 +1,8 @@
 import ast
 import re
-from typing import List
+from collections import ChainMap
+from typing import Dict, List, NamedTuple
+from urllib.parse import urlsplit
 
 
 def validate_allure_code(code: str, test_type: str = "manual_ui") -> dict:
@@ -231,4 +233,137 @@ def extract_api_calls(code: str) -> List[str]:
                             if const_parts:
                                 endpoints.append(const_parts[0])
 
-    return list({ep for ep in endpoints if ep.startswith(("/", "http"))})
\ No newline at end of file
+    return list({ep for ep in endpoints if ep.startswith(("/", "http"))})
+
+
+class ApiCall(NamedTuple):
+    method: str | None  # None — метод не удалось определить (requests.request(method_var, ...))
+    path: str  # путь с "{}" на месте подстановок f-строк: /api/v1/disks/{}
+
+
+_HTTP_METHODS = {"get", "post", "put", "patch", "delete", "head", "options"}
+
+
+def _is_http_client(node: ast.expr) -> bool:
+    """requests, а также session/client-объекты: api_session, self.session, client."""
+    name = node.id if isinstance(node, ast.Name) else node.attr if isinstance(node, ast.Attribute) else ""
+    name = name.lower()
+    return name == "requests" or name.endswith(("session", "client"))
+
+
+def _url_template(node: ast.expr, names: Dict[str, str], strict: bool = True) -> str | None:
+    """Строка, f-строка, имя с известным значением или их сумма -> шаблон с "{}" на месте неизвестного."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(
+            p.value if isinstance(p, ast.Constant) and isinstance(p.value, str)
+            else (names.get(p.value.id, "{}") if isinstance(p, ast.FormattedValue) and isinstance(p.value, ast.Name) else "{}")
+            for p in node.values
+        )
+    if isinstance(node, ast.Name) and node.id in names:
+        return names[node.id]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left = _url_template(node.left, names, strict=False)
+        right = _url_template(node.right, names, strict=False)
+        return left + right
+    return None if strict else "{}"
+
+
+def _call_path(template: str) -> str | None:
+    if template.startswith("{}"):
+        template = template[2:]  # базовый URL из неизвестной переменной
+    if "://" in template:
+        template = urlsplit(template).path
+    return template if template.startswith("/") else None
+
+
+class _CallSiteCollector(ast.NodeVisitor):
+    """
+    Обходит модуль в порядке исходника, запоминая строковые присваивания по областям видимости.
+    Каждый вызов привязывается к функции верхнего уровня или методу класса, в котором сделан.
+    """
+
+    def __init__(self):
+        self.scopes: List[Dict[str, str]] = [{}]
+        self.calls: List[ApiCall] = []
+        self.owners: List[str] = []  # "test_x" / "TestDisks.test_y"; "" — вне функций
+        self._classes: List[str] = []
+        self._owner = ""
+
+    def _names(self) -> Dict[str, str]:
+        return dict(ChainMap(*reversed(self.scopes)))
+
+    def visit_ClassDef(self, node):
+        self._classes.append(node.name)
+        self.generic_visit(node)
+        self._classes.pop()
+
+    def visit_FunctionDef(self, node):
+        outer = self._owner
+        self._owner = outer or ".".join(self._classes + [node.name])
+        self.scopes.append({})
+        self.generic_visit(node)
+        self.scopes.pop()
+        self._owner = outer
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            template = _url_template(node.value, self._names())
+            if template is not None:
+                self.scopes[-1][node.targets[0].id] = template
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if not (isinstance(node.func, ast.Attribute) and _is_http_client(node.func.value)):
+            return
+        attr = node.func.attr.lower()
+        args = list(node.args)
+        url_node = next((kw.value for kw in node.keywords if kw.arg == "url"), None)
+        if attr in _HTTP_METHODS:
+            method = attr.upper()
+            url_node = url_node or (args[0] if args else None)
+        elif attr == "request":
+            method_node = args[0] if args else next((kw.value for kw in node.keywords if kw.arg == "method"), None)
+            is_literal = isinstance(method_node, ast.Constant) and isinstance(method_node.value, str)
+            method = method_node.value.upper() if is_literal else None
+            url_node = url_node or (args[1] if len(args) > 1 else None)
+        else:
+            return
+        template = _url_template(url_node, self._names()) if url_node is not None else None
+        path = _call_path(template) if template is not None else None
+        if path is not None:
+            self.calls.append(ApiCall(method, path))
+            self.owners.append(self._owner)
+
+
+def extract_call_sites(code: str) -> List[ApiCall]:
+    """
+    HTTP-вызовы в коде тестов: метод и путь-шаблон. В отличие от extract_api_calls
+    f-строка сохраняется целиком (подстановки -> "{}"), а URL, собранный в переменной
+    (url = f"{BASE_URL}/vms/{vm_id}"; requests.get(url)), подставляется по последнему
+    присваиванию в своей функции или модуле.
+    SyntaxError пробрасывается: вызывающий решает, как проверять неразбираемый код.
+    """
+    collector = _CallSiteCollector()
+    collector.visit(ast.parse(code))
+    return list(dict.fromkeys(collector.calls))
+
+
+def call_sites_by_function(code: str) -> Dict[str, List[ApiCall]]:
+    """
+    Вызовы extract_call_sites, разложенные по функциям верхнего уровня и методам
+    классов ("test_list", "TestDisksAPI.test_attach"); вызовы вне функций — под "".
+    Вложенные функции относятся к объемлющей. SyntaxError пробрасывается.
+    """
+    collector = _CallSiteCollector()
+    collector.visit(ast.parse(code))
+    calls: Dict[str, List[ApiCall]] = {}
+    for owner, call in zip(collector.owners, collector.calls):
+        owned = calls.setdefault(owner, [])
+        if call not in owned:
+            owned.append(call)
+    return calls